@@ -1,9 +1,12 @@
 from fastapi import APIRouter
 
+from app.core.config import settings
 # Import all routers from endpoints
 from app.endpoints.age_range import router as age_range_router
+from app.endpoints.export import router as export_router
 from app.endpoints.gender import router as gender_router
 from app.endpoints.match import router as match_router
+from app.endpoints.metrics import router as metrics_router
 from app.endpoints.partner_age_range import router as partner_age_range_router
 from app.endpoints.partner_children_expectations import router as partner_children_expectations_router
 from app.endpoints.partner_ethnics import router as partner_ethnics_router
@@ -11,6 +14,7 @@ from app.endpoints.partner_height import router as partner_height_router
 from app.endpoints.partner_marriage_timeline import router as partner_marriage_timeline_router
 from app.endpoints.partner_personality_traits import router as partner_personality_traits_router
 from app.endpoints.prayer_frequency import router as prayer_frequency_router
+from app.endpoints.profile import router as profile_router
 from app.endpoints.religious_level import router as religious_level_router
 from app.endpoints.sects import router as sects_router
 from app.endpoints.smoking_status import router as smoking_status_router
@@ -18,18 +22,36 @@ from app.endpoints.visited import router as visited_router
 
 api_router = APIRouter()
 
+
+def _database_router(router: APIRouter) -> APIRouter:
+    """``router`` as served under the configured database stack.
+
+    With DATABASE_ASYNC set its handlers run on an AsyncSession. The match
+    and visited routers always stay on the threadpool: they load and score
+    the in-memory candidate engine, which is CPU-bound and would stall the
+    event loop.
+    """
+    if settings.DATABASE_ASYNC:
+        from app.api.async_routes import async_router
+        return async_router(router)
+    return router
+
+
 # Include all routers
-api_router.include_router(age_range_router, prefix="/age-range", tags=["age-range"])
-api_router.include_router(gender_router, prefix="/gender", tags=["gender"])
-api_router.include_router(match_router, prefix="/match", tags=["match"])
-api_router.include_router(partner_age_range_router, prefix="/partner-age-range", tags=["partner-age-range"])
-api_router.include_router(partner_children_expectations_router, prefix="/partner-children-expectations", tags=["partner-children-expectations"])
-api_router.include_router(partner_ethnics_router, prefix="/partner-ethnics", tags=["partner-ethnics"])
-api_router.include_router(partner_height_router, prefix="/partner-height", tags=["partner-height"])
-api_router.include_router(partner_marriage_timeline_router, prefix="/partner-marriage-timeline", tags=["partner-marriage-timeline"])
-api_router.include_router(partner_personality_traits_router, prefix="/partner-personality-traits", tags=["partner-personality-traits"])
-api_router.include_router(prayer_frequency_router, prefix="/prayer-frequency", tags=["prayer-frequency"])
-api_router.include_router(religious_level_router, prefix="/religious-level", tags=["religious-level"])
-api_router.include_router(sects_router, prefix="/sects", tags=["sects"])
-api_router.include_router(smoking_status_router, prefix="/smoking-status", tags=["smoking-status"])
-api_router.include_router(visited_router, prefix="/visited", tags=["visited"]) 
\ No newline at end of file
+api_router.include_router(_database_router(age_range_router), tags=["age-range"])
+api_router.include_router(export_router, tags=["export"])
+api_router.include_router(_database_router(gender_router), tags=["gender"])
+api_router.include_router(match_router, tags=["match"])
+api_router.include_router(metrics_router, tags=["metrics"])
+api_router.include_router(_database_router(partner_age_range_router), tags=["partner-age-range"])
+api_router.include_router(_database_router(partner_children_expectations_router), tags=["partner-children-expectations"])
+api_router.include_router(_database_router(partner_ethnics_router), tags=["partner-ethnics"])
+api_router.include_router(_database_router(partner_height_router), tags=["partner-height"])
+api_router.include_router(_database_router(partner_marriage_timeline_router), tags=["partner-marriage-timeline"])
+api_router.include_router(_database_router(partner_personality_traits_router), tags=["partner-personality-traits"])
+api_router.include_router(_database_router(prayer_frequency_router), tags=["prayer-frequency"])
+api_router.include_router(_database_router(profile_router), tags=["profile"])
+api_router.include_router(_database_router(religious_level_router), tags=["religious-level"])
+api_router.include_router(_database_router(sects_router), tags=["sects"])
+api_router.include_router(_database_router(smoking_status_router), tags=["smoking-status"])
+api_router.include_router(visited_router, tags=["visited"]) 
\ No newline at end of file
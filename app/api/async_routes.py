@@ -0,0 +1,70 @@
+import functools
+import inspect
+
+from fastapi import APIRouter, Depends
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import (
+    get_async_db,
+    get_async_lookup_read_db,
+    get_async_read_db,
+    get_db,
+    get_lookup_read_db,
+    get_read_db,
+)
+
+ASYNC_DEPENDENCIES = {
+    get_db: get_async_db,
+    get_read_db: get_async_read_db,
+    get_lookup_read_db: get_async_lookup_read_db,
+}
+
+
+def async_endpoint(endpoint):
+    """Async twin of a sync handler that takes ``db: Session = Depends(get_db)`` or ``get_read_db``.
+
+    The handler body runs through ``AsyncSession.run_sync``: its queries go
+    out on the async driver and wait on the event loop instead of holding a
+    threadpool thread, while the handler code itself is shared with the
+    sync route.
+    """
+    signature = inspect.signature(endpoint)
+    if "db" not in signature.parameters:
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def wrapper(*, db: AsyncSession, **kwargs):
+        return await db.run_sync(lambda session: endpoint(db=session, **kwargs))
+
+    wrapper.__signature__ = signature.replace(parameters=[
+        parameter.replace(
+            annotation=AsyncSession,
+            default=Depends(ASYNC_DEPENDENCIES[parameter.default.dependency])
+        ) if parameter.name == "db" else parameter
+        for parameter in signature.parameters.values()
+    ])
+    return wrapper
+
+
+def async_router(router: APIRouter) -> APIRouter:
+    """The routes of ``router`` with every database handler swapped for its async twin."""
+    converted = APIRouter()
+    for route in router.routes:
+        if not isinstance(route, APIRoute):
+            converted.routes.append(route)
+            continue
+        converted.add_api_route(
+            route.path,
+            async_endpoint(route.endpoint),
+            response_model=route.response_model,
+            status_code=route.status_code,
+            tags=route.tags,
+            responses=route.responses,
+            summary=route.summary,
+            description=route.description,
+            methods=route.methods,
+            name=route.name,
+            response_class=route.response_class,
+        )
+    return converted
@@ -1,4 +1,4 @@
-import os
+from typing import List
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
@@ -7,7 +7,22 @@ load_dotenv()
 class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "Dating App API"
-    DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./test.db")
+    # The only place DATABASE_URL is read; app.db.database builds its engines from it.
+    DATABASE_URL: str = "sqlite:///./test.db"
+    # Serve the preference and profile endpoints from an AsyncSession
+    # (asyncpg for PostgreSQL, aiosqlite for SQLite) instead of the threadpool.
+    DATABASE_ASYNC: bool = False
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT: float = 30.0
+    # Connections older than this many seconds are replaced at checkout; -1 keeps them.
+    DATABASE_POOL_RECYCLE: int = 1800
+    DATABASE_POOL_PRE_PING: bool = True
+    # Comma-separated replica URLs the read-only endpoints are spread over;
+    # empty reads everything from DATABASE_URL.
+    READ_DATABASE_URLS: str = ""
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+    READ_REPLICA_RETRY_SECONDS: float = 30.0
     
     BACKEND_CORS_ORIGINS: list = ["*"]
     
@@ -15,7 +30,80 @@ class Settings(BaseSettings):
     API_DESCRIPTION: str = "API for dating app preferences and matching"
     API_VERSION: str = "1.0.0"
     
+    CANDIDATE_DEFAULT_LIMIT: int = 20
+    CANDIDATE_MAX_LIMIT: int = 100
+    CANDIDATE_BATCH_ROW_BLOCK: int = 256
+    CANDIDATE_BATCH_COLUMN_BLOCK: int = 16384
+    CANDIDATE_BATCH_WORKERS: int = 0
+    # Candidates stored per user, by the nightly batch and the online refresh alike.
+    CANDIDATE_FEED_SIZE: int = 100
+    CANDIDATE_FEED_TTL_SECONDS: int = 86400
+    # Changed users past which the candidate engine reloads every table
+    # instead of re-reading them.
+    CANDIDATE_RELOAD_THRESHOLD: int = 50000
+    
+    VISITED_BLOOM_FP_RATE: float = 0.01
+    VISITED_BLOOM_MEMORY_BYTES: int = 256 * 1024 * 1024
+    VISITED_BLOOM_MIN_CAPACITY: int = 16
+    
+    PROFILE_BATCH_MAX: int = 100
+    
+    BULK_MAX_ROWS: int = 10000
+    BULK_CHUNK_SIZE: int = 1000
+    
+    LIST_DEFAULT_LIMIT: int = 100
+    LIST_MAX_LIMIT: int = 1000
+    # Rows fetched per round trip from the server-side cursor of a streamed list.
+    LIST_STREAM_BATCH_SIZE: int = 1000
+    # user_ids one multi-get (GET ?user_ids= or POST /lookup) may ask for.
+    MULTI_GET_MAX_IDS: int = 1000
+    
+    EXPORT_BATCH_SIZE: int = 10000
+    IMPORT_CHUNK_SIZE: int = 50000
+    IMPORT_MAX_ERRORS: int = 1000
+    
+    # Read-through cache of the GET /{user_id} endpoints: "memory" (one per
+    # worker), "redis" (shared, CACHE_REDIS_URL) or "none".
+    CACHE_BACKEND: str = "memory"
+    CACHE_TTL_SECONDS: float = 60.0
+    # Bound of the memory backend; a Redis server is bounded by its maxmemory.
+    CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_KEY_PREFIX: str = "matching:"
+    # Serve hits as the stored JSON bytes instead of re-validating them
+    # through the endpoint's response_model.
+    CACHE_RAW_RESPONSES: bool = True
+    # Invalidated keys remembered so a read begun before the write does not store what it read.
+    CACHE_INVALIDATION_HISTORY: int = 100000
+    
+    # Concurrent identical reads (GET /{user_id} misses, candidate lists and
+    # feed refreshes) share one in-flight call; a waiter gives up after the
+    # timeout and runs its own.
+    SINGLE_FLIGHT_ENABLED: bool = True
+    SINGLE_FLIGHT_TIMEOUT_SECONDS: float = 5.0
+    # Longer, as a feed refresh may include the candidate engine's first load.
+    SINGLE_FLIGHT_CANDIDATE_TIMEOUT_SECONDS: float = 30.0
+    
+    # Every committed write is appended to change_log (and NOTIFYed on
+    # PostgreSQL); each worker applies the other workers' changes to its
+    # caches and in-memory indexes.
+    CHANGE_FEED_ENABLED: bool = True
+    CHANGE_NOTIFY_CHANNEL: str = "matching_changes"
+    # How often change_log is read; the staleness bound without NOTIFY.
+    CHANGE_POLL_SECONDS: float = 1.0
+    CHANGE_POLL_BATCH: int = 10000
+    # Rows older than this are taken as settled: no transaction begun before
+    # them is still to commit, so the poll stops re-reading past them.
+    CHANGE_SETTLE_SECONDS: float = 30.0
+    CHANGE_LOG_RETENTION_SECONDS: float = 3600.0
+    # With no successful poll for this long the per-worker cache is bypassed.
+    CHANGE_MAX_STALENESS_SECONDS: float = 10.0
+    
     class Config:
         env_file = ".env"
+    
+    @property
+    def read_database_urls(self) -> List[str]:
+        return [url.strip() for url in self.READ_DATABASE_URLS.split(",") if url.strip()]
 
 settings = Settings() 
\ No newline at end of file
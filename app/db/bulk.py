@@ -0,0 +1,81 @@
+import logging
+from typing import Any, Callable, Dict, List, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.writes import row_values, upsert_rows
+
+logger = logging.getLogger(__name__)
+
+
+def bulk_upsert(
+    db: Session,
+    records: List[Dict[str, Any]],
+    create_dto: Type[BaseModel],
+    build: Callable[[BaseModel], Any],
+    on_written: Optional[Callable[..., None]] = None,
+    chunk_size: Optional[int] = None
+) -> Dict[str, Any]:
+    """Validate, build and upsert ``records`` chunk by chunk, reporting failures per row.
+
+    ``on_written(db, *user_ids)`` runs inside each chunk's transaction. Each
+    chunk commits on its own; a chunk the database rejects is retried row by
+    row, so one bad row only fails itself.
+    """
+    chunk_size = chunk_size or settings.BULK_CHUNK_SIZE
+    errors: List[Dict[str, Any]] = []
+    built: Dict[str, tuple] = {}
+    model = None
+    for index, record in enumerate(records):
+        user_id = record.get("user_id") if isinstance(record, dict) else None
+        try:
+            instance = build(create_dto(**record))
+        except ValidationError as e:
+            errors.append({"index": index, "user_id": user_id, "detail": str(e.errors()[0]["msg"])})
+            continue
+        except Exception as e:
+            errors.append({"index": index, "user_id": user_id, "detail": str(getattr(e, "detail", e))})
+            continue
+        model = type(instance)
+        # A later record for the same user replaces an earlier one, as a later request would.
+        built.pop(instance.user_id, None)
+        built[instance.user_id] = (index, row_values(instance))
+
+    written = 0
+    pending = list(built.values())
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        if _write_chunk(db, model, chunk, on_written):
+            written += len(chunk)
+            continue
+        for index, row in chunk:
+            if _write_chunk(db, model, [(index, row)], on_written, errors):
+                written += 1
+    errors.sort(key=lambda error: error["index"])
+    return {"received": len(records), "written": written, "errors": errors}
+
+
+def _write_chunk(
+    db: Session,
+    model,
+    chunk: List[tuple],
+    on_written: Optional[Callable[..., None]],
+    errors: Optional[List[Dict[str, Any]]] = None
+) -> bool:
+    try:
+        rows = [row for _, row in chunk]
+        if on_written is not None:
+            on_written(db, *(row["user_id"] for row in rows))
+        upsert_rows(db, model, rows)
+        db.commit()
+        return True
+    except Exception as e:
+        db.rollback()
+        if errors is None:
+            logger.warning(f"Bulk chunk of {len(chunk)} {model.__tablename__} rows failed, retrying row by row: {str(e)}")
+        else:
+            index, row = chunk[0]
+            errors.append({"index": index, "user_id": row["user_id"], "detail": str(getattr(e, "orig", e))})
+        return False
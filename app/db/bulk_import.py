@@ -0,0 +1,241 @@
+import csv
+import io
+import json
+import logging
+import time
+from datetime import datetime
+from operator import itemgetter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import Column, MetaData, Table, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.changes import note_written
+from app.db.versions import UPDATED_AT_COLUMN, VERSION_COLUMN, is_versioned
+from app.db.writes import upsert_statement
+from app.dto.export import ImportFormat
+from app.matching.codec import get_codec
+
+logger = logging.getLogger(__name__)
+
+# An empty value takes the column default, which is False for every flag.
+_BOOLEANS = {"true": True, "t": True, "1": True, "false": False, "f": False, "0": False, "": False}
+# What csv.writer makes of Python booleans, for rows converted without lowercasing.
+_BOOLEANS.update({"True": True, "False": False})
+
+
+class TableImport:
+    """Loads CSV or NDJSON records into one preference table, chunk by chunk.
+
+    Records carry ``user_id`` and any of the table's Boolean columns, as
+    ``true``/``false`` (CSV also takes ``t``/``f``/``1``/``0``), or a column
+    named after the table holding its packed hex mask, so the output of a
+    single-table export loads back as is. Absent flags take the column
+    default, and a record replaces the stored row for its user, taking the
+    next version of it.
+
+    On PostgreSQL with psycopg2 each chunk is COPYed into a temporary
+    staging table and merged with one INSERT ... SELECT ... ON CONFLICT DO
+    UPDATE; other databases upsert the chunk as one executemany. Every chunk
+    commits on its own, after ``on_written(db, *user_ids)`` runs in its
+    transaction. Records that fail to parse are reported and skipped.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model,
+        import_format: ImportFormat,
+        on_written: Optional[Callable[..., None]] = None,
+        chunk_size: Optional[int] = None
+    ):
+        self.name = name
+        self.model = model
+        self.import_format = ImportFormat(import_format)
+        self.on_written = on_written
+        self.chunk_size = chunk_size or settings.IMPORT_CHUNK_SIZE
+        self.codec = get_codec(model)
+        self.columns = ["user_id", *self.codec.columns]
+        self.versioned = is_versioned(model)
+        if self.versioned:
+            self.columns += [VERSION_COLUMN, UPDATED_AT_COLUMN]
+        self._defaults = {column: False for column in self.codec.columns}
+        self.received = 0
+        self.written = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.failed = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.written / self.seconds if self.seconds else 0.0
+
+    def run(self, db: Session, lines: Iterable[str]) -> Dict[str, Any]:
+        start = time.perf_counter()
+        chunk: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        for index, (user_id, row) in enumerate(self._parse(lines)):
+            self.received += 1
+            if isinstance(row, Exception):
+                self._error(index, user_id, str(row))
+                continue
+            # A later record for the same user replaces an earlier one, as in bulk_upsert.
+            chunk.pop(user_id, None)
+            chunk[user_id] = (index, row)
+            if len(chunk) >= self.chunk_size:
+                self._write_chunk(db, list(chunk.values()))
+                chunk = {}
+        if chunk:
+            self._write_chunk(db, list(chunk.values()))
+
+        self.seconds = time.perf_counter() - start
+        logger.info(
+            f"Imported {self.written} of {self.received} {self.name} rows "
+            f"in {self.seconds:.2f}s ({self.rows_per_second:.0f} rows/s)"
+        )
+        return {"received": self.received, "written": self.written, "errors": self.errors}
+
+    def _parse(self, lines: Iterable[str]) -> Iterator[Tuple[Optional[str], Any]]:
+        """``(user_id, row)`` per record; ``row`` is the ValueError rejecting the record if it is invalid."""
+        if self.import_format == ImportFormat.NDJSON:
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield None, ValueError(f"Invalid JSON: {str(e)}")
+                    continue
+                yield self._checked(record)
+            return
+
+        reader = csv.reader(lines)
+        header = next(reader, [])
+        flags = [name for name in header if name in self.codec.bits]
+        # Files holding only user_id and flag columns, as an unpacked export
+        # writes them, are converted a whole row at a time.
+        fast = "user_id" in header and len(flags) == len(header) - 1
+        if fast:
+            user_position = header.index("user_id")
+            pick_flags = itemgetter(*(header.index(name) for name in flags))
+        for values in reader:
+            if fast and len(values) == len(header) and values[user_position]:
+                parsed = tuple(map(_BOOLEANS.get, pick_flags(values)))
+                if None not in parsed:
+                    row = dict(self._defaults)
+                    row.update(zip(flags, parsed))
+                    row["user_id"] = values[user_position]
+                    yield row["user_id"], row
+                    continue
+            yield self._checked(dict(zip(header, values)))
+
+    def _checked(self, record: Any) -> Tuple[Optional[str], Any]:
+        try:
+            row = self._row(record)
+        except Exception as e:
+            return (record.get("user_id") if isinstance(record, dict) else None), ValueError(str(e))
+        return row["user_id"], row
+
+    def _row(self, record: Any) -> Dict[str, Any]:
+        if not isinstance(record, dict):
+            raise ValueError("Expected a JSON object")
+        user_id = record.get("user_id")
+        if not isinstance(user_id, str) or not user_id:
+            raise ValueError("user_id is required")
+        row = dict(self._defaults)
+        for name, value in record.items():
+            if name in self.codec.bits:
+                if isinstance(value, str):
+                    if value.lower() not in _BOOLEANS:
+                        raise ValueError(f"{name} is not a boolean: {value}")
+                    value = _BOOLEANS[value.lower()]
+                if value is None:
+                    continue
+                if not isinstance(value, bool):
+                    raise ValueError(f"{name} is not a boolean: {value}")
+                row[name] = value
+            elif name == self.name:
+                if value not in (None, ""):
+                    row.update(self.codec.decode(int(value, 16)))
+            elif name != "user_id":
+                raise ValueError(f"Unknown {self.model.__tablename__} column: {name}")
+        row["user_id"] = user_id
+        return row
+
+    def _error(self, index: int, user_id: Optional[str], detail: str) -> None:
+        self.failed += 1
+        if len(self.errors) < settings.IMPORT_MAX_ERRORS:
+            self.errors.append({"index": index, "user_id": user_id, "detail": detail})
+
+    def _write_chunk(self, db: Session, chunk: List[Tuple[int, Dict[str, Any]]]) -> None:
+        rows = [row for _, row in chunk]
+        try:
+            if self.on_written is not None:
+                self.on_written(db, *(row["user_id"] for row in rows))
+            if self.versioned:
+                self._stamp(db, rows)
+            if db.get_bind().dialect.driver == "psycopg2":
+                self._copy_merge(db, rows)
+            else:
+                self._executemany(db, rows)
+                note_written(db, self.model)
+            db.commit()
+            self.written += len(rows)
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Import chunk of {len(rows)} {self.name} rows failed: {str(e)}")
+            for index, row in chunk:
+                self._error(index, row["user_id"], str(getattr(e, "orig", e)))
+
+    def _stamp(self, db: Session, rows: List[Dict[str, Any]]) -> None:
+        """Version columns of a new row; the upsert bumps the version of a row it replaces."""
+        updated_at = datetime.utcnow()
+        # Bound ahead of time, as _executemany skips bind processing.
+        processor = self.model.__table__.c[UPDATED_AT_COLUMN].type.bind_processor(db.get_bind().dialect)
+        if processor is not None:
+            updated_at = processor(updated_at)
+        for row in rows:
+            row[VERSION_COLUMN] = 1
+            row[UPDATED_AT_COLUMN] = updated_at
+
+    def _copy_merge(self, db: Session, rows: List[Dict[str, Any]]) -> None:
+        table = self.model.__table__
+        staging = Table(
+            f"{table.name}_import",
+            MetaData(),
+            *(Column(column.name, column.type) for column in table.columns),
+            prefixes=["TEMPORARY"],
+            postgresql_on_commit="DROP"
+        )
+        connection = db.connection()
+        staging.create(connection)
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(["t" if value is True else "f" if value is False else value for value in map(row.get, self.columns)])
+        buffer.seek(0)
+        preparer = connection.dialect.identifier_preparer
+        with connection.connection.driver_connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {preparer.format_table(staging)} ({', '.join(map(preparer.quote, self.columns))}) "
+                f"FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+
+        merge = upsert_statement(db, self.model).from_select(self.columns, select(*(staging.c[name] for name in self.columns)))
+        db.execute(merge)
+
+    def _executemany(self, db: Session, rows: List[Dict[str, Any]]) -> None:
+        connection = db.connection()
+        compiled = upsert_statement(db, self.model).compile(dialect=connection.dialect, column_keys=self.columns)
+        # The rows hold plain strings and bools already, so they go to the
+        # driver's executemany as is, skipping per-value bind processing.
+        # Binds that are not columns, like the version increment, keep their
+        # compiled values.
+        constants = {key: value for key, value in compiled.params.items() if key not in self.columns}
+        if compiled.positional:
+            parameters = [tuple(row[key] if key in row else constants[key] for key in compiled.positiontup) for row in rows]
+        else:
+            parameters = [{**constants, **row} for row in rows] if constants else rows
+        connection.exec_driver_sql(compiled.string, parameters)
@@ -0,0 +1,382 @@
+import functools
+import inspect
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+from fastapi import Request, Response, status
+
+from app.core.config import settings
+from app.db.changes import change_feed
+from app.db.singleflight import SingleFlight
+from app.db.versions import current_etag, if_none_match
+
+logger = logging.getLogger(__name__)
+
+
+class CacheStats:
+    """Counters of one cache; the read-through layer and its backend both report here."""
+
+    FIELDS = (
+        "hits", "misses", "bypassed", "sets", "stale_sets_skipped", "evictions", "expirations", "invalidations", "errors",
+        "not_modified"
+    )
+
+    def __init__(self):
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counts[name] += amount
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+class CpuTimes:
+    """CPU time of the cached handlers per resource: requests served by the handler and from the cache.
+
+    Handler time covers the handler itself, response_model validation and
+    JSON encoding, which is the work a hit serving stored bytes skips. Only
+    the serving thread's CPU counts, never time waiting on the database.
+    With CACHE_RAW_RESPONSES off, FastAPI validates hits again after the
+    wrapper returns, which is not counted.
+    """
+
+    def __init__(self):
+        self._resources: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, resource: str, hit: bool, seconds: float) -> None:
+        with self._lock:
+            times = self._resources.setdefault(resource, {"hits": 0, "hit_seconds": 0.0, "misses": 0, "miss_seconds": 0.0})
+            if hit:
+                times["hits"] += 1
+                times["hit_seconds"] += seconds
+            else:
+                times["misses"] += 1
+                times["miss_seconds"] += seconds
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            resources = {resource: dict(times) for resource, times in self._resources.items()}
+        report = {}
+        for resource, times in resources.items():
+            hit_ms = times["hit_seconds"] / times["hits"] * 1000 if times["hits"] else None
+            miss_ms = times["miss_seconds"] / times["misses"] * 1000 if times["misses"] else None
+            saved_ms = miss_ms - hit_ms if hit_ms is not None and miss_ms is not None else None
+            report[resource] = {
+                "hits": times["hits"],
+                "misses": times["misses"],
+                "hit_cpu_ms": hit_ms,
+                "miss_cpu_ms": miss_ms,
+                "saved_cpu_ms_per_hit": saved_ms,
+                "saved_cpu_seconds": saved_ms * times["hits"] / 1000 if saved_ms is not None else None,
+            }
+        return report
+
+
+class CacheBackend:
+    """Where cached entries live.
+
+    Values are bytes, so a backend may be shared by every worker; a backend
+    only has to honour the TTL and bound its own memory.
+    """
+
+    # A shared backend is invalidated by the writing worker itself, so it
+    # does not depend on the change feed to stay current.
+    shared = False
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, *keys: str) -> None:
+        raise NotImplementedError
+
+    def status(self) -> Dict[str, Any]:
+        return {}
+
+
+class MemoryBackend(CacheBackend):
+    """In-process LRU bounded by the bytes of its keys and values, expiring entries after their TTL."""
+
+    def __init__(self, max_bytes: int, stats: CacheStats):
+        self.max_bytes = max_bytes
+        self.stats = stats
+        self.bytes = 0
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.stats.incr("expirations")
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        size = len(key) + len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self.bytes += size
+            evicted = 0
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                evicted += 1
+        if evicted:
+            self.stats.incr("evictions", evicted)
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= len(key) + len(entry[0])
+
+    def status(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "bytes": self.bytes, "max_bytes": self.max_bytes}
+
+
+class RedisBackend(CacheBackend):
+    """Entries in a Redis-compatible server shared by every worker.
+
+    The server enforces the byte bound itself (maxmemory with an LRU
+    eviction policy) and reports its evictions.
+    """
+
+    shared = True
+
+    def __init__(self, url: str):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.client.set(key, value, px=int(ttl * 1000))
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self.client.delete(*keys)
+
+    def status(self) -> Dict[str, Any]:
+        memory, stats = self.client.info("memory"), self.client.info("stats")
+        return {
+            "bytes": memory.get("used_memory"),
+            "max_bytes": memory.get("maxmemory"),
+            "server_evictions": stats.get("evicted_keys"),
+        }
+
+
+class ReadThroughCache:
+    """Read-through cache of the per-user GET handlers, keyed by (resource, user_id).
+
+    Entries hold the handler's response encoded as JSON. With
+    CACHE_RAW_RESPONSES they are served as they are stored, in a Response
+    FastAPI sends without validating it against the response_model again,
+    and a miss answers with the bytes it stores too. Writes invalidate every
+    resource of the users they touched once their transaction commits. A
+    read that was already under way when its key was invalidated does not
+    store what it read, so a slow read never puts back a value a write has
+    just replaced. Other workers' writes reach a per-worker backend through
+    the change feed; while the feed is behind, that backend is bypassed.
+    Backend failures are logged and served from the database.
+
+    Every response carries an ETag of the user's row versions, stored with
+    the entry. A request whose If-None-Match holds the current tag gets 304
+    Not Modified, from the entry on a hit, or else from the version lookup
+    alone, before the handler runs.
+
+    Concurrent misses of one key share a single read, and so do their
+    version lookups, so a hot entry that expires or is invalidated is read
+    once rather than once per waiting request. A write makes later misses
+    start a new read instead of joining one that began before it.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend], ttl: float, stats: CacheStats, key_prefix: str = ""):
+        self.backend = backend
+        self.ttl = ttl
+        self.stats = stats
+        self.key_prefix = key_prefix
+        self.resources: Dict[str, Any] = {}
+        self.cpu_times = CpuTimes()
+        self.flights = SingleFlight("get", settings.SINGLE_FLIGHT_TIMEOUT_SECONDS)
+        self._sequence = 0
+        # key -> sequence number of its latest invalidation, oldest first.
+        self._invalidated: "OrderedDict[str, int]" = OrderedDict()
+        self._forgotten = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def key(self, resource: str, user_id: str) -> str:
+        return f"{self.key_prefix}{resource}:{user_id}"
+
+    def read_through(self, resource: str, response_model, models: Sequence):
+        """Decorator caching a ``get_*(user_id, db, ...)`` handler's response as ``response_model`` JSON.
+
+        ``models`` are the tables the response is read from, whose row
+        versions make up its ETag.
+        """
+        self.resources[resource] = response_model
+
+        def decorator(endpoint):
+            @functools.wraps(endpoint)
+            def wrapper(*args, request: Request, response: Response, **kwargs):
+                tags = if_none_match(request)
+                user_id = kwargs["user_id"]
+                key = self.key(resource, user_id)
+                use_backend = self.backend is not None and (self.backend.shared or change_feed.is_current)
+                if self.backend is not None and not use_backend:
+                    self.stats.incr("bypassed")
+                if use_backend:
+                    start = time.thread_time()
+                    cached = self._get(key)
+                    if cached is not None:
+                        tag, body = cached.decode().split("\n", 1)
+                        result = self._response(tag, body.encode(), tags, response)
+                        self.cpu_times.record(resource, True, time.thread_time() - start)
+                        return result
+                if tags:
+                    tag = self.flights.do((key, "etag"), lambda: current_etag(kwargs["db"], models, user_id))
+                    if tag is not None and tag in tags:
+                        self.stats.incr("not_modified")
+                        return self._not_modified(tag)
+
+                def read() -> Tuple[Optional[str], bytes]:
+                    start = time.thread_time()
+                    started = self._sequence
+                    # Looked up before the handler reads, so a write landing in
+                    # between leaves the tag older than the body, never newer.
+                    tag = current_etag(kwargs["db"], models, user_id)
+                    body = response_model.model_validate(endpoint(*args, **kwargs)).model_dump_json().encode()
+                    # Untagged when the row was created after the lookup; not
+                    # stored, so the next read tags it.
+                    if use_backend and tag is not None:
+                        self._store(key, started, tag.encode() + b"\n" + body)
+                        self.cpu_times.record(resource, False, time.thread_time() - start)
+                    return tag, body
+
+                tag, body = self.flights.do(key, read)
+                return self._response(tag, body, tags, response)
+
+            signature = inspect.signature(endpoint)
+            wrapper.__signature__ = signature.replace(parameters=[
+                *signature.parameters.values(),
+                inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+                inspect.Parameter("response", inspect.Parameter.KEYWORD_ONLY, annotation=Response),
+            ])
+            return wrapper
+
+        return decorator
+
+    def _response(self, tag: Optional[str], body: bytes, tags, response: Response):
+        if tag is not None and tag in tags:
+            self.stats.incr("not_modified")
+            return self._not_modified(tag)
+        headers = {"ETag": tag} if tag is not None else None
+        if settings.CACHE_RAW_RESPONSES:
+            return Response(content=body, media_type="application/json", headers=headers)
+        if headers:
+            response.headers.update(headers)
+        return json.loads(body)
+
+    @staticmethod
+    def _not_modified(tag: str) -> Response:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": tag})
+
+    def invalidate_users(self, user_ids: Iterable[str]) -> None:
+        """Drop every cached resource of ``user_ids``."""
+        keys = [self.key(resource, user_id) for user_id in user_ids for resource in self.resources]
+        if not keys:
+            return
+        self.flights.forget(*keys, *((key, "etag") for key in keys))
+        if self.backend is None:
+            return
+        with self._lock:
+            self._sequence += 1
+            for key in keys:
+                self._invalidated[key] = self._sequence
+                self._invalidated.move_to_end(key)
+            while len(self._invalidated) > settings.CACHE_INVALIDATION_HISTORY:
+                _, self._forgotten = self._invalidated.popitem(last=False)
+        self.stats.incr("invalidations", len(keys))
+        try:
+            self.backend.delete(*keys)
+        except Exception as e:
+            self.stats.incr("errors")
+            logger.warning(f"Cache invalidation of {len(keys)} keys failed: {str(e)}")
+
+    def _get(self, key: str) -> Optional[bytes]:
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            self.stats.incr("errors")
+            logger.warning(f"Cache read of {key} failed: {str(e)}")
+            return None
+        self.stats.incr("hits" if value is not None else "misses")
+        return value
+
+    def _store(self, key: str, started: int, value: bytes) -> None:
+        with self._lock:
+            invalidated = self._invalidated.get(key, self._forgotten)
+        if invalidated > started:
+            self.stats.incr("stale_sets_skipped")
+            return
+        try:
+            self.backend.set(key, value, self.ttl)
+        except Exception as e:
+            self.stats.incr("errors")
+            logger.warning(f"Cache write of {key} failed: {str(e)}")
+            return
+        self.stats.incr("sets")
+
+    def status(self) -> Dict[str, Any]:
+        status: Dict[str, Any] = {"backend": type(self.backend).__name__ if self.backend else None, "ttl": self.ttl}
+        status.update(self.stats.snapshot())
+        status["raw_responses"] = settings.CACHE_RAW_RESPONSES
+        status["cpu_times"] = self.cpu_times.snapshot()
+        if self.backend is not None:
+            try:
+                status.update(self.backend.status())
+            except Exception as e:
+                status["backend_error"] = str(e)
+        return status
+
+
+def _backend(stats: CacheStats) -> Optional[CacheBackend]:
+    if settings.CACHE_BACKEND == "memory":
+        return MemoryBackend(settings.CACHE_MAX_BYTES, stats)
+    if settings.CACHE_BACKEND == "redis":
+        return RedisBackend(settings.CACHE_REDIS_URL)
+    if settings.CACHE_BACKEND == "none":
+        return None
+    raise ValueError(f"Unknown CACHE_BACKEND {settings.CACHE_BACKEND}; expected memory, redis or none")
+
+
+_stats = CacheStats()
+preference_cache = ReadThroughCache(_backend(_stats), settings.CACHE_TTL_SECONDS, _stats, settings.CACHE_KEY_PREFIX)
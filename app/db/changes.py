@@ -0,0 +1,323 @@
+import json
+import logging
+import select as io_select
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from sqlalchemy import delete, event, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import SessionLocal, engine
+from app.db.pool import Histogram
+from app.schemas.change_log import ChangeLog
+
+logger = logging.getLogger(__name__)
+
+CHANGED_KEY = "change_feed_user_ids"
+WRITTEN_TABLES_KEY = "change_feed_tables"
+# Table of a change whose transaction wrote no watched table the session saw.
+ANY_TABLE = "*"
+# Upper bounds, in seconds, of the histogram of commit -> applied in another worker.
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Bytes of notices per NOTIFY; PostgreSQL rejects payloads of 8000 bytes or more.
+NOTIFY_PAYLOAD_BYTES = 7500
+PRUNE_INTERVAL_SECONDS = 60.0
+
+Changes = Dict[str, Set[str]]
+
+
+class ChangeFeed:
+    """Carries committed writes from the worker that made them to every other worker.
+
+    A writer calls ``record_changes(db, *user_ids)`` inside its transaction.
+    At commit one change_log row per (table, user_id) joins the transaction,
+    the tables being the watched ones it wrote; the row id is the change's
+    version. On PostgreSQL the same (table, user_id, version) notices are
+    NOTIFYed, which the server delivers only once the transaction commits.
+
+    ``start()`` runs a listener thread in the worker that hands other
+    workers' changes to the subscribers as ``{table: user_ids}``, on a
+    session of its own. NOTIFY makes that immediate; a poll of change_log
+    every CHANGE_POLL_SECONDS picks up whatever a dropped LISTEN connection
+    missed, and is the only path on SQLite. A worker's own changes are
+    applied by its after_commit hooks and skipped here.
+
+    ``lag_seconds`` is the histogram of commit -> applied here, and
+    ``is_current`` is False once no poll has succeeded for
+    CHANGE_MAX_STALENESS_SECONDS, so callers can stop trusting what they
+    hold. A worker that never started its listener counts as current: it is
+    taken to be the only one.
+    """
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+        self.watched: Set[str] = set()
+        self.lag_seconds = Histogram(LAG_BUCKETS)
+        self.applied = 0
+        self.errors = 0
+        self.last_poll_at: Optional[float] = None
+        self.listening = False
+        self._subscribers: List[Callable[[Session, Changes], None]] = []
+        # Every change_log id up to _after is applied; _seen holds those above it.
+        self._after = 0
+        self._seen: Set[int] = set()
+        self._last_prune = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def watch(self, *models) -> None:
+        """Publish writes to the tables of ``models`` under their table name."""
+        self.watched.update(model.__tablename__ for model in models)
+
+    def subscribe(self, callback: Callable[[Session, Changes], None]) -> None:
+        self._subscribers.append(callback)
+
+    @property
+    def is_current(self) -> bool:
+        if self._thread is None:
+            return True
+        return self.last_poll_at is not None and time.monotonic() - self.last_poll_at <= settings.CHANGE_MAX_STALENESS_SECONDS
+
+    def publish(self, db: Session) -> None:
+        """Add the session's recorded changes to its transaction; runs from before_commit."""
+        user_ids = db.info.get(CHANGED_KEY)
+        if not user_ids or not settings.CHANGE_FEED_ENABLED:
+            return
+        tables = db.info.get(WRITTEN_TABLES_KEY, set()) | self.tables_of(chain(db.new, db.dirty, db.deleted))
+        now, sent_at = datetime.utcnow(), time.time()
+        rows = [
+            {"origin": self.origin, "table_name": table, "user_id": user_id, "changed_at": now}
+            for table in sorted(tables) or [ANY_TABLE]
+            for user_id in sorted(user_ids)
+        ]
+        if db.get_bind().dialect.name != "postgresql":
+            db.execute(insert(ChangeLog), rows)
+            return
+        versions = db.scalars(insert(ChangeLog).returning(ChangeLog.id, sort_by_parameter_order=True), rows).all()
+        notices = [[row["table_name"], row["user_id"], version] for row, version in zip(rows, versions)]
+        for payload in _payloads(self.origin, sent_at, notices):
+            db.execute(select(func.pg_notify(settings.CHANGE_NOTIFY_CHANNEL, payload)))
+
+    def tables_of(self, records: Iterable) -> Set[str]:
+        return {type(record).__tablename__ for record in records} & self.watched
+
+    def start(self) -> None:
+        if not settings.CHANGE_FEED_ENABLED or self._thread is not None:
+            return
+        with SessionLocal() as db:
+            self._after = db.scalar(select(func.max(ChangeLog.id))) or 0
+        self._seen = set()
+        self.last_poll_at = time.monotonic()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+        self._thread.start()
+        logger.info(f"Change feed {self.origin} listening from version {self._after}")
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        listener = None
+        next_poll = 0.0
+        while not self._stop.is_set():
+            try:
+                if listener is None and engine.dialect.driver == "psycopg2":
+                    listener = self._listen()
+                timeout = max(0.0, next_poll - time.monotonic())
+                if listener is None:
+                    self._stop.wait(timeout)
+                elif io_select.select([listener], [], [], timeout)[0]:
+                    listener.poll()
+                    notifies, listener.notifies[:] = list(listener.notifies), []
+                    self._receive(notifies)
+                if time.monotonic() >= next_poll:
+                    self.poll()
+                    next_poll = time.monotonic() + settings.CHANGE_POLL_SECONDS
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Change feed error, retrying in {settings.CHANGE_POLL_SECONDS}s: {str(e)}")
+                if listener is not None:
+                    _close_quietly(listener)
+                    listener, self.listening = None, False
+                self._stop.wait(settings.CHANGE_POLL_SECONDS)
+        if listener is not None:
+            _close_quietly(listener)
+            self.listening = False
+
+    def _listen(self):
+        """Dedicated autocommit psycopg2 connection LISTENing on the channel, outside the pool."""
+        pooled = engine.raw_connection()
+        pooled.detach()
+        connection = pooled.driver_connection
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {engine.dialect.identifier_preparer.quote(settings.CHANGE_NOTIFY_CHANNEL)}")
+        self.listening = True
+        return connection
+
+    def _receive(self, notifies) -> None:
+        changes: Changes = {}
+        lags: List[float] = []
+        now = time.time()
+        with self._lock:
+            for notify in notifies:
+                message = json.loads(notify.payload)
+                if message["origin"] == self.origin:
+                    continue
+                for table, user_id, version in message["changes"]:
+                    if version > self._after and version not in self._seen:
+                        self._seen.add(version)
+                        changes.setdefault(table, set()).add(user_id)
+                        lags.append(now - message["sent_at"])
+        if changes:
+            with SessionLocal() as db:
+                self._apply(db, changes, lags)
+
+    def poll(self) -> None:
+        """Apply every change_log row not applied yet, then advance past the settled ones."""
+        with SessionLocal() as db:
+            after, settled_to = self._after, None
+            while True:
+                rows = db.execute(
+                    select(ChangeLog.id, ChangeLog.origin, ChangeLog.table_name, ChangeLog.user_id, ChangeLog.changed_at)
+                    .where(ChangeLog.id > after)
+                    .order_by(ChangeLog.id)
+                    .limit(settings.CHANGE_POLL_BATCH)
+                ).all()
+                now = datetime.utcnow()
+                settled = now - timedelta(seconds=settings.CHANGE_SETTLE_SECONDS)
+                changes: Changes = {}
+                lags: List[float] = []
+                with self._lock:
+                    for version, origin, table, user_id, changed_at in rows:
+                        if changed_at <= settled:
+                            settled_to = version
+                        if version in self._seen:
+                            continue
+                        self._seen.add(version)
+                        if origin != self.origin:
+                            changes.setdefault(table, set()).add(user_id)
+                            lags.append((now - changed_at).total_seconds())
+                self._apply(db, changes, lags)
+                if len(rows) < settings.CHANGE_POLL_BATCH:
+                    break
+                after = rows[-1][0]
+
+            # A row older than CHANGE_SETTLE_SECONDS means every transaction that
+            # took a lower id has committed or rolled back by now.
+            if settled_to is not None:
+                with self._lock:
+                    self._after = max(self._after, settled_to)
+                    self._seen = {version for version in self._seen if version > self._after}
+            if time.monotonic() - self._last_prune >= PRUNE_INTERVAL_SECONDS:
+                self._prune(db)
+        self.last_poll_at = time.monotonic()
+
+    def _prune(self, db: Session) -> None:
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.CHANGE_LOG_RETENTION_SECONDS)
+        pruned = db.execute(delete(ChangeLog).where(ChangeLog.changed_at < cutoff)).rowcount
+        db.commit()
+        self._last_prune = time.monotonic()
+        if pruned:
+            logger.info(f"Pruned {pruned} change_log rows older than {settings.CHANGE_LOG_RETENTION_SECONDS}s")
+
+    def _apply(self, db: Session, changes: Changes, lags: List[float]) -> None:
+        if not changes:
+            return
+        for callback in self._subscribers:
+            try:
+                callback(db, changes)
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Applying changes of {len(lags)} users failed in {callback.__qualname__}: {str(e)}")
+        with self._lock:
+            self.applied += len(lags)
+            for lag in lags:
+                self.lag_seconds.observe(max(lag, 0.0))
+
+    def status(self) -> Dict[str, object]:
+        with self._lock:
+            lag_seconds = self.lag_seconds.snapshot()
+            applied, version = self.applied, self._after
+        return {
+            "enabled": settings.CHANGE_FEED_ENABLED,
+            "running": self._thread is not None,
+            "listening": self.listening,
+            "is_current": self.is_current,
+            "seconds_since_poll": time.monotonic() - self.last_poll_at if self.last_poll_at is not None else None,
+            "settled_version": version,
+            "applied": applied,
+            "errors": self.errors,
+            "lag_seconds": lag_seconds,
+        }
+
+
+def _payloads(origin: str, sent_at: float, notices: List[list]) -> Iterator[str]:
+    """NOTIFY payloads carrying ``notices``, NOTIFY_PAYLOAD_BYTES of them at most in each."""
+    chunk, size = [], 0
+    for notice in notices:
+        notice_size = len(json.dumps(notice)) + 2
+        if chunk and size + notice_size > NOTIFY_PAYLOAD_BYTES:
+            yield json.dumps({"origin": origin, "sent_at": sent_at, "changes": chunk})
+            chunk, size = [], 0
+        chunk.append(notice)
+        size += notice_size
+    if chunk:
+        yield json.dumps({"origin": origin, "sent_at": sent_at, "changes": chunk})
+
+
+def _close_quietly(connection) -> None:
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+def record_changes(db: Session, *user_ids: str) -> None:
+    """Publish a change of ``user_ids`` to the other workers when ``db`` commits."""
+    db.info.setdefault(CHANGED_KEY, set()).update(user_ids)
+
+
+def note_written(db: Session, *models) -> None:
+    """Record writes the session cannot see, such as driver-level executemany, under their tables."""
+    db.info.setdefault(WRITTEN_TABLES_KEY, set()).update(model.__tablename__ for model in models)
+
+
+change_feed = ChangeFeed()
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _note_statement_table(state) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        name = getattr(getattr(state.statement, "table", None), "name", None)
+        if name in change_feed.watched:
+            state.session.info.setdefault(WRITTEN_TABLES_KEY, set()).add(name)
+
+
+@event.listens_for(Session, "after_flush")
+def _note_flushed_tables(session: Session, flush_context) -> None:
+    tables = change_feed.tables_of(chain(session.new, session.dirty, session.deleted))
+    if tables:
+        session.info.setdefault(WRITTEN_TABLES_KEY, set()).update(tables)
+
+
+@event.listens_for(Session, "before_commit")
+def _publish_changes(session: Session) -> None:
+    change_feed.publish(session)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _forget_changes(session: Session) -> None:
+    session.info.pop(CHANGED_KEY, None)
+    session.info.pop(WRITTEN_TABLES_KEY, None)
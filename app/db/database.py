@@ -1,15 +1,22 @@
-import os
 import logging
-from dotenv import load_dotenv
+from fastapi import Request
+from typing import Iterable, List
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from app.core.config import settings
+from app.db.pool import PoolMetrics, metered_pool
+from app.db.replicas import ReadRouter
+from app.dto.lookup import UserIdsLookup
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
+DATABASE_URL = settings.DATABASE_URL
 
 if not DATABASE_URL:
     logger.error("DATABASE_URL environment variable not found. Please check your .env file.")
@@ -23,8 +30,26 @@ try:
 except Exception as e:
     logger.info(f"Using database URL: [URL parsing error - showing truncated] {DATABASE_URL.split('://')[0]}://...")
 
+def engine_options(url, pool_class) -> dict:
+    """Pool arguments from Settings, with a metered ``pool_class``.
+
+    In-memory SQLite keeps its single-connection pool.
+    """
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "poolclass": metered_pool(pool_class, PoolMetrics()),
+        "pool_size": settings.DATABASE_POOL_SIZE,
+        "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+        "pool_timeout": settings.DATABASE_POOL_TIMEOUT,
+        "pool_recycle": settings.DATABASE_POOL_RECYCLE,
+        "pool_pre_ping": settings.DATABASE_POOL_PRE_PING,
+    }
+
+
 try:
-    engine = create_engine(DATABASE_URL)
+    engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL, QueuePool))
     
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     
@@ -35,9 +60,119 @@ except Exception as e:
     logger.error(f"Error connecting to database: {str(e)}")
     raise
 
+read_engines = [
+    create_engine(url, **engine_options(url, QueuePool))
+    for url in settings.read_database_urls
+]
+ReadSessionLocals = [sessionmaker(autocommit=False, autoflush=False, bind=read_engine) for read_engine in read_engines]
+read_router = ReadRouter(len(read_engines), settings.READ_YOUR_WRITES_SECONDS, settings.READ_REPLICA_RETRY_SECONDS)
+for read_engine in read_engines:
+    logger.info(f"Using read replica: {read_engine.url.render_as_string(hide_password=True)}")
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str):
+    """``url`` with its driver swapped for the asyncio one of the same backend."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend} databases")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+async_engine = None
+AsyncSessionLocal = None
+async_read_engines = []
+AsyncReadSessionLocals = []
+
+if settings.DATABASE_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    ASYNC_DATABASE_URL = async_database_url(DATABASE_URL)
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        **engine_options(ASYNC_DATABASE_URL, AsyncAdaptedQueuePool)
+    )
+    # Handlers return ORM rows after committing; expiring them would need another await.
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    logger.info(f"Async database driver: {async_engine.dialect.driver}")
+    
+    for url in map(async_database_url, settings.read_database_urls):
+        async_read_engines.append(create_async_engine(url, **engine_options(url, AsyncAdaptedQueuePool)))
+    AsyncReadSessionLocals = [
+        async_sessionmaker(read_engine, autoflush=False, expire_on_commit=False)
+        for read_engine in async_read_engines
+    ]
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def _read_user_ids(request: Request) -> List[str]:
+    """Users a read-only request is about: its user_id path parameter and user_ids query."""
+    user_ids = [user_id for value in request.query_params.getlist("user_ids") for user_id in value.split(",")]
+    if "user_id" in request.path_params:
+        user_ids.append(request.path_params["user_id"])
+    return user_ids
+
+def open_read_session(user_ids: Iterable[str] = ()) -> Session:
+    """Session on the next healthy replica, else the primary; the caller closes it."""
+    if not read_router.wrote_recently(user_ids):
+        for index in read_router.in_turn():
+            db = ReadSessionLocals[index]()
+            try:
+                db.connection()
+                return db
+            except DBAPIError as e:
+                db.close()
+                read_router.mark_down(index, e)
+    return SessionLocal()
+
+def get_read_db(request: Request):
+    """Session for a read-only endpoint: the next healthy replica, else the primary."""
+    db = open_read_session(_read_user_ids(request))
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_lookup_read_db(lookup: UserIdsLookup):
+    """get_read_db for a POST lookup, whose user ids come in the body."""
+    db = open_read_session(lookup.user_ids)
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def open_async_read_session(user_ids: Iterable[str] = ()):
+    if not read_router.wrote_recently(user_ids):
+        for index in read_router.in_turn():
+            db = AsyncReadSessionLocals[index]()
+            try:
+                await db.connection()
+                return db
+            except DBAPIError as e:
+                await db.close()
+                read_router.mark_down(index, e)
+    return AsyncSessionLocal()
+
+async def get_async_read_db(request: Request):
+    async with await open_async_read_session(_read_user_ids(request)) as db:
+        yield db
+
+async def get_async_lookup_read_db(lookup: UserIdsLookup):
+    async with await open_async_read_session(lookup.user_ids) as db:
+        yield db
+ 
\ No newline at end of file
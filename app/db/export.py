@@ -0,0 +1,192 @@
+import csv
+import io
+import json
+import logging
+import time
+from itertools import repeat
+from operator import is_not
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select, union
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.dto.export import ExportFormat
+from app.matching.codec import get_codec
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+}
+
+
+class TableExport:
+    """Full snapshot of preference tables, encoded as it is read from a server-side cursor.
+
+    ``models`` maps section name to model. A single section exports that
+    table; several export one row per user, every table LEFT JOINed onto the
+    union of their user ids, with columns named ``section.column``.
+
+    With ``packed`` each table's Boolean columns collapse into one column
+    holding the table's BitCodec mask as a hex integer (bit ``i`` is the
+    i-th column of the codec); a user missing from a table gets null.
+    Parquet stores unpacked Boolean columns one bit per value already.
+
+    ``rows`` and ``seconds`` grow as the export is read.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        models: Dict[str, type],
+        export_format: ExportFormat,
+        packed: bool = False,
+        batch_size: Optional[int] = None
+    ):
+        self.name = name
+        self.models = models
+        self.export_format = ExportFormat(export_format)
+        self.packed = packed
+        self.batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+        self.rows = 0
+        self.seconds = 0.0
+
+        joined = len(models) > 1
+        self.header: List[str] = ["user_id"]
+        self._slices = []
+        position = 1
+        for section, model in models.items():
+            columns = get_codec(model).columns
+            self._slices.append((position, position + len(columns)))
+            position += len(columns)
+            if packed:
+                self.header.append(section)
+            else:
+                self.header.extend(f"{section}.{column}" if joined else column for column in columns)
+        self.types = [str] + [str if packed else bool] * (len(self.header) - 1)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def chunks(self, db: Session) -> Iterator[bytes]:
+        start = time.perf_counter()
+        for chunk in WRITERS[self.export_format](self.header, self.types, self._batches(db, start)):
+            yield chunk
+        self.seconds = time.perf_counter() - start
+        logger.info(
+            f"Exported {self.rows} {self.name} rows as {self.export_format.value} "
+            f"in {self.seconds:.2f}s ({self.rows_per_second:.0f} rows/s)"
+        )
+
+    def _batches(self, db: Session, start: float) -> Iterator[Sequence[Sequence[Any]]]:
+        result = db.execute(self._statement(), execution_options={"yield_per": self.batch_size})
+        for rows in result.partitions():
+            self.rows += len(rows)
+            self.seconds = time.perf_counter() - start
+            yield self._pack(rows) if self.packed else rows
+
+    def _statement(self):
+        columns = [
+            model.__table__.c[column].label(f"{section}.{column}")
+            for section, model in self.models.items()
+            for column in get_codec(model).columns
+        ]
+        if len(self.models) == 1:
+            model, = self.models.values()
+            return select(model.user_id, *columns).order_by(model.user_id)
+
+        ids = union(*(select(model.user_id.label("user_id")) for model in self.models.values())).subquery("ids")
+        statement = select(ids.c.user_id, *columns).select_from(ids)
+        for model in self.models.values():
+            statement = statement.outerjoin(model, model.user_id == ids.c.user_id)
+        return statement.order_by(ids.c.user_id)
+
+    def _pack(self, rows: Sequence[Sequence[Any]]) -> List[tuple]:
+        width = self._slices[-1][1]
+        # bytes() of the row's truth values gives a 0/1 byte per column without a Python-level loop.
+        flags = np.frombuffer(b"".join(bytes(map(bool, row)) for row in rows), dtype=np.uint8).reshape(len(rows), width)
+        if len(self.models) > 1:
+            present = np.frombuffer(
+                b"".join(bytes(map(is_not, row, repeat(None))) for row in rows), dtype=np.uint8
+            ).reshape(len(rows), width)
+        packed_columns = [[row[0] for row in rows]]
+        for start, stop in self._slices:
+            words = np.packbits(flags[:, start:stop], axis=1, bitorder="little")
+            masks = [format(int.from_bytes(word, "little"), "x") for word in map(bytes, words)]
+            if len(self.models) > 1:
+                masks = [mask if is_present else None for mask, is_present in zip(masks, present[:, start:stop].any(axis=1))]
+            packed_columns.append(masks)
+        return list(zip(*packed_columns))
+
+def _write_ndjson(header: List[str], types: List[type], batches) -> Iterator[bytes]:
+    for rows in batches:
+        yield "".join(json.dumps(dict(zip(header, row))) + "\n" for row in rows).encode()
+
+
+def _write_csv(header: List[str], types: List[type], batches) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink:
+    """Write-only file that hands back what was written since the last drain."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _write_parquet(header: List[str], types: List[type], batches) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(name, pa.bool_() if kind is bool else pa.string()) for name, kind in zip(header, types)])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema)
+    # One row group per batch, each sent as soon as it is encoded.
+    for rows in batches:
+        arrays = [pa.array(column, type=field.type) for column, field in zip(zip(*rows), schema)]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+WRITERS = {
+    ExportFormat.NDJSON: _write_ndjson,
+    ExportFormat.CSV: _write_csv,
+    ExportFormat.PARQUET: _write_parquet,
+}
@@ -0,0 +1,94 @@
+import json
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from fastapi import HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import open_read_session
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def keyset_page(db: Session, model, cursor: Optional[str], limit: int, response: Response) -> List[Any]:
+    """One page of ``model`` rows in user_id order, starting after ``cursor``.
+
+    The page seeks to the cursor on the user_id primary key, so a page deep
+    into the table costs the same as the first. When the page is full, the
+    user_id of its last row goes out as the X-Next-Cursor header; the body
+    stays a plain list.
+    """
+    query = db.query(model)
+    if cursor is not None:
+        query = query.filter(model.user_id > cursor)
+    rows = query.order_by(model.user_id).limit(limit).all()
+    if len(rows) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = rows[-1].user_id
+    return rows
+
+
+def user_ids_query(
+    user_ids: Optional[List[str]] = Query(None, description="Users to fetch, repeated or comma-separated")
+) -> Optional[List[str]]:
+    """The ``user_ids`` of a multi-get GET, deduplicated in request order; None when absent."""
+    if not user_ids:
+        return None
+    user_ids = list(dict.fromkeys(user_id.strip() for value in user_ids for user_id in value.split(",") if user_id.strip()))
+    if len(user_ids) > settings.MULTI_GET_MAX_IDS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {settings.MULTI_GET_MAX_IDS} user_ids per request"
+        )
+    return user_ids or None
+
+
+def fetch_by_user_ids(
+    db: Session,
+    model,
+    user_ids: List[str],
+    serialize: Optional[Callable[[Any], Any]] = None
+) -> Dict[str, Any]:
+    """``model`` rows of ``user_ids`` read with one WHERE user_id IN (...).
+
+    Keyed by user_id in request order, with None for users that have no row.
+    """
+    rows = {row.user_id: row for row in db.query(model).filter(model.user_id.in_(user_ids))}
+    return {
+        user_id: (serialize(rows[user_id]) if serialize else rows[user_id]) if user_id in rows else None
+        for user_id in user_ids
+    }
+
+
+def stream_ndjson(model, serialize: Callable[[Any], Any], cursor: Optional[str] = None) -> StreamingResponse:
+    """Every ``model`` row after ``cursor`` as newline-delimited JSON, in user_id order.
+
+    Rows are read through a server-side cursor LIST_STREAM_BATCH_SIZE at a
+    time, so a full table dump runs in constant memory. The stream opens its
+    own sync read session: it outlives the request's session, and under
+    DATABASE_ASYNC it runs on the threadpool like any other sync iterator.
+    A client whose dump breaks off resumes with the last user_id it got.
+    """
+    return StreamingResponse(_ndjson_lines(model, serialize, cursor), media_type=NDJSON_MEDIA_TYPE)
+
+
+def _ndjson_lines(model, serialize: Callable[[Any], Any], cursor: Optional[str]) -> Iterator[str]:
+    statement = select(model).order_by(model.user_id)
+    if cursor is not None:
+        statement = statement.where(model.user_id > cursor)
+    statement = statement.execution_options(yield_per=settings.LIST_STREAM_BATCH_SIZE)
+    db = open_read_session()
+    try:
+        for rows in db.execute(statement).scalars().partitions():
+            yield "".join(_ndjson_line(serialize(row)) for row in rows)
+    finally:
+        db.close()
+
+
+def _ndjson_line(item: Any) -> str:
+    if isinstance(item, BaseModel):
+        return item.model_dump_json() + "\n"
+    return json.dumps(item) + "\n"
@@ -0,0 +1,100 @@
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Sequence
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+# Upper bounds, in seconds, of the checkout wait histogram buckets.
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram, in the shape Prometheus histograms use."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        cumulative, buckets = 0, {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self.count
+        return {"buckets": buckets, "count": self.count, "sum": self.sum}
+
+
+class PoolMetrics:
+    """Checkout counters of one engine's pool; they survive pool recreation."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = Histogram(WAIT_BUCKETS)
+        self._lock = threading.Lock()
+
+    def record_checkout(self, waited: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds.observe(waited)
+
+    def record_timeout(self, waited: float) -> None:
+        with self._lock:
+            self.timeouts += 1
+            self.wait_seconds.observe(waited)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds": self.wait_seconds.snapshot(),
+            }
+
+
+class _MeteredPool:
+    """Mixin timing every checkout of a QueuePool, including the wait for a free slot."""
+
+    metrics: PoolMetrics
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.metrics.record_timeout(time.perf_counter() - start)
+            raise
+        self.metrics.record_checkout(time.perf_counter() - start)
+        return connection
+
+
+def metered_pool(pool_class, metrics: PoolMetrics):
+    """A subclass of ``pool_class`` reporting its checkouts to ``metrics``."""
+    return type(f"Metered{pool_class.__name__}", (_MeteredPool, pool_class), {"metrics": metrics})
+
+
+def pool_status(pool) -> Dict[str, Any]:
+    """Live occupancy of ``pool`` plus its checkout counters when it is metered."""
+    status: Dict[str, Any] = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            # Negative while the pool has not yet opened pool_size connections.
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+        })
+    if isinstance(pool, _MeteredPool):
+        status.update(pool.metrics.snapshot())
+    return status
@@ -0,0 +1,56 @@
+import itertools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List
+
+logger = logging.getLogger(__name__)
+
+
+class ReadRouter:
+    """Picks the replica, by index, that a read-only request goes to.
+
+    Replicas are handed out round-robin, skipping any that failed to connect
+    in the last ``retry_seconds``. Users written through this process in the
+    last ``read_your_writes_seconds`` are read from the primary, so a client
+    never reads its own write back from a replica that has not caught up.
+    """
+
+    def __init__(self, replica_count: int, read_your_writes_seconds: float, retry_seconds: float):
+        self.replica_count = replica_count
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self.retry_seconds = retry_seconds
+        self._turn = itertools.count()
+        self._down_until = [0.0] * replica_count
+        self._recent_writes: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def note_writes(self, user_ids: Iterable[str]) -> None:
+        if not self.replica_count:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for user_id in user_ids:
+                self._recent_writes[user_id] = now
+                self._recent_writes.move_to_end(user_id)
+            expired = now - self.read_your_writes_seconds
+            while self._recent_writes and next(iter(self._recent_writes.values())) < expired:
+                self._recent_writes.popitem(last=False)
+
+    def wrote_recently(self, user_ids: Iterable[str]) -> bool:
+        expired = time.monotonic() - self.read_your_writes_seconds
+        return any(self._recent_writes.get(user_id, expired) > expired for user_id in user_ids)
+
+    def in_turn(self) -> List[int]:
+        """Replica indexes to try for one request, next in rotation first, failed ones left out."""
+        if not self.replica_count:
+            return []
+        start = next(self._turn) % self.replica_count
+        now = time.monotonic()
+        ordered = list(range(start, self.replica_count)) + list(range(start))
+        return [index for index in ordered if self._down_until[index] <= now]
+
+    def mark_down(self, index: int, error: Exception) -> None:
+        self._down_until[index] = time.monotonic() + self.retry_seconds
+        logger.warning(f"Read replica {index} unavailable, skipping it for {self.retry_seconds}s: {str(error)}")
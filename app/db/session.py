@@ -1,4 +1,11 @@
-from app.db.database import get_db
+from app.db.database import (
+    get_async_db,
+    get_async_lookup_read_db,
+    get_async_read_db,
+    get_db,
+    get_lookup_read_db,
+    get_read_db,
+)
 
-# Re-export the get_db function
-__all__ = ["get_db"] 
\ No newline at end of file
+# Re-export the session dependencies
+__all__ = ["get_db", "get_read_db", "get_lookup_read_db", "get_async_db", "get_async_read_db", "get_async_lookup_read_db"]
\ No newline at end of file
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+
+from app.core.config import settings
+
+_flights: List["SingleFlight"] = []
+
+
+class _Call:
+    __slots__ = ("done", "completed", "result", "error", "futures")
+
+    def __init__(self):
+        self.done = threading.Event()
+        # False when the running call was interrupted (a cancelled request)
+        # rather than returning or raising; its waiters then run their own.
+        self.completed = False
+        self.result: Any = None
+        self.error: Optional[Exception] = None
+        self.futures: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one.
+
+    The first caller of a key runs the call; callers arriving while it runs
+    wait for it and share its result, or its exception, instead of running
+    their own. A waiter gives up after ``timeout`` seconds and runs the call
+    itself. Inside ``AsyncSession.run_sync`` a waiter waits on the event
+    loop, which the running call needs for its own queries, instead of
+    blocking it.
+    """
+
+    def __init__(self, name: str, timeout: float):
+        self.name = name
+        self.timeout = timeout
+        self.calls = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.shared_errors = 0
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        _flights.append(self)
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        if not settings.SINGLE_FLIGHT_ENABLED:
+            return fn()
+        future = None
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            elif in_greenlet():
+                loop = asyncio.get_running_loop()
+                future = loop.create_future()
+                call.futures.append((loop, future))
+        if leader:
+            return self._run(key, call, fn)
+
+        if not self._wait(call, future, self.timeout if timeout is None else timeout):
+            with self._lock:
+                self.timeouts += 1
+            return fn()
+        if not call.completed:
+            return fn()
+        with self._lock:
+            self.coalesced += 1
+            if call.error is not None:
+                self.shared_errors += 1
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def forget(self, *keys: Hashable) -> None:
+        """Let the next caller of ``keys`` start a new call instead of joining one already running.
+
+        For keys whose data just changed: the running call may have read it
+        before the change.
+        """
+        with self._lock:
+            for key in keys:
+                self._calls.pop(key, None)
+
+    def _run(self, key: Hashable, call: _Call, fn: Callable[[], Any]) -> Any:
+        try:
+            call.result = fn()
+            call.completed = True
+            return call.result
+        except Exception as e:
+            call.error = e
+            call.completed = True
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                futures, call.futures = call.futures, []
+                call.done.set()
+            for loop, future in futures:
+                loop.call_soon_threadsafe(_resolve, future)
+
+    @staticmethod
+    def _wait(call: _Call, future: Optional[asyncio.Future], timeout: float) -> bool:
+        if future is None:
+            return call.done.wait(timeout)
+        try:
+            await_only(asyncio.wait_for(future, timeout))
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "timeouts": self.timeouts,
+                "shared_errors": self.shared_errors,
+                "in_flight": len(self._calls),
+                "timeout": self.timeout,
+            }
+
+
+def _resolve(future: asyncio.Future) -> None:
+    # A waiter that timed out has cancelled its future already.
+    if not future.done():
+        future.set_result(None)
+
+
+def single_flight_status() -> Dict[str, Dict[str, Any]]:
+    return {flight.name: flight.status() for flight in _flights}
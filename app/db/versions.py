@@ -0,0 +1,80 @@
+import hashlib
+import logging
+from datetime import datetime
+from typing import Optional, Sequence, Set
+
+from fastapi import Request
+from sqlalchemy import Integer, inspect, literal, select, text, union_all
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+VERSION_COLUMN = "version"
+UPDATED_AT_COLUMN = "updated_at"
+# Every versioned table indexes (user_id, version, updated_at), which covers
+# the version-only lookup of conditional GETs in current_etag.
+VERSION_COLUMNS = (VERSION_COLUMN, UPDATED_AT_COLUMN)
+
+
+def is_versioned(model) -> bool:
+    return VERSION_COLUMN in model.__table__.c
+
+
+def current_etag(db: Session, models: Sequence, user_id: str) -> Optional[str]:
+    """ETag of the user's rows in ``models``, or None when there are none.
+
+    Reads only user_id, version and updated_at, which the version index
+    covers, so the lookup never touches the rows themselves. updated_at is
+    part of the tag because a row deleted and created again starts over at
+    version 1.
+    """
+    selects = [
+        select(literal(position, Integer).label("position"), model.version, model.updated_at).where(model.user_id == user_id)
+        for position, model in enumerate(models)
+    ]
+    statement = selects[0] if len(selects) == 1 else union_all(*selects)
+    rows = sorted(db.execute(statement).all())
+    if not rows:
+        return None
+    stamp = "|".join(f"{position}:{version}:{_timestamp(updated_at)}" for position, version, updated_at in rows)
+    return f'"{hashlib.blake2b(stamp.encode(), digest_size=12).hexdigest()}"'
+
+
+def _timestamp(updated_at: Optional[datetime]) -> str:
+    return updated_at.isoformat() if updated_at is not None else ""
+
+
+def if_none_match(request: Request) -> Set[str]:
+    """Entity tags of the request's If-None-Match header, weak ones compared as strong."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return set()
+    return {tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()}
+
+
+def migrate_version_columns(engine: Engine, models: Sequence) -> None:
+    """Add the version columns and version index to tables created before they existed.
+
+    create_all only creates missing tables. Rows that predate the columns
+    get version 1 and the migration time as updated_at.
+    """
+    columns = {model.__tablename__: {column["name"] for column in inspect(engine).get_columns(model.__tablename__)} for model in models}
+    with engine.begin() as connection:
+        preparer = connection.dialect.identifier_preparer
+        for model in models:
+            table = model.__table__
+            missing = [name for name in VERSION_COLUMNS if name not in columns[table.name]]
+            for name in missing:
+                column = table.c[name]
+                default = f" NOT NULL DEFAULT {column.server_default.arg}" if column.server_default is not None else ""
+                connection.execute(text(
+                    f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.quote(name)} "
+                    f"{column.type.compile(connection.dialect)}{default}"
+                ))
+            if UPDATED_AT_COLUMN in missing:
+                connection.execute(table.update().values({UPDATED_AT_COLUMN: datetime.utcnow()}))
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+            if missing:
+                logger.info(f"Added {', '.join(missing)} to {table.name}")
@@ -0,0 +1,104 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.db.versions import VERSION_COLUMN
+
+
+def row_values(record) -> Dict[str, Any]:
+    """Column values of an ORM instance, with column defaults for attributes never set."""
+    values = {}
+    for column in record.__table__.columns:
+        value = record.__dict__.get(column.key)
+        if value is None and column.default is not None:
+            if column.default.is_scalar:
+                value = column.default.arg
+            elif column.default.is_callable:
+                value = column.default.arg(None)
+        values[column.key] = value
+    return values
+
+
+def upsert_statement(db: Session, model, update_columns: Optional[Sequence[str]] = None):
+    """INSERT ... ON CONFLICT (primary key) DO UPDATE for the session's dialect.
+
+    ``update_columns`` defaults to every non-key column; an empty list means
+    DO NOTHING. Dialects without ON CONFLICT fall back to a plain INSERT.
+    A versioned row that is overwritten gets the next version.
+    """
+    table = model.__table__
+    keys = [column.name for column in table.primary_key.columns]
+    if update_columns is None:
+        update_columns = [column.name for column in table.columns if column.name not in keys]
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        statement = postgresql.insert(table)
+    elif dialect == "sqlite":
+        statement = sqlite.insert(table)
+    else:
+        return insert(table)
+    if not update_columns:
+        return statement.on_conflict_do_nothing(index_elements=keys)
+    set_ = {name: statement.excluded[name] for name in update_columns}
+    if VERSION_COLUMN in set_:
+        set_[VERSION_COLUMN] = table.c[VERSION_COLUMN] + 1
+    return statement.on_conflict_do_update(index_elements=keys, set_=set_)
+
+
+def upsert_rows(db: Session, model, rows: List[Dict[str, Any]], update_columns: Optional[Sequence[str]] = None) -> None:
+    """Upsert ``rows`` in the current transaction as one executemany.
+
+    The drivers batch an executemany INSERT into multi-row VALUES where they
+    can (psycopg2), or run the prepared statement per row (sqlite3).
+    """
+    if rows:
+        db.execute(upsert_statement(db, model, update_columns), rows)
+
+
+def _key_clause(model, values: Dict[str, Any]):
+    columns = model.__table__.primary_key.columns
+    return [column == values[column.key] for column in columns]
+
+
+def _affected(db: Session, statement, returning: bool) -> bool:
+    if returning:
+        table = statement.table
+        return db.execute(statement.returning(*table.primary_key.columns)).first() is not None
+    return db.execute(statement).rowcount > 0
+
+
+def insert_row(db: Session, record) -> bool:
+    """Insert ``record`` with one INSERT ... ON CONFLICT DO NOTHING.
+
+    Returns False when a row with the same primary key already exists, so the
+    caller can answer 400 without a SELECT first and without the race between
+    the check and the insert.
+    """
+    values = row_values(record)
+    statement = upsert_statement(db, type(record), [])
+    return _affected(db, statement.values(values), db.get_bind().dialect.insert_returning)
+
+
+def update_row(db: Session, record) -> bool:
+    """Overwrite every non-key column of the row ``record`` stands for with one UPDATE.
+
+    ``record`` is a transient instance built from the request, so the stored
+    row is never loaded. A versioned row gets the next version. Returns
+    False when there is no such row.
+    """
+    model = type(record)
+    values = row_values(record)
+    keys = {column.key for column in model.__table__.primary_key.columns}
+    changes = {name: value for name, value in values.items() if name not in keys}
+    if VERSION_COLUMN in changes:
+        changes[VERSION_COLUMN] = model.__table__.c[VERSION_COLUMN] + 1
+    statement = update(model.__table__).where(*_key_clause(model, values)).values(changes)
+    return _affected(db, statement, db.get_bind().dialect.update_returning)
+
+
+def delete_row(db: Session, model, **key: Any) -> bool:
+    """Delete the row with primary key ``key`` with one DELETE; False when there was none."""
+    statement = delete(model.__table__).where(*_key_clause(model, key))
+    return _affected(db, statement, db.get_bind().dialect.delete_returning)
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class BulkRowError(BaseModel):
+    index: int
+    user_id: Optional[str] = None
+    detail: str
+
+
+class BulkUpsertResponse(BaseModel):
+    received: int
+    written: int
+    errors: List[BulkRowError]
@@ -0,0 +1,12 @@
+from enum import Enum
+
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+    PARQUET = "parquet"
+
+
+class ImportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
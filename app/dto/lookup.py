@@ -0,0 +1,8 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+from app.core.config import settings
+
+
+class UserIdsLookup(BaseModel):
+    user_ids: List[str] = Field(..., min_length=1, max_length=settings.MULTI_GET_MAX_IDS)
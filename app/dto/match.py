@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from datetime import datetime
 from enum import Enum
+from typing import List, Optional
 
 class MatchStatus(Enum):
     REQUESTED = 0
@@ -25,4 +26,26 @@ class MatchResponse(BaseModel):
 
         
 class MessageResponse(BaseModel):
-    message: str 
\ No newline at end of file
+    message: str 
+
+class CandidateResponse(BaseModel):
+    user_id: str
+    score: float
+
+
+class CandidateListResponse(BaseModel):
+    user_id: str
+    candidates: List[CandidateResponse]
+
+
+class FeedCandidateResponse(BaseModel):
+    rank: int
+    user_id: str
+    score: float
+
+
+class FeedPageResponse(BaseModel):
+    user_id: str
+    computed_at: datetime
+    candidates: List[FeedCandidateResponse]
+    next_after_rank: Optional[int] = None
@@ -0,0 +1,71 @@
+from pydantic import BaseModel, Field, root_validator
+from typing import Optional
+
+from app.dto.age_range import AgeRangeCreate, AgeRangeResponse
+from app.dto.gender import GenderCreate, GenderResponse
+from app.dto.partner_age_range import PartnerAgeRangeCreate, PartnerAgeRangeResponse
+from app.dto.partner_children_expectations import PartnerChildrenExpectationsCreate, PartnerChildrenExpectationsResponse
+from app.dto.partner_ethnics import PartnerEthnicsCreate, PartnerEthnicsResponse
+from app.dto.partner_height import PartnerHeightCreate, PartnerHeightResponse
+from app.dto.partner_marriage_timeline import PartnerMarriageTimelineCreate, PartnerMarriageTimelineResponse
+from app.dto.partner_personality_traits import PartnerPersonalityTraitsCreate, PartnerPersonalityTraitsResponse
+from app.dto.prayer_frequency import PrayerFrequencyCreate, PrayerFrequencyResponse
+from app.dto.religious_level import ReligiousLevelCreate, ReligiousLevelResponse
+from app.dto.sects import SectsCreate, SectsResponse
+from app.dto.smoking_status import SmokingStatusCreate, SmokingStatusResponse
+
+PROFILE_SECTIONS = (
+    "gender",
+    "age_range",
+    "partner_age_range",
+    "partner_children_expectations",
+    "partner_ethnics",
+    "partner_height",
+    "partner_marriage_timeline",
+    "partner_personality_traits",
+    "prayer_frequency",
+    "religious_level",
+    "sects",
+    "smoking_status",
+)
+
+
+class ProfileCreate(BaseModel):
+    """Every section is validated by the resource's own create DTO; user_id is given once."""
+    user_id: str = Field(..., description="Unique identifier for the user")
+    gender: Optional[GenderCreate] = None
+    age_range: Optional[AgeRangeCreate] = None
+    partner_age_range: Optional[PartnerAgeRangeCreate] = None
+    partner_children_expectations: Optional[PartnerChildrenExpectationsCreate] = None
+    partner_ethnics: Optional[PartnerEthnicsCreate] = None
+    partner_height: Optional[PartnerHeightCreate] = None
+    partner_marriage_timeline: Optional[PartnerMarriageTimelineCreate] = None
+    partner_personality_traits: Optional[PartnerPersonalityTraitsCreate] = None
+    prayer_frequency: Optional[PrayerFrequencyCreate] = None
+    religious_level: Optional[ReligiousLevelCreate] = None
+    sects: Optional[SectsCreate] = None
+    smoking_status: Optional[SmokingStatusCreate] = None
+
+    @root_validator(pre=True)
+    def share_user_id(cls, values):
+        user_id = values.get("user_id")
+        for section in PROFILE_SECTIONS:
+            if isinstance(values.get(section), dict):
+                values[section] = {**values[section], "user_id": user_id}
+        return values
+
+
+class ProfileResponse(BaseModel):
+    user_id: str
+    gender: Optional[GenderResponse] = None
+    age_range: Optional[AgeRangeResponse] = None
+    partner_age_range: Optional[PartnerAgeRangeResponse] = None
+    partner_children_expectations: Optional[PartnerChildrenExpectationsResponse] = None
+    partner_ethnics: Optional[PartnerEthnicsResponse] = None
+    partner_height: Optional[PartnerHeightResponse] = None
+    partner_marriage_timeline: Optional[PartnerMarriageTimelineResponse] = None
+    partner_personality_traits: Optional[PartnerPersonalityTraitsResponse] = None
+    prayer_frequency: Optional[PrayerFrequencyResponse] = None
+    religious_level: Optional[ReligiousLevelResponse] = None
+    sects: Optional[SectsResponse] = None
+    smoking_status: Optional[SmokingStatusResponse] = None
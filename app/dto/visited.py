@@ -15,4 +15,16 @@ class VisitedUpdate(BaseModel):
 
 
 class MessageResponse(BaseModel):
-    message: str 
\ No newline at end of file
+    message: str 
+
+
+class VisitedFilterStatsResponse(BaseModel):
+    users: int
+    entries: int
+    memory_bytes: int
+    bit_array_bytes: int
+    memory_budget_bytes: int
+    target_fp_rate: float
+    configured_fp_rate: float
+    estimated_fp_rate: float
+    max_fp_rate: float
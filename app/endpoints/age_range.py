@@ -1,9 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Any, Dict, Optional, Union
 from datetime import datetime
 
-from app.db.database import get_db
+from app.core.config import settings
+from app.db.bulk import bulk_upsert
+from app.db.cache import preference_cache
+from app.db.listing import fetch_by_user_ids, keyset_page, stream_ndjson, user_ids_query
+from app.db.database import get_db, get_lookup_read_db, get_read_db
+from app.db.writes import delete_row, insert_row, update_row
+from app.matching.feed import record_profile_change
+from app.dto.bulk import BulkUpsertResponse
+from app.dto.lookup import UserIdsLookup
 from app.schemas.age_range import AgeRange
 from app.dto.age_range import AgeRangeCreate, AgeRangeUpdate, AgeRangeResponse, MessageResponse
 
@@ -34,31 +42,34 @@ def _calculate_age_range(birth_date_str: str):
             raise ValueError("Invalid date format. Please use YYYY-MM-DD format")
         raise e
 
+def build_age_range(age_range: AgeRangeCreate) -> AgeRange:
+    age_range_field = _calculate_age_range(age_range.date_of_birth)
+    
+    db_age_range = AgeRange(
+        user_id=age_range.user_id,
+        range_18_to_24=False,
+        range_25_to_34=False,
+        range_35_to_44=False,
+        range_above_44=False
+    )
+    
+    setattr(db_age_range, age_range_field, True)
+    
+    return db_age_range
+
 @router.post("", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
 def create_age_range(age_range: AgeRangeCreate, db: Session = Depends(get_db)):
     try:     
-        existing_record = db.query(AgeRangeScore).filter(AgeRangeScore.user_id == age_range.user_id).first()
-        if existing_record:
+        db_age_range = build_age_range(age_range)
+        
+        record_profile_change(db, age_range.user_id)
+        if not insert_row(db, db_age_range):
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Age range preference already exists for user {age_range.user_id}"
             )
-            
-        age_range_field = _calculate_age_range(age_range.date_of_birth)
-        
-        db_age_range = AgeRangeScore(
-            user_id=age_range.user_id,
-            range_18_to_24=False,
-            range_25_to_34=False,
-            range_35_to_44=False,
-            range_above_44=False
-        )
-        
-        setattr(db_age_range, age_range_field, True)
-        
-        db.add(db_age_range)
         db.commit()
-        db.refresh(db_age_range)
         
         return {"message": f"Age range preference for user {age_range.user_id} created successfully"}
     except ValueError as e:
@@ -69,11 +80,29 @@ def create_age_range(age_range: AgeRangeCreate, db: Session = Depends(get_db)):
         db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-@router.get("", response_model=List[AgeRangeResponse])
-def get_all_age_ranges(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@router.post("/bulk", response_model=BulkUpsertResponse)
+def bulk_upsert_age_range(
+    records: List[Dict[str, Any]] = Body(..., max_length=settings.BULK_MAX_ROWS),
+    db: Session = Depends(get_db)
+):
+    return bulk_upsert(db, records, AgeRangeCreate, build_age_range, record_profile_change)
+
+@router.get("", response_model=Union[List[AgeRangeResponse], Dict[str, Optional[AgeRangeResponse]]])
+def get_all_age_ranges(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.LIST_DEFAULT_LIMIT, ge=1, le=settings.LIST_MAX_LIMIT),
+    stream: bool = False,
+    user_ids: Optional[List[str]] = Depends(user_ids_query),
+    db: Session = Depends(get_read_db)
+):
     try:
-        age_ranges = db.query(AgeRangeScore).offset(skip).limit(limit).all()
-        if not age_ranges:
+        if user_ids:
+            return fetch_by_user_ids(db, AgeRange, user_ids)
+        if stream:
+            return stream_ndjson(AgeRange, AgeRangeResponse.model_validate, cursor)
+        age_ranges = keyset_page(db, AgeRange, cursor, limit, response)
+        if not age_ranges and cursor is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No age range records found")
         return age_ranges
     except HTTPException:
@@ -81,10 +110,15 @@ def get_all_age_ranges(skip: int = 0, limit: int = 100, db: Session = Depends(ge
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
+@router.post("/lookup", response_model=Dict[str, Optional[AgeRangeResponse]])
+def lookup_age_ranges(lookup: UserIdsLookup, db: Session = Depends(get_lookup_read_db)):
+    return fetch_by_user_ids(db, AgeRange, lookup.user_ids)
+
 @router.get("/{user_id}", response_model=AgeRangeResponse)
-def get_age_range(user_id: str, db: Session = Depends(get_db)):
+@preference_cache.read_through("age_range", AgeRangeResponse, [AgeRange])
+def get_age_range(user_id: str, db: Session = Depends(get_read_db)):
     try:
-        age_range = db.query(AgeRangeScore).filter(AgeRangeScore.user_id == user_id).first()
+        age_range = db.query(AgeRange).filter(AgeRange.user_id == user_id).first()
         if not age_range:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Age range not found for user {user_id}")
         return age_range
@@ -96,21 +130,13 @@ def get_age_range(user_id: str, db: Session = Depends(get_db)):
 @router.put("/{user_id}", response_model=MessageResponse)
 def update_age_range(user_id: str, age_range: AgeRangeUpdate, db: Session = Depends(get_db)):
     try:
-        db_age_range = db.query(AgeRangeScore).filter(AgeRangeScore.user_id == user_id).first()
-        if not db_age_range:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Age range not found for user {user_id}")
-        
-        age_range_field = _calculate_age_range(age_range.date_of_birth)
-        
-        db_age_range.range_18_to_24 = False
-        db_age_range.range_25_to_34 = False
-        db_age_range.range_35_to_44 = False
-        db_age_range.range_above_44 = False
-        
-        setattr(db_age_range, age_range_field, True)
+        db_age_range = build_age_range(AgeRangeCreate(user_id=user_id, **age_range.model_dump()))
         
+        record_profile_change(db, user_id)
+        if not update_row(db, db_age_range):
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Age range not found for user {user_id}")
         db.commit()
-        db.refresh(db_age_range)
         
         return {"message": f"Age range preference for user {user_id} updated successfully"}
     except ValueError as e:
@@ -124,11 +150,10 @@ def update_age_range(user_id: str, age_range: AgeRangeUpdate, db: Session = Depe
 @router.delete("/{user_id}", response_model=MessageResponse, status_code=status.HTTP_200_OK)
 def delete_age_range(user_id: str, db: Session = Depends(get_db)):
     try:
-        db_age_range = db.query(AgeRangeScore).filter(AgeRangeScore.user_id == user_id).first()
-        if not db_age_range:
+        record_profile_change(db, user_id)
+        if not delete_row(db, AgeRange, user_id=user_id):
+            db.rollback()
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Age range not found for user {user_id}")
-        
-        db.delete(db_age_range)
         db.commit()
         return {"message": f"Age range preference for user {user_id} deleted successfully"}
     except HTTPException:
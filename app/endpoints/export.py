@@ -0,0 +1,50 @@
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
+from typing import Dict, Iterator, Optional
+
+from app.db.database import open_read_session
+from app.db.export import MEDIA_TYPES, TableExport
+from app.dto.export import ExportFormat
+from app.endpoints.profile import PROFILE_MODELS
+
+router = APIRouter(
+    prefix="/export",
+    tags=["export"],
+    responses={404: {"description": "Not found"}},
+)
+
+# Dataset exporting every preference table joined per user.
+PROFILES = "profiles"
+
+
+def export_models(dataset: str) -> Optional[Dict[str, type]]:
+    """The tables behind ``dataset``: a profile section name, or PROFILES for all of them."""
+    if dataset == PROFILES:
+        return PROFILE_MODELS
+    if dataset in PROFILE_MODELS:
+        return {dataset: PROFILE_MODELS[dataset]}
+    return None
+
+
+def _stream(export: TableExport) -> Iterator[bytes]:
+    db = open_read_session()
+    try:
+        yield from export.chunks(db)
+    finally:
+        db.close()
+
+
+@router.get("/{dataset}")
+def export_dataset(dataset: str, format: ExportFormat = ExportFormat.NDJSON, packed: bool = False):
+    models = export_models(dataset)
+    if models is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown dataset {dataset}; expected {PROFILES} or one of {', '.join(PROFILE_MODELS)}"
+        )
+    export = TableExport(dataset, models, format, packed)
+    return StreamingResponse(
+        _stream(export),
+        media_type=MEDIA_TYPES[export.export_format],
+        headers={"Content-Disposition": f'attachment; filename="{dataset}.{export.export_format.value}"'}
+    )
@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Body
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Any, Dict, Optional
 
-from app.db.database import get_db
+from app.core.config import settings
+from app.db.bulk import bulk_upsert
+from app.db.cache import preference_cache
+from app.db.listing import fetch_by_user_ids, user_ids_query
+from app.db.database import get_db, get_lookup_read_db, get_read_db
+from app.db.writes import insert_row
+from app.matching.feed import record_profile_change
+from app.dto.bulk import BulkUpsertResponse
+from app.dto.lookup import UserIdsLookup
 from app.schemas.gender import Gender
 from app.dto.gender import (
     GenderCreate,
@@ -16,31 +24,35 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+def build_gender(gender: GenderCreate) -> Gender:
+    new_gender = Gender(user_id=gender.user_id)
+    
+    if gender.gender_score == 0:
+        new_gender.male = True
+        new_gender.female = False
+    elif gender.gender_score == 1:
+        new_gender.male = False
+        new_gender.female = True
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid gender_score. Must be 0 (male) or 1 (female)"
+        )
+    
+    return new_gender
+
 @router.post("", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
 def create_gender(gender: GenderCreate, db: Session = Depends(get_db)):
     try:
-        existing_record = db.query(GenderScore).filter(GenderScore.user_id == gender.user_id).first()
-        if existing_record:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"The record with id {gender.user_id} already exists"
-            )
+        new_gender = build_gender(gender)
         
-        new_gender = GenderScore(user_id=gender.user_id)
-        
-        if gender.gender_score == 0:
-            new_gender.male = True
-            new_gender.female = False
-        elif gender.gender_score == 1:
-            new_gender.male = False
-            new_gender.female = True
-        else:
+        record_profile_change(db, gender.user_id)
+        if not insert_row(db, new_gender):
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid gender_score. Must be 0 (male) or 1 (female)"
+                detail=f"The record with id {gender.user_id} already exists"
             )
-        
-        db.add(new_gender)
         db.commit()
         
         return MessageResponse(message=f"Gender preference for user {gender.user_id} created successfully")
@@ -55,9 +67,30 @@ def create_gender(gender: GenderCreate, db: Session = Depends(get_db)):
             detail=f"An error occurred while creating the gender preference: {str(e)}"
         )
 
+@router.post("/bulk", response_model=BulkUpsertResponse)
+def bulk_upsert_gender(
+    records: List[Dict[str, Any]] = Body(..., max_length=settings.BULK_MAX_ROWS),
+    db: Session = Depends(get_db)
+):
+    return bulk_upsert(db, records, GenderCreate, build_gender, record_profile_change)
+
+@router.get("", response_model=Dict[str, Optional[GenderResponse]])
+def get_genders(user_ids: Optional[List[str]] = Depends(user_ids_query), db: Session = Depends(get_read_db)):
+    if not user_ids:
+        raise HTTPException(
+            status_code=422,
+            detail="user_ids is required"
+        )
+    return fetch_by_user_ids(db, Gender, user_ids)
+
+@router.post("/lookup", response_model=Dict[str, Optional[GenderResponse]])
+def lookup_genders(lookup: UserIdsLookup, db: Session = Depends(get_lookup_read_db)):
+    return fetch_by_user_ids(db, Gender, lookup.user_ids)
+
 @router.get("/{user_id}", response_model=GenderResponse)
-def get_gender(user_id: str, db: Session = Depends(get_db)):
-    gender = db.query(GenderScore).filter(GenderScore.user_id == user_id).first()
+@preference_cache.read_through("gender", GenderResponse, [Gender])
+def get_gender(user_id: str, db: Session = Depends(get_read_db)):
+    gender = db.query(Gender).filter(Gender.user_id == user_id).first()
     if not gender:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
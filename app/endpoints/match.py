@@ -1,11 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import uuid
 from datetime import datetime
 
-from app.dto.match import CreateMatch, MatchResponse, MatchStatus, MessageResponse
+from app.dto.match import CreateMatch, MatchResponse, MatchStatus, MessageResponse, CandidateListResponse, CandidateResponse, FeedCandidateResponse, FeedPageResponse
+from app.core.config import settings
 from app.db.session import get_db
+from app.matching.engine import candidate_engine, candidate_flights
+from app.matching.feed import FeedRebuilt, get_feed_page, record_match
+from app.matching.pairs import canonical_pair, pair_index
 from app.schemas.match import Match
 
 router = APIRouter(
@@ -18,29 +23,31 @@ router = APIRouter(
 @router.post("/relationship", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
 def create_match(match_data: CreateMatch, db: Session = Depends(get_db)):
 
-    existing_match = db.query(Match).filter(
-        ((Match.partner_id_1 == match_data.partner_id_1) & (Match.partner_id_2 == match_data.partner_id_2)) |
-        ((Match.partner_id_1 == match_data.partner_id_2) & (Match.partner_id_2 == match_data.partner_id_1))
-    ).first()
-    
-    if existing_match:
+    pair_index.ensure_loaded(db)
+    if pair_index.get(match_data.partner_id_1, match_data.partner_id_2) is not None:
         raise HTTPException(status_code=400, detail="A match already exists between these users")
     
+    partner_id_1, partner_id_2 = canonical_pair(match_data.partner_id_1, match_data.partner_id_2)
     new_match = Match(
-        partner_id_1=match_data.partner_id_1,
-        partner_id_2=match_data.partner_id_2,
+        partner_id_1=partner_id_1,
+        partner_id_2=partner_id_2,
         match_status=match_data.match_status.value,
+        requested_by=match_data.partner_id_1,
         created_at=datetime.utcnow()
     )
     
     try:
         db.add(new_match)
+        record_match(db, partner_id_1, partner_id_2, new_match.match_status)
         db.commit()
-        db.refresh(new_match)
         
         return MessageResponse(
             message=f"Match created successfully between {match_data.partner_id_1} and {match_data.partner_id_2}"
         )
+    except IntegrityError:
+        # A pair this worker's index has not seen yet.
+        db.rollback()
+        raise HTTPException(status_code=400, detail="A match already exists between these users")
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
@@ -56,6 +63,7 @@ def accept_match(partner_id_1: str, partner_id_2: str, db: Session = Depends(get
     match.match_status = MatchStatus.MATCHED.value
     
     try:
+        record_match(db, match.partner_id_1, match.partner_id_2, match.match_status)
         db.commit()
         db.refresh(match)
         
@@ -79,6 +87,7 @@ def decline_match(partner_id_1: str, partner_id_2: str, db: Session = Depends(ge
     match.match_status = MatchStatus.DECLINED.value
     
     try:
+        record_match(db, match.partner_id_1, match.partner_id_2, match.match_status)
         db.commit()
         db.refresh(match)
         
@@ -92,13 +101,54 @@ def decline_match(partner_id_1: str, partner_id_2: str, db: Session = Depends(ge
         db.rollback()
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
-def _get_match(partner_id_1: str, partner_id_2: str, db: Session):
-    match = db.query(Match).filter(
-        ((Match.partner_id_1 == partner_id_1) & (Match.partner_id_2 == partner_id_2)) |
-        ((Match.partner_id_1 == partner_id_2) & (Match.partner_id_2 == partner_id_1))
-    ).first()
+@router.get("/candidates/{user_id}", response_model=CandidateListResponse)
+def get_candidates(
+    user_id: str,
+    limit: int = Query(settings.CANDIDATE_DEFAULT_LIMIT, ge=1, le=settings.CANDIDATE_MAX_LIMIT),
+    db: Session = Depends(get_db)
+):
+    candidate_engine.ensure_loaded(db)
+    
+    candidates = candidate_flights.do(("top", user_id, limit), lambda: candidate_engine.top_candidates(user_id, limit))
+    if candidates is None:
+        raise HTTPException(status_code=404, detail=f"No preferences found for user {user_id}")
+    
+    return CandidateListResponse(
+        user_id=user_id,
+        candidates=[CandidateResponse(user_id=candidate_id, score=score) for candidate_id, score in candidates]
+    )
+
+@router.get("/feed/{user_id}", response_model=FeedPageResponse)
+def get_feed(
+    user_id: str,
+    after_rank: int = Query(0, ge=0),
+    limit: int = Query(settings.CANDIDATE_DEFAULT_LIMIT, ge=1, le=settings.CANDIDATE_MAX_LIMIT),
+    computed_at: Optional[datetime] = Query(None, description="computed_at of the first page, pinning the feed later pages read"),
+    db: Session = Depends(get_db)
+):
+    try:
+        page = get_feed_page(db, user_id, after_rank, limit, computed_at)
+    except FeedRebuilt as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if page is None:
+        raise HTTPException(status_code=404, detail=f"No preferences found for user {user_id}")
     
+    computed_at, rows = page
+    return FeedPageResponse(
+        user_id=user_id,
+        computed_at=computed_at,
+        candidates=[FeedCandidateResponse(rank=row.rank, user_id=row.candidate_id, score=row.score) for row in rows],
+        next_after_rank=rows[-1].rank if len(rows) == limit else None
+    )
+
+def _get_match(partner_id_1: str, partner_id_2: str, db: Session):
+    # The database decides: the pair index may not have seen a match another
+    # worker wrote yet.
+    pair_index.ensure_loaded(db)
+    match = db.get(Match, canonical_pair(partner_id_1, partner_id_2))
     if not match:
         raise HTTPException(status_code=404, detail="Match not found")
     
+    if pair_index.get(partner_id_1, partner_id_2) is None:
+        pair_index.set(match.partner_id_1, match.partner_id_2, match.match_status)
     return match
@@ -0,0 +1,32 @@
+from fastapi import APIRouter
+from typing import Any, Dict
+
+from app.db import database
+from app.db.cache import preference_cache
+from app.db.changes import change_feed
+from app.db.pool import pool_status
+from app.db.singleflight import single_flight_status
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["metrics"],
+)
+
+
+# async so it answers from the event loop even while every threadpool
+# worker is queued on a pool checkout.
+@router.get("", response_model=Dict[str, Any])
+async def get_metrics():
+    pools = {"sync": pool_status(database.engine.pool)}
+    for index, read_engine in enumerate(database.read_engines):
+        pools[f"read_{index}"] = pool_status(read_engine.pool)
+    if database.async_engine is not None:
+        pools["async"] = pool_status(database.async_engine.pool)
+        for index, read_engine in enumerate(database.async_read_engines):
+            pools[f"async_read_{index}"] = pool_status(read_engine.pool)
+    return {
+        "database_pools": pools,
+        "cache": preference_cache.status(),
+        "changes": change_feed.status(),
+        "single_flight": single_flight_status(),
+    }
@@ -1,9 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Any, Dict, Optional, Union
 from datetime import datetime
 
-from app.db.database import get_db
+from app.core.config import settings
+from app.db.bulk import bulk_upsert
+from app.db.cache import preference_cache
+from app.db.listing import fetch_by_user_ids, keyset_page, stream_ndjson, user_ids_query
+from app.db.database import get_db, get_lookup_read_db, get_read_db
+from app.db.writes import delete_row, insert_row, update_row
+from app.matching.feed import record_profile_change
+from app.dto.bulk import BulkUpsertResponse
+from app.dto.lookup import UserIdsLookup
 from app.schemas.partner_age_range import PartnerAgeRange
 from app.dto.partner_age_range import PartnerAgeRangeCreate, PartnerAgeRangeUpdate, PartnerAgeRangeResponse, MessageResponse
 
@@ -34,6 +42,21 @@ def _calculate_age_range(birth_date_str: str):
             raise ValueError("Invalid date format. Please use YYYY-MM-DD format")
         raise e
 
+def build_partner_age_range(partner_age_range: PartnerAgeRangeCreate) -> PartnerAgeRange:
+    age_range_field = _calculate_age_range(partner_age_range.date_of_birth)
+    
+    db_partner_age_range = PartnerAgeRange(
+        user_id=partner_age_range.user_id,
+        partner_range_18_to_24=False,
+        partner_range_25_to_34=False,
+        partner_range_35_to_44=False,
+        partner_range_above_44=False
+    )
+    
+    setattr(db_partner_age_range, age_range_field, True)
+    
+    return db_partner_age_range
+
 @router.post("", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
 def create_partner_age_range(
     partner_age_range: PartnerAgeRangeCreate, 
@@ -42,35 +65,37 @@ def create_partner_age_range(
     try:
         user_id = partner_age_range.user_id
         
-        existing = db.query(PartnerAgeRange).filter(PartnerAgeRange.user_id == user_id).first()
-        if existing:
-            raise HTTPException(status_code=400, detail="Partner age range already exists for this user")
-        
-        age_range_field = _calculate_age_range(partner_age_range.date_of_birth)
-        
-        db_partner_age_range = PartnerAgeRange(
-            user_id=user_id,
-            partner_range_18_to_24=False,
-            partner_range_25_to_34=False,
-            partner_range_35_to_44=False,
-            partner_range_above_44=False
-        )
-        
-        setattr(db_partner_age_range, age_range_field, True)
+        db_partner_age_range = build_partner_age_range(partner_age_range)
         
-        db.add(db_partner_age_range)
+        record_profile_change(db, user_id)
+        if not insert_row(db, db_partner_age_range):
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Partner age range already exists for this user")
         db.commit()
-        db.refresh(db_partner_age_range)
         
         return {"message": f"Partner age range preference for user {user_id} created successfully"}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
+@router.post("/bulk", response_model=BulkUpsertResponse)
+def bulk_upsert_partner_age_range(
+    records: List[Dict[str, Any]] = Body(..., max_length=settings.BULK_MAX_ROWS),
+    db: Session = Depends(get_db)
+):
+    return bulk_upsert(db, records, PartnerAgeRangeCreate, build_partner_age_range, record_profile_change)
+
+@router.post("/lookup", response_model=Dict[str, Optional[PartnerAgeRangeResponse]])
+def lookup_partner_age_ranges(lookup: UserIdsLookup, db: Session = Depends(get_lookup_read_db)):
+    return fetch_by_user_ids(db, PartnerAgeRange, lookup.user_ids)
+
 @router.get("/{user_id}", response_model=PartnerAgeRangeResponse)
-def get_partner_age_range(user_id: str, db: Session = Depends(get_db)):
+@preference_cache.read_through("partner_age_range", PartnerAgeRangeResponse, [PartnerAgeRange])
+def get_partner_age_range(user_id: str, db: Session = Depends(get_read_db)):
     partner_age_range = db.query(PartnerAgeRange).filter(PartnerAgeRange.user_id == user_id).first()
     if not partner_age_range:
         raise HTTPException(status_code=404, detail="Partner age range not found for this user")
@@ -83,26 +108,21 @@ def update_partner_age_range(
     db: Session = Depends(get_db)
 ):
     try:
-        db_partner_age_range = db.query(PartnerAgeRange).filter(PartnerAgeRange.user_id == user_id).first()
-        if not db_partner_age_range:
-            raise HTTPException(status_code=404, detail="Partner age range not found for this user")
-        
-        age_range_field = _calculate_age_range(partner_age_range.date_of_birth)
-        
-        db_partner_age_range.partner_range_18_to_24 = False
-        db_partner_age_range.partner_range_25_to_34 = False
-        db_partner_age_range.partner_range_35_to_44 = False
-        db_partner_age_range.partner_range_above_44 = False
-        
-        setattr(db_partner_age_range, age_range_field, True)
+        db_partner_age_range = build_partner_age_range(
+            PartnerAgeRangeCreate(user_id=user_id, **partner_age_range.model_dump())
+        )
         
-        db.add(db_partner_age_range)
+        record_profile_change(db, user_id)
+        if not update_row(db, db_partner_age_range):
+            db.rollback()
+            raise HTTPException(status_code=404, detail="Partner age range not found for this user")
         db.commit()
-        db.refresh(db_partner_age_range)
         
         return {"message": f"Partner age range preference for user {user_id} updated successfully"}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
@@ -110,19 +130,31 @@ def update_partner_age_range(
 @router.delete("/{user_id}", response_model=MessageResponse, status_code=status.HTTP_200_OK)
 def delete_partner_age_range(user_id: str, db: Session = Depends(get_db)):
     try:
-        db_partner_age_range = db.query(PartnerAgeRange).filter(PartnerAgeRange.user_id == user_id).first()
-        if not db_partner_age_range:
+        record_profile_change(db, user_id)
+        if not delete_row(db, PartnerAgeRange, user_id=user_id):
+            db.rollback()
             raise HTTPException(status_code=404, detail="Partner age range not found for this user")
-        
-        db.delete(db_partner_age_range)
         db.commit()
         
         return {"message": f"Partner age range preference for user {user_id} deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
-@router.get("", response_model=List[PartnerAgeRangeResponse])
-def get_all_partner_age_ranges(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    partner_age_ranges = db.query(PartnerAgeRange).offset(skip).limit(limit).all()
+@router.get("", response_model=Union[List[PartnerAgeRangeResponse], Dict[str, Optional[PartnerAgeRangeResponse]]])
+def get_all_partner_age_ranges(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.LIST_DEFAULT_LIMIT, ge=1, le=settings.LIST_MAX_LIMIT),
+    stream: bool = False,
+    user_ids: Optional[List[str]] = Depends(user_ids_query),
+    db: Session = Depends(get_read_db)
+):
+    if user_ids:
+        return fetch_by_user_ids(db, PartnerAgeRange, user_ids)
+    if stream:
+        return stream_ndjson(PartnerAgeRange, PartnerAgeRangeResponse.model_validate, cursor)
+    partner_age_ranges = keyset_page(db, PartnerAgeRange, cursor, limit, response)
     return partner_age_ranges 
\ No newline at end of file
@@ -1,9 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Any, Dict, Optional, Union
 import logging
 
-from app.db.session import get_db
+from app.core.config import settings
+from app.db.bulk import bulk_upsert
+from app.db.cache import preference_cache
+from app.db.listing import fetch_by_user_ids, keyset_page, stream_ndjson, user_ids_query
+from app.db.session import get_db, get_lookup_read_db, get_read_db
+from app.db.writes import delete_row, insert_row, update_row
+from app.matching.feed import record_profile_change
+from app.dto.bulk import BulkUpsertResponse
+from app.dto.lookup import UserIdsLookup
 from app.schemas.partner_children_expectations import PartnerChildrenExpectations
 from app.dto.partner_children_expectations import (
     PartnerChildrenExpectationsCreate,
@@ -16,41 +24,44 @@ router = APIRouter(prefix="/partner-children-expectations", tags=["Partner Child
 logger = logging.getLogger(__name__)
 
 
+def build_partner_children_expectations(expectations: PartnerChildrenExpectationsCreate) -> PartnerChildrenExpectations:
+    new_record = PartnerChildrenExpectations(user_id=expectations.user_id)
+    
+    new_record.partner_wants_children = False
+    new_record.partner_open_to_have_children = False
+    new_record.partner_does_not_want_children = False
+    
+    if expectations.partner_children_expectation == "wants_children":
+        new_record.partner_wants_children = True
+    elif expectations.partner_children_expectation == "open_to_have_children":
+        new_record.partner_open_to_have_children = True
+    elif expectations.partner_children_expectation == "does_not_want_children":
+        new_record.partner_does_not_want_children = True
+    
+    return new_record
+
 @router.post("", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
 def create_partner_children_expectations(
     expectations: PartnerChildrenExpectationsCreate, 
     db: Session = Depends(get_db)
 ):
     try:
-        existing_record = db.query(PartnerChildrenExpectationsScore).filter_by(
-            user_id=expectations.user_id
-        ).first()
+        new_record = build_partner_children_expectations(expectations)
         
-        if existing_record:
+        record_profile_change(db, expectations.user_id)
+        if not insert_row(db, new_record):
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Record already exists for user_id {expectations.user_id}"
             )
-        
-        new_record = PartnerChildrenExpectationsScore(user_id=expectations.user_id)
-        
-        new_record.partner_wants_children = False
-        new_record.partner_open_to_have_children = False
-        new_record.partner_does_not_want_children = False
-        
-        if expectations.partner_children_expectation == "wants_children":
-            new_record.partner_wants_children = True
-        elif expectations.partner_children_expectation == "open_to_have_children":
-            new_record.partner_open_to_have_children = True
-        elif expectations.partner_children_expectation == "does_not_want_children":
-            new_record.partner_does_not_want_children = True
-        
-        db.add(new_record)
         db.commit()
-        db.refresh(new_record)
         
         return {"message": f"Partner children expectations for user {expectations.user_id} created successfully"}
     
+    except HTTPException:
+        raise
+    
     except Exception as e:
         db.rollback()
         logger.error(f"Error creating partner children expectations: {str(e)}")
@@ -60,10 +71,29 @@ def create_partner_children_expectations(
         )
 
 
-@router.get("", response_model=List[PartnerChildrenExpectationsResponse])
-def get_all_partner_children_expectations(db: Session = Depends(get_db)):
+@router.post("/bulk", response_model=BulkUpsertResponse)
+def bulk_upsert_partner_children_expectations(
+    records: List[Dict[str, Any]] = Body(..., max_length=settings.BULK_MAX_ROWS),
+    db: Session = Depends(get_db)
+):
+    return bulk_upsert(db, records, PartnerChildrenExpectationsCreate, build_partner_children_expectations, record_profile_change)
+
+
+@router.get("", response_model=Union[List[PartnerChildrenExpectationsResponse], Dict[str, Optional[PartnerChildrenExpectationsResponse]]])
+def get_all_partner_children_expectations(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.LIST_DEFAULT_LIMIT, ge=1, le=settings.LIST_MAX_LIMIT),
+    stream: bool = False,
+    user_ids: Optional[List[str]] = Depends(user_ids_query),
+    db: Session = Depends(get_read_db)
+):
     try:
-        records = db.query(PartnerChildrenExpectationsScore).all()
+        if user_ids:
+            return fetch_by_user_ids(db, PartnerChildrenExpectations, user_ids)
+        if stream:
+            return stream_ndjson(PartnerChildrenExpectations, PartnerChildrenExpectationsResponse.model_validate, cursor)
+        records = keyset_page(db, PartnerChildrenExpectations, cursor, limit, response)
         return records
     
     except Exception as e:
@@ -74,10 +104,15 @@ def get_all_partner_children_expectations(db: Session = Depends(get_db)):
         )
 
 
+@router.post("/lookup", response_model=Dict[str, Optional[PartnerChildrenExpectationsResponse]])
+def lookup_partner_children_expectations(lookup: UserIdsLookup, db: Session = Depends(get_lookup_read_db)):
+    return fetch_by_user_ids(db, PartnerChildrenExpectations, lookup.user_ids)
+
 @router.get("/{user_id}", response_model=PartnerChildrenExpectationsResponse)
-def get_partner_children_expectations(user_id: str, db: Session = Depends(get_db)):
+@preference_cache.read_through("partner_children_expectations", PartnerChildrenExpectationsResponse, [PartnerChildrenExpectations])
+def get_partner_children_expectations(user_id: str, db: Session = Depends(get_read_db)):
     try:
-        record = db.query(PartnerChildrenExpectationsScore).filter_by(user_id=user_id).first()
+        record = db.query(PartnerChildrenExpectations).filter_by(user_id=user_id).first()
         
         if not record:
             raise HTTPException(
@@ -105,27 +140,18 @@ def update_partner_children_expectations(
     db: Session = Depends(get_db)
 ):
     try:
-        record = db.query(PartnerChildrenExpectationsScore).filter_by(user_id=user_id).first()
+        record = build_partner_children_expectations(
+            PartnerChildrenExpectationsCreate(user_id=user_id, **expectations.model_dump())
+        )
         
-        if not record:
+        record_profile_change(db, user_id)
+        if not update_row(db, record):
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Partner children expectations not found for user_id: {user_id}"
             )
-        
-        record.partner_wants_children = False
-        record.partner_open_to_have_children = False
-        record.partner_does_not_want_children = False
-        
-        if expectations.partner_children_expectation == "wants_children":
-            record.partner_wants_children = True
-        elif expectations.partner_children_expectation == "open_to_have_children":
-            record.partner_open_to_have_children = True
-        elif expectations.partner_children_expectation == "does_not_want_children":
-            record.partner_does_not_want_children = True
-        
         db.commit()
-        db.refresh(record)
         
         return {"message": f"Partner children expectations for user {user_id} updated successfully"}
     
@@ -144,15 +170,13 @@ def update_partner_children_expectations(
 @router.delete("/{user_id}", response_model=MessageResponse, status_code=status.HTTP_200_OK)
 def delete_partner_children_expectations(user_id: str, db: Session = Depends(get_db)):
     try:
-        record = db.query(PartnerChildrenExpectationsScore).filter_by(user_id=user_id).first()
-        
-        if not record:
+        record_profile_change(db, user_id)
+        if not delete_row(db, PartnerChildrenExpectations, user_id=user_id):
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Partner children expectations not found for user_id: {user_id}"
             )
-        
-        db.delete(record)
         db.commit()
         
         return {"message": f"Partner children expectations for user {user_id} deleted successfully"}
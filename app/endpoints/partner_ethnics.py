@@ -1,9 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Response
 from sqlalchemy.orm import Session
-from typing import List, Dict
+from typing import List, Dict, Any, Optional, Union
 from sqlalchemy.exc import SQLAlchemyError
 
-from app.db.session import get_db
+from app.core.config import settings
+from app.db.bulk import bulk_upsert
+from app.db.cache import preference_cache
+from app.db.listing import fetch_by_user_ids, keyset_page, stream_ndjson, user_ids_query
+from app.db.session import get_db, get_lookup_read_db, get_read_db
+from app.db.writes import delete_row, insert_row, update_row
+from app.matching.codec import get_codec
+from app.matching.feed import record_profile_change
+from app.dto.bulk import BulkUpsertResponse
+from app.dto.lookup import UserIdsLookup
 from app.schemas.partner_ethnics import PartnerEthnics
 from app.dto.partner_ethnics import (
     PartnerEthnicsBase,
@@ -19,28 +28,44 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+def _ethnics_to_dict(partner_ethnics: PartnerEthnics) -> Dict[str, Any]:
+    active_ethnicities = [field for field in dir(partner_ethnics) 
+                       if not field.startswith('_') and 
+                       field != 'user_id' and
+                       not callable(getattr(partner_ethnics, field)) and
+                       getattr(partner_ethnics, field, False) is True]
+    return {"user_id": partner_ethnics.user_id, "partner_ethnic_origins": active_ethnicities}
+
+def get_all_available_ethnicities() -> List[str]:
+    return list(get_codec(PartnerEthnics).columns)
+
+def build_partner_ethnics(partner_ethnics: PartnerEthnicsCreate) -> PartnerEthnics:
+    new_partner_ethnics = PartnerEthnics(user_id=partner_ethnics.user_id)
+    ethnicities = get_codec(PartnerEthnics).bits
+    
+    for ethnicity in partner_ethnics.partner_ethnic_origins:
+        if ethnicity in ethnicities:
+            setattr(new_partner_ethnics, ethnicity, True)
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid ethnicity: {ethnicity}"
+            )
+    
+    return new_partner_ethnics
+
 @router.post("", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
 def create_partner_ethnics(partner_ethnics: PartnerEthnicsCreate, db: Session = Depends(get_db)):
     try:
-        existing_record = db.query(PartnerEthnicsScore).filter(PartnerEthnicsScore.user_id == partner_ethnics.user_id).first()
-        if existing_record:
+        new_partner_ethnics = build_partner_ethnics(partner_ethnics)
+        
+        record_profile_change(db, partner_ethnics.user_id)
+        if not insert_row(db, new_partner_ethnics):
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Partner ethnics preference for user {partner_ethnics.user_id} already exists"
             )
-        
-        new_partner_ethnics = PartnerEthnicsScore(user_id=partner_ethnics.user_id)
-        
-        for ethnicity in partner_ethnics.partner_ethnic_origins:
-            if hasattr(new_partner_ethnics, ethnicity):
-                setattr(new_partner_ethnics, ethnicity, True)
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Invalid ethnicity: {ethnicity}"
-                )
-        
-        db.add(new_partner_ethnics)
         db.commit()
         
         return {"message": f"Partner ethnics preferences for user {partner_ethnics.user_id} created successfully"}
@@ -50,26 +75,32 @@ def create_partner_ethnics(partner_ethnics: PartnerEthnicsCreate, db: Session =
         db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-@router.get("", response_model=List[PartnerEthnicsResponse])
-def get_all_partner_ethnics(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@router.post("/bulk", response_model=BulkUpsertResponse)
+def bulk_upsert_partner_ethnics(
+    records: List[Dict[str, Any]] = Body(..., max_length=settings.BULK_MAX_ROWS),
+    db: Session = Depends(get_db)
+):
+    return bulk_upsert(db, records, PartnerEthnicsCreate, build_partner_ethnics, record_profile_change)
+
+@router.get("", response_model=Union[List[PartnerEthnicsResponse], Dict[str, Optional[PartnerEthnicsResponse]]])
+def get_all_partner_ethnics(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.LIST_DEFAULT_LIMIT, ge=1, le=settings.LIST_MAX_LIMIT),
+    stream: bool = False,
+    user_ids: Optional[List[str]] = Depends(user_ids_query),
+    db: Session = Depends(get_read_db)
+):
     try:
-        partner_ethnics_list = db.query(PartnerEthnicsScore).offset(skip).limit(limit).all()
-        if not partner_ethnics_list:
+        if user_ids:
+            return fetch_by_user_ids(db, PartnerEthnics, user_ids, _ethnics_to_dict)
+        if stream:
+            return stream_ndjson(PartnerEthnics, _ethnics_to_dict, cursor)
+        partner_ethnics_list = keyset_page(db, PartnerEthnics, cursor, limit, response)
+        if not partner_ethnics_list and cursor is None:
             raise HTTPException(status_code=404, detail="No partner ethnics preferences found")
         
-        result = []
-        for ethnics in partner_ethnics_list:
-            active_ethnicities = [field for field in dir(ethnics) 
-                               if not field.startswith('_') and 
-                               field != 'user_id' and
-                               not callable(getattr(ethnics, field)) and
-                               getattr(ethnics, field, False) is True]
-            result.append({
-                "user_id": ethnics.user_id,
-                "partner_ethnic_origins": active_ethnicities
-            })
-        
-        return result
+        return [_ethnics_to_dict(ethnics) for ethnics in partner_ethnics_list]
     except HTTPException:
         raise
     except Exception as e:
@@ -79,23 +110,19 @@ def get_all_partner_ethnics(skip: int = 0, limit: int = 100, db: Session = Depen
 def get_available_ethnicities():
     return get_all_available_ethnicities()
 
+@router.post("/lookup", response_model=Dict[str, Optional[PartnerEthnicsResponse]])
+def lookup_partner_ethnics(lookup: UserIdsLookup, db: Session = Depends(get_lookup_read_db)):
+    return fetch_by_user_ids(db, PartnerEthnics, lookup.user_ids, _ethnics_to_dict)
+
 @router.get("/{user_id}", response_model=PartnerEthnicsResponse)
-def get_partner_ethnics(user_id: str, db: Session = Depends(get_db)):
+@preference_cache.read_through("partner_ethnics", PartnerEthnicsResponse, [PartnerEthnics])
+def get_partner_ethnics(user_id: str, db: Session = Depends(get_read_db)):
     try:
-        partner_ethnics = db.query(PartnerEthnicsScore).filter(PartnerEthnicsScore.user_id == user_id).first()
+        partner_ethnics = db.query(PartnerEthnics).filter(PartnerEthnics.user_id == user_id).first()
         if not partner_ethnics:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Partner ethnics preference not found for user {user_id}")
         
-        active_ethnicities = [field for field in dir(partner_ethnics) 
-                           if not field.startswith('_') and 
-                           field != 'user_id' and
-                           not callable(getattr(partner_ethnics, field)) and
-                           getattr(partner_ethnics, field, False) is True]
-        
-        return {
-            "user_id": partner_ethnics.user_id,
-            "partner_ethnic_origins": active_ethnicities
-        }
+        return _ethnics_to_dict(partner_ethnics)
     except HTTPException:
         raise
     except Exception as e:
@@ -104,27 +131,14 @@ def get_partner_ethnics(user_id: str, db: Session = Depends(get_db)):
 @router.put("/{user_id}", response_model=MessageResponse)
 def update_partner_ethnics(user_id: str, partner_ethnics: PartnerEthnicsUpdate, db: Session = Depends(get_db)):
     try:
-        db_partner_ethnics = db.query(PartnerEthnicsScore).filter(PartnerEthnicsScore.user_id == user_id).first()
-        if not db_partner_ethnics:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Partner ethnics preference not found for user {user_id}")
-        
-        ethnicity_fields = [field for field in dir(db_partner_ethnics) 
-                          if not field.startswith('_') and 
-                          field != 'user_id' and
-                          not callable(getattr(db_partner_ethnics, field))]
-        
-        for field in ethnicity_fields:
-            setattr(db_partner_ethnics, field, False)
-        
-        for ethnicity in partner_ethnics.partner_ethnic_origins:
-            if hasattr(db_partner_ethnics, ethnicity):
-                setattr(db_partner_ethnics, ethnicity, True)
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Invalid ethnicity: {ethnicity}"
-                )
+        db_partner_ethnics = build_partner_ethnics(
+            PartnerEthnicsCreate(user_id=user_id, **partner_ethnics.model_dump())
+        )
         
+        record_profile_change(db, user_id)
+        if not update_row(db, db_partner_ethnics):
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Partner ethnics preference not found for user {user_id}")
         db.commit()
         
         return {"message": f"Partner ethnics preferences for user {user_id} updated successfully"}
@@ -137,11 +151,10 @@ def update_partner_ethnics(user_id: str, partner_ethnics: PartnerEthnicsUpdate,
 @router.delete("/{user_id}", response_model=MessageResponse, status_code=status.HTTP_200_OK)
 def delete_partner_ethnics(user_id: str, db: Session = Depends(get_db)):
     try:
-        db_partner_ethnics = db.query(PartnerEthnicsScore).filter(PartnerEthnicsScore.user_id == user_id).first()
-        if not db_partner_ethnics:
+        record_profile_change(db, user_id)
+        if not delete_row(db, PartnerEthnics, user_id=user_id):
+            db.rollback()
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Partner ethnics preference not found for user {user_id}")
-        
-        db.delete(db_partner_ethnics)
         db.commit()
         return {"message": f"Partner ethnics preferences for user {user_id} deleted successfully"}
     except HTTPException:
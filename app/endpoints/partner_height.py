@@ -1,9 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Any, Dict, Optional, Union
 import logging
 
-from app.db.session import get_db
+from app.core.config import settings
+from app.db.bulk import bulk_upsert
+from app.db.cache import preference_cache
+from app.db.listing import fetch_by_user_ids, keyset_page, stream_ndjson, user_ids_query
+from app.db.session import get_db, get_lookup_read_db, get_read_db
+from app.db.writes import delete_row, insert_row, update_row
+from app.matching.feed import record_profile_change
+from app.dto.bulk import BulkUpsertResponse
+from app.dto.lookup import UserIdsLookup
 from app.schemas.partner_height import PartnerHeight
 from app.dto.partner_height import (
     PartnerHeightCreate,
@@ -51,46 +59,46 @@ def _get_range_field(height):
         raise ValueError(f"Invalid height value: {height}. Please provide a valid number between 140 and 220 cm")
 
 
+def build_partner_height(height_data: PartnerHeightCreate) -> PartnerHeight:
+    new_record = PartnerHeight(user_id=height_data.user_id)
+    
+    ranges = [
+        (140, 145), (146, 150), (151, 155), (156, 160),
+        (161, 165), (166, 170), (171, 175), (176, 180),
+        (181, 185), (186, 190), (191, 195), (196, 200),
+        (201, 205), (206, 210), (211, 215), (216, 220)
+    ]
+    for start, end in ranges:
+        field_name = f'partner_range_{start}_to_{end}'
+        setattr(new_record, field_name, False)
+    
+    try:
+        range_field = _get_range_field(height_data.partner_height)
+        setattr(new_record, range_field, True)
+    except ValueError as ve:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(ve)
+        )
+    
+    return new_record
+
 @router.post("", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
 def create_partner_height(
     height_data: PartnerHeightCreate, 
     db: Session = Depends(get_db)
 ):
     try:
-        existing_record = db.query(PartnerHeightScore).filter_by(
-            user_id=height_data.user_id
-        ).first()
+        new_record = build_partner_height(height_data)
         
-        if existing_record:
+        record_profile_change(db, height_data.user_id)
+        if not insert_row(db, new_record):
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Record already exists for user_id {height_data.user_id}"
             )
-        
-        new_record = PartnerHeightScore(user_id=height_data.user_id)
-        
-        ranges = [
-            (140, 145), (146, 150), (151, 155), (156, 160),
-            (161, 165), (166, 170), (171, 175), (176, 180),
-            (181, 185), (186, 190), (191, 195), (196, 200),
-            (201, 205), (206, 210), (211, 215), (216, 220)
-        ]
-        for start, end in ranges:
-            field_name = f'partner_range_{start}_to_{end}'
-            setattr(new_record, field_name, False)
-        
-        try:
-            range_field = _get_range_field(height_data.partner_height)
-            setattr(new_record, range_field, True)
-        except ValueError as ve:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=str(ve)
-            )
-        
-        db.add(new_record)
         db.commit()
-        db.refresh(new_record)
         
         return {"message": f"Partner height for user {height_data.user_id} created successfully"}
     
@@ -106,20 +114,44 @@ def create_partner_height(
         )
 
 
-@router.get("", response_model=List[PartnerHeightResponse])
-def get_all_partner_heights(db: Session = Depends(get_db)):
+@router.post("/bulk", response_model=BulkUpsertResponse)
+def bulk_upsert_partner_height(
+    records: List[Dict[str, Any]] = Body(..., max_length=settings.BULK_MAX_ROWS),
+    db: Session = Depends(get_db)
+):
+    return bulk_upsert(db, records, PartnerHeightCreate, build_partner_height, record_profile_change)
+
+
+@router.get("", response_model=Union[List[PartnerHeightResponse], Dict[str, Optional[PartnerHeightResponse]]])
+def get_all_partner_heights(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.LIST_DEFAULT_LIMIT, ge=1, le=settings.LIST_MAX_LIMIT),
+    stream: bool = False,
+    user_ids: Optional[List[str]] = Depends(user_ids_query),
+    db: Session = Depends(get_read_db)
+):
     try:
-        partner_heights = db.query(PartnerHeightScore).all()
+        if user_ids:
+            return fetch_by_user_ids(db, PartnerHeight, user_ids)
+        if stream:
+            return stream_ndjson(PartnerHeight, PartnerHeightResponse.model_validate, cursor)
+        partner_heights = keyset_page(db, PartnerHeight, cursor, limit, response)
         return partner_heights
     except Exception as e:
         logger.error(f"Error retrieving partner heights: {str(e)}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
+@router.post("/lookup", response_model=Dict[str, Optional[PartnerHeightResponse]])
+def lookup_partner_heights(lookup: UserIdsLookup, db: Session = Depends(get_lookup_read_db)):
+    return fetch_by_user_ids(db, PartnerHeight, lookup.user_ids)
+
 @router.get("/{user_id}", response_model=PartnerHeightResponse)
-def get_partner_height(user_id: str, db: Session = Depends(get_db)):
+@preference_cache.read_through("partner_height", PartnerHeightResponse, [PartnerHeight])
+def get_partner_height(user_id: str, db: Session = Depends(get_read_db)):
     try:
-        record = db.query(PartnerHeightScore).filter_by(user_id=user_id).first()
+        record = db.query(PartnerHeight).filter_by(user_id=user_id).first()
         
         if not record:
             raise HTTPException(
@@ -147,35 +179,16 @@ def update_partner_height(
     db: Session = Depends(get_db)
 ):
     try:
-        record = db.query(PartnerHeightScore).filter_by(user_id=user_id).first()
+        record = build_partner_height(PartnerHeightCreate(user_id=user_id, **height_data.model_dump()))
         
-        if not record:
+        record_profile_change(db, user_id)
+        if not update_row(db, record):
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Partner height not found for user_id: {user_id}"
             )
-        
-        ranges = [
-            (140, 145), (146, 150), (151, 155), (156, 160),
-            (161, 165), (166, 170), (171, 175), (176, 180),
-            (181, 185), (186, 190), (191, 195), (196, 200),
-            (201, 205), (206, 210), (211, 215), (216, 220)
-        ]
-        for start, end in ranges:
-            field_name = f'partner_range_{start}_to_{end}'
-            setattr(record, field_name, False)
-        
-        try:
-            range_field = _get_range_field(height_data.partner_height)
-            setattr(record, range_field, True)
-        except ValueError as ve:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=str(ve)
-            )
-        
         db.commit()
-        db.refresh(record)
         
         return {"message": f"Partner height for user {user_id} updated successfully"}
     
@@ -194,15 +207,13 @@ def update_partner_height(
 @router.delete("/{user_id}", response_model=MessageResponse, status_code=status.HTTP_200_OK)
 def delete_partner_height(user_id: str, db: Session = Depends(get_db)):
     try:
-        record = db.query(PartnerHeightScore).filter_by(user_id=user_id).first()
-        
-        if not record:
+        record_profile_change(db, user_id)
+        if not delete_row(db, PartnerHeight, user_id=user_id):
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Partner height not found for user_id: {user_id}"
             )
-        
-        db.delete(record)
         db.commit()
         
         return {"message": "Partner height deleted successfully"}
@@ -1,9 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Any, Dict, Optional, Union
 import logging
 
-from app.db.session import get_db
+from app.core.config import settings
+from app.db.bulk import bulk_upsert
+from app.db.cache import preference_cache
+from app.db.listing import fetch_by_user_ids, keyset_page, stream_ndjson, user_ids_query
+from app.db.session import get_db, get_lookup_read_db, get_read_db
+from app.db.writes import delete_row, insert_row, update_row
+from app.matching.feed import record_profile_change
+from app.dto.bulk import BulkUpsertResponse
+from app.dto.lookup import UserIdsLookup
 from app.schemas.partner_marriage_timeline import PartnerMarriageTimeline
 from app.dto.partner_marriage_timeline import (
     PartnerMarriageTimelineCreate,
@@ -16,6 +24,19 @@ router = APIRouter(prefix="/partner-marriage-timeline", tags=["Partner Marriage
 logger = logging.getLogger(__name__)
 
 
+def build_partner_marriage_timeline(timeline: PartnerMarriageTimelineCreate) -> PartnerMarriageTimeline:
+    new_record = PartnerMarriageTimeline(user_id=timeline.user_id)
+    
+    new_record.partner_agree_together = False
+    new_record.partner_within_1_year = False
+    new_record.partner_within_2_year = False
+    new_record.partner_within_3_year = False
+    new_record.partner_within_5_year = False
+    
+    setattr(new_record, timeline.partner_marriage_timeline, True)
+    
+    return new_record
+
 @router.post("", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
 def create_partner_marriage_timeline(
     timeline: PartnerMarriageTimelineCreate, 
@@ -23,29 +44,16 @@ def create_partner_marriage_timeline(
 ):
 
     try:
-        existing_record = db.query(PartnerMarriageTimelineScore).filter_by(
-            user_id=timeline.user_id
-        ).first()
+        new_record = build_partner_marriage_timeline(timeline)
         
-        if existing_record:
+        record_profile_change(db, timeline.user_id)
+        if not insert_row(db, new_record):
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Record already exists for user_id {timeline.user_id}"
             )
-        
-        new_record = PartnerMarriageTimelineScore(user_id=timeline.user_id)
-        
-        new_record.partner_agree_together = False
-        new_record.partner_within_1_year = False
-        new_record.partner_within_2_year = False
-        new_record.partner_within_3_year = False
-        new_record.partner_within_5_year = False
-        
-        setattr(new_record, timeline.partner_marriage_timeline, True)
-        
-        db.add(new_record)
         db.commit()
-        db.refresh(new_record)
         
         return {"message": f"Partner marriage timeline for user {timeline.user_id} created successfully"}
     
@@ -61,10 +69,29 @@ def create_partner_marriage_timeline(
         )
 
 
-@router.get("", response_model=List[PartnerMarriageTimelineResponse])
-def get_all_partner_marriage_timelines(db: Session = Depends(get_db)):
+@router.post("/bulk", response_model=BulkUpsertResponse)
+def bulk_upsert_partner_marriage_timeline(
+    records: List[Dict[str, Any]] = Body(..., max_length=settings.BULK_MAX_ROWS),
+    db: Session = Depends(get_db)
+):
+    return bulk_upsert(db, records, PartnerMarriageTimelineCreate, build_partner_marriage_timeline, record_profile_change)
+
+
+@router.get("", response_model=Union[List[PartnerMarriageTimelineResponse], Dict[str, Optional[PartnerMarriageTimelineResponse]]])
+def get_all_partner_marriage_timelines(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.LIST_DEFAULT_LIMIT, ge=1, le=settings.LIST_MAX_LIMIT),
+    stream: bool = False,
+    user_ids: Optional[List[str]] = Depends(user_ids_query),
+    db: Session = Depends(get_read_db)
+):
     try:
-        records = db.query(PartnerMarriageTimelineScore).all()
+        if user_ids:
+            return fetch_by_user_ids(db, PartnerMarriageTimeline, user_ids)
+        if stream:
+            return stream_ndjson(PartnerMarriageTimeline, PartnerMarriageTimelineResponse.model_validate, cursor)
+        records = keyset_page(db, PartnerMarriageTimeline, cursor, limit, response)
         if not records:
             return []
         return records
@@ -77,10 +104,15 @@ def get_all_partner_marriage_timelines(db: Session = Depends(get_db)):
         )
 
 
+@router.post("/lookup", response_model=Dict[str, Optional[PartnerMarriageTimelineResponse]])
+def lookup_partner_marriage_timelines(lookup: UserIdsLookup, db: Session = Depends(get_lookup_read_db)):
+    return fetch_by_user_ids(db, PartnerMarriageTimeline, lookup.user_ids)
+
 @router.get("/{user_id}", response_model=PartnerMarriageTimelineResponse)
-def get_partner_marriage_timeline(user_id: str, db: Session = Depends(get_db)):
+@preference_cache.read_through("partner_marriage_timeline", PartnerMarriageTimelineResponse, [PartnerMarriageTimeline])
+def get_partner_marriage_timeline(user_id: str, db: Session = Depends(get_read_db)):
     try:
-        record = db.query(PartnerMarriageTimelineScore).filter_by(user_id=user_id).first()
+        record = db.query(PartnerMarriageTimeline).filter_by(user_id=user_id).first()
         
         if not record:
             raise HTTPException(
@@ -108,24 +140,18 @@ def update_partner_marriage_timeline(
     db: Session = Depends(get_db)
 ):
     try:
-        record = db.query(PartnerMarriageTimelineScore).filter_by(user_id=user_id).first()
+        record = build_partner_marriage_timeline(
+            PartnerMarriageTimelineCreate(user_id=user_id, **timeline.model_dump())
+        )
         
-        if not record:
+        record_profile_change(db, user_id)
+        if not update_row(db, record):
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Partner marriage timeline not found for user_id: {user_id}"
             )
-        
-        record.partner_agree_together = False
-        record.partner_within_1_year = False
-        record.partner_within_2_year = False
-        record.partner_within_3_year = False
-        record.partner_within_5_year = False
-        
-        setattr(record, timeline.partner_marriage_timeline, True)
-        
         db.commit()
-        db.refresh(record)
         
         return {"message": f"Partner marriage timeline for user {user_id} updated successfully"}
     
@@ -144,15 +170,13 @@ def update_partner_marriage_timeline(
 @router.delete("/{user_id}", response_model=MessageResponse, status_code=status.HTTP_200_OK)
 def delete_partner_marriage_timeline(user_id: str, db: Session = Depends(get_db)):
     try:
-        record = db.query(PartnerMarriageTimelineScore).filter_by(user_id=user_id).first()
-        
-        if not record:
+        record_profile_change(db, user_id)
+        if not delete_row(db, PartnerMarriageTimeline, user_id=user_id):
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Partner marriage timeline not found for user_id: {user_id}"
             )
-        
-        db.delete(record)
         db.commit()
         
         return {"message": "Partner marriage timeline deleted successfully"}
@@ -1,9 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Response
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Union
 import logging
 
-from app.db.session import get_db
+from app.core.config import settings
+from app.db.bulk import bulk_upsert
+from app.db.cache import preference_cache
+from app.db.listing import fetch_by_user_ids, keyset_page, stream_ndjson, user_ids_query
+from app.db.session import get_db, get_lookup_read_db, get_read_db
+from app.db.writes import delete_row, insert_row, update_row
+from app.matching.codec import get_codec
+from app.matching.feed import record_profile_change
+from app.dto.bulk import BulkUpsertResponse
+from app.dto.lookup import UserIdsLookup
 from app.schemas.partner_personality_traits import PartnerPersonalityTraitsScore
 from app.dto.partner_personality_traits import (
     PartnerPersonalityTraitsCreate,
@@ -27,30 +36,38 @@ def _traits_to_dict(user: PartnerPersonalityTraitsScore) -> Dict[str, Any]:
             traits.append(column.name)
     return {"user_id": user.user_id, "partner_personality_traits": traits}
 
+def build_partner_personality_traits(partner_traits: PartnerPersonalityTraitsCreate) -> PartnerPersonalityTraitsScore:
+    db_user = PartnerPersonalityTraitsScore(user_id=partner_traits.user_id)
+    traits = get_codec(PartnerPersonalityTraitsScore).bits
+    
+    for trait in partner_traits.partner_personality_traits:
+        if trait in traits:
+            setattr(db_user, trait, True)
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid personality trait: {trait}"
+            )
+    
+    return db_user
+
 @router.post("", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
 def create_partner_personality_traits(partner_traits: PartnerPersonalityTraitsCreate, db: Session = Depends(get_db)):
     try:
-        db_partner_traits = db.query(PartnerPersonalityTraitsScore).filter(
-            PartnerPersonalityTraitsScore.user_id == partner_traits.user_id
-        ).first()
+        db_user = build_partner_personality_traits(partner_traits)
         
-        if db_partner_traits:
+        record_profile_change(db, partner_traits.user_id)
+        if not insert_row(db, db_user):
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"User {partner_traits.user_id} already has partner personality traits preferences"
             )
-        
-        db_user = PartnerPersonalityTraitsScore(user_id=partner_traits.user_id)
-        
-        for trait in partner_traits.partner_personality_traits:
-            if hasattr(db_user, trait):
-                setattr(db_user, trait, True)
-        
-        db.add(db_user)
         db.commit()
-        db.refresh(db_user)
         
         return {"message": f"Partner personality traits for user {partner_traits.user_id} created successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         logger.error(f"Error creating partner personality traits: {str(e)}")
@@ -59,17 +76,37 @@ def create_partner_personality_traits(partner_traits: PartnerPersonalityTraitsCr
             detail=f"An error occurred: {str(e)}"
         )
 
-@router.get("", response_model=List[PartnerPersonalityTraitsResponse])
-def get_all_partner_personality_traits(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@router.post("/bulk", response_model=BulkUpsertResponse)
+def bulk_upsert_partner_personality_traits(
+    records: List[Dict[str, Any]] = Body(..., max_length=settings.BULK_MAX_ROWS),
+    db: Session = Depends(get_db)
+):
+    return bulk_upsert(db, records, PartnerPersonalityTraitsCreate, build_partner_personality_traits, record_profile_change)
+
+@router.get("", response_model=Union[List[PartnerPersonalityTraitsResponse], Dict[str, Optional[PartnerPersonalityTraitsResponse]]])
+def get_all_partner_personality_traits(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.LIST_DEFAULT_LIMIT, ge=1, le=settings.LIST_MAX_LIMIT),
+    stream: bool = False,
+    user_ids: Optional[List[str]] = Depends(user_ids_query),
+    db: Session = Depends(get_read_db)
+):
     try:
-        users = db.query(PartnerPersonalityTraitsScore).offset(skip).limit(limit).all()
-        if not users:
+        if user_ids:
+            return fetch_by_user_ids(db, PartnerPersonalityTraitsScore, user_ids, _traits_to_dict)
+        if stream:
+            return stream_ndjson(PartnerPersonalityTraitsScore, _traits_to_dict, cursor)
+        users = keyset_page(db, PartnerPersonalityTraitsScore, cursor, limit, response)
+        if not users and cursor is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No partner personality traits preferences found"
             )
         
         return [_traits_to_dict(user) for user in users]
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving all partner personality traits: {str(e)}")
         raise HTTPException(
@@ -78,8 +115,13 @@ def get_all_partner_personality_traits(skip: int = 0, limit: int = 100, db: Sess
         )
 
 
+@router.post("/lookup", response_model=Dict[str, Optional[PartnerPersonalityTraitsResponse]])
+def lookup_partner_personality_traits(lookup: UserIdsLookup, db: Session = Depends(get_lookup_read_db)):
+    return fetch_by_user_ids(db, PartnerPersonalityTraitsScore, lookup.user_ids, _traits_to_dict)
+
 @router.get("/{user_id}", response_model=PartnerPersonalityTraitsResponse)
-def get_partner_personality_traits(user_id: str, db: Session = Depends(get_db)):
+@preference_cache.read_through("partner_personality_traits", PartnerPersonalityTraitsResponse, [PartnerPersonalityTraitsScore])
+def get_partner_personality_traits(user_id: str, db: Session = Depends(get_read_db)):
     try:
         user = db.query(PartnerPersonalityTraitsScore).filter(
             PartnerPersonalityTraitsScore.user_id == user_id
@@ -102,31 +144,24 @@ def get_partner_personality_traits(user_id: str, db: Session = Depends(get_db)):
 @router.put("/{user_id}", response_model=MessageResponse)
 def update_partner_personality_traits(user_id: str, partner_traits: PartnerPersonalityTraitsUpdate, db: Session = Depends(get_db)):
     try:
-        user = db.query(PartnerPersonalityTraitsScore).filter(
-            PartnerPersonalityTraitsScore.user_id == user_id
-        ).first()
+        # Every trait not listed is written back as False
+        user = build_partner_personality_traits(
+            PartnerPersonalityTraitsCreate(user_id=user_id, **partner_traits.model_dump())
+        )
         
-        if not user:
+        record_profile_change(db, user_id)
+        if not update_row(db, user):
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Partner personality traits preferences for user {user_id} not found"
             )
-        
-        # Reset all traits to False
-        for column in user.__table__.columns:
-            if column.name != 'user_id':
-                setattr(user, column.name, False)
-        
-        # Set the specified traits to True
-        for trait in partner_traits.partner_personality_traits:
-            if hasattr(user, trait):
-                setattr(user, trait, True)
-        
         db.commit()
-        db.refresh(user)
         
         # Return success message
         return {"message": f"Partner personality traits for user {user_id} updated successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         logger.error(f"Error updating partner personality traits for user {user_id}: {str(e)}")
@@ -139,20 +174,18 @@ def update_partner_personality_traits(user_id: str, partner_traits: PartnerPerso
 @router.delete("/{user_id}", response_model=MessageResponse, status_code=status.HTTP_200_OK)
 def delete_partner_personality_traits(user_id: str, db: Session = Depends(get_db)):
     try:
-        user = db.query(PartnerPersonalityTraitsScore).filter(
-            PartnerPersonalityTraitsScore.user_id == user_id
-        ).first()
-        
-        if not user:
+        record_profile_change(db, user_id)
+        if not delete_row(db, PartnerPersonalityTraitsScore, user_id=user_id):
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Partner personality traits preferences for user {user_id} not found"
             )
-        
-        db.delete(user)
         db.commit()
         
         return {"message": f"Partner personality traits for user {user_id} deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         logger.error(f"Error deleting partner personality traits for user {user_id}: {str(e)}")
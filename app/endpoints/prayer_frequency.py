@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
-from typing import List
+from typing import List, Any, Dict, Optional, Union
 import logging
 
-from app.db.session import get_db
+from app.core.config import settings
+from app.db.bulk import bulk_upsert
+from app.db.cache import preference_cache
+from app.db.listing import fetch_by_user_ids, keyset_page, stream_ndjson, user_ids_query
+from app.db.session import get_db, get_lookup_read_db, get_read_db
+from app.db.writes import delete_row, insert_row, update_row
+from app.matching.feed import record_profile_change
+from app.dto.bulk import BulkUpsertResponse
+from app.dto.lookup import UserIdsLookup
 from app.schemas.prayer_frequency import PrayerFrequency
 from app.dto.prayer_frequency import (
     PrayerFrequencyCreate, 
@@ -21,37 +29,42 @@ router = APIRouter(
 
 logger = logging.getLogger(__name__)
 
+def build_prayer_frequency(prayer_frequency: PrayerFrequencyCreate) -> PrayerFrequency:
+    db_prayer_frequency = PrayerFrequency(
+        user_id=prayer_frequency.user_id,
+        always_pray=False,
+        usually_pray=False,
+        sometimes_pray=False,
+        never_pray=False
+    )
+    
+    if prayer_frequency.prayer_frequency == "always_prays":
+        db_prayer_frequency.always_pray = True
+    elif prayer_frequency.prayer_frequency == "usually_prays":
+        db_prayer_frequency.usually_pray = True
+    elif prayer_frequency.prayer_frequency == "sometimes_prays":
+        db_prayer_frequency.sometimes_pray = True
+    elif prayer_frequency.prayer_frequency == "never_prays":
+        db_prayer_frequency.never_pray = True
+    
+    return db_prayer_frequency
+
 @router.post("", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
 def create_prayer_frequency(prayer_frequency: PrayerFrequencyCreate, db: Session = Depends(get_db)):
     try:
-        db_prayer_frequency = db.query(PrayerFrequencyScore).filter(PrayerFrequencyScore.user_id == prayer_frequency.user_id).first()
-        if db_prayer_frequency:
+        db_prayer_frequency = build_prayer_frequency(prayer_frequency)
+        
+        record_profile_change(db, prayer_frequency.user_id)
+        if not insert_row(db, db_prayer_frequency):
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"User {prayer_frequency.user_id} already has a prayer frequency preference"
             )
-        
-        db_prayer_frequency = PrayerFrequencyScore(
-            user_id=prayer_frequency.user_id,
-            always_pray=False,
-            usually_pray=False,
-            sometimes_pray=False,
-            never_pray=False
-        )
-        
-        if prayer_frequency.prayer_frequency == "always_prays":
-            db_prayer_frequency.always_pray = True
-        elif prayer_frequency.prayer_frequency == "usually_prays":
-            db_prayer_frequency.usually_pray = True
-        elif prayer_frequency.prayer_frequency == "sometimes_prays":
-            db_prayer_frequency.sometimes_pray = True
-        elif prayer_frequency.prayer_frequency == "never_prays":
-            db_prayer_frequency.never_pray = True
-        
-        db.add(db_prayer_frequency)
         db.commit()
-        db.refresh(db_prayer_frequency)
         return {"message": f"Prayer frequency preference for user {prayer_frequency.user_id} created successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         logger.error(f"Error creating prayer frequency: {str(e)}")
@@ -60,16 +73,36 @@ def create_prayer_frequency(prayer_frequency: PrayerFrequencyCreate, db: Session
             detail=f"An error occurred: {str(e)}"
         )
 
-@router.get("", response_model=List[PrayerFrequencyResponse])
-def get_all_prayer_frequency_preferences(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@router.post("/bulk", response_model=BulkUpsertResponse)
+def bulk_upsert_prayer_frequency(
+    records: List[Dict[str, Any]] = Body(..., max_length=settings.BULK_MAX_ROWS),
+    db: Session = Depends(get_db)
+):
+    return bulk_upsert(db, records, PrayerFrequencyCreate, build_prayer_frequency, record_profile_change)
+
+@router.get("", response_model=Union[List[PrayerFrequencyResponse], Dict[str, Optional[PrayerFrequencyResponse]]])
+def get_all_prayer_frequency_preferences(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.LIST_DEFAULT_LIMIT, ge=1, le=settings.LIST_MAX_LIMIT),
+    stream: bool = False,
+    user_ids: Optional[List[str]] = Depends(user_ids_query),
+    db: Session = Depends(get_read_db)
+):
     try:
-        prayer_frequencies = db.query(PrayerFrequencyScore).offset(skip).limit(limit).all()
-        if not prayer_frequencies:
+        if user_ids:
+            return fetch_by_user_ids(db, PrayerFrequency, user_ids)
+        if stream:
+            return stream_ndjson(PrayerFrequency, PrayerFrequencyResponse.model_validate, cursor)
+        prayer_frequencies = keyset_page(db, PrayerFrequency, cursor, limit, response)
+        if not prayer_frequencies and cursor is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No prayer frequency preferences found"
             )
         return prayer_frequencies
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving all prayer frequencies: {str(e)}")
         raise HTTPException(
@@ -78,10 +111,15 @@ def get_all_prayer_frequency_preferences(skip: int = 0, limit: int = 100, db: Se
         )
 
 
+@router.post("/lookup", response_model=Dict[str, Optional[PrayerFrequencyResponse]])
+def lookup_prayer_frequency_preferences(lookup: UserIdsLookup, db: Session = Depends(get_lookup_read_db)):
+    return fetch_by_user_ids(db, PrayerFrequency, lookup.user_ids)
+
 @router.get("/{user_id}", response_model=PrayerFrequencyResponse)
-def get_prayer_frequency(user_id: str, db: Session = Depends(get_db)):
+@preference_cache.read_through("prayer_frequency", PrayerFrequencyResponse, [PrayerFrequency])
+def get_prayer_frequency(user_id: str, db: Session = Depends(get_read_db)):
     try:
-        prayer_frequency = db.query(PrayerFrequencyScore).filter(PrayerFrequencyScore.user_id == user_id).first()
+        prayer_frequency = db.query(PrayerFrequency).filter(PrayerFrequency.user_id == user_id).first()
         if not prayer_frequency:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -98,30 +136,21 @@ def get_prayer_frequency(user_id: str, db: Session = Depends(get_db)):
 @router.put("/{user_id}", response_model=MessageResponse)
 def update_prayer_frequency(user_id: str, prayer_frequency: PrayerFrequencyUpdate, db: Session = Depends(get_db)):
     try:
-        db_prayer_frequency = db.query(PrayerFrequencyScore).filter(PrayerFrequencyScore.user_id == user_id).first()
-        if not db_prayer_frequency:
+        db_prayer_frequency = build_prayer_frequency(
+            PrayerFrequencyCreate(user_id=user_id, **prayer_frequency.model_dump())
+        )
+        
+        record_profile_change(db, user_id)
+        if not update_row(db, db_prayer_frequency):
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Prayer frequency preference for user {user_id} not found"
             )
-        
-        db_prayer_frequency.always_pray = False
-        db_prayer_frequency.usually_pray = False
-        db_prayer_frequency.sometimes_pray = False
-        db_prayer_frequency.never_pray = False
-        
-        if prayer_frequency.prayer_frequency == "always_prays":
-            db_prayer_frequency.always_pray = True
-        elif prayer_frequency.prayer_frequency == "usually_prays":
-            db_prayer_frequency.usually_pray = True
-        elif prayer_frequency.prayer_frequency == "sometimes_prays":
-            db_prayer_frequency.sometimes_pray = True
-        elif prayer_frequency.prayer_frequency == "never_prays":
-            db_prayer_frequency.never_pray = True
-        
         db.commit()
-        db.refresh(db_prayer_frequency)
         return {"message": f"Prayer frequency preference for user {user_id} updated successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         logger.error(f"Error updating prayer frequency for user {user_id}: {str(e)}")
@@ -133,16 +162,17 @@ def update_prayer_frequency(user_id: str, prayer_frequency: PrayerFrequencyUpdat
 @router.delete("/{user_id}", response_model=MessageResponse, status_code=status.HTTP_200_OK)
 def delete_prayer_frequency(user_id: str, db: Session = Depends(get_db)):
     try:
-        db_prayer_frequency = db.query(PrayerFrequencyScore).filter(PrayerFrequencyScore.user_id == user_id).first()
-        if not db_prayer_frequency:
+        record_profile_change(db, user_id)
+        if not delete_row(db, PrayerFrequency, user_id=user_id):
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Prayer frequency preference for user {user_id} not found"
             )
-        
-        db.delete(db_prayer_frequency)
         db.commit()
         return {"message": f"Prayer frequency preference for user {user_id} deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         logger.error(f"Error deleting prayer frequency for user {user_id}: {str(e)}")
@@ -0,0 +1,174 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import Text, literal, select, union_all
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional
+import logging
+
+from app.core.config import settings
+from app.db.cache import preference_cache
+from app.db.listing import user_ids_query
+from app.db.session import get_db, get_read_db
+from app.dto.profile import ProfileCreate, ProfileResponse
+from app.dto.sects import MessageResponse
+from app.endpoints.age_range import build_age_range
+from app.endpoints.gender import build_gender
+from app.endpoints.partner_age_range import build_partner_age_range
+from app.endpoints.partner_children_expectations import build_partner_children_expectations
+from app.endpoints.partner_ethnics import build_partner_ethnics
+from app.endpoints.partner_height import build_partner_height
+from app.endpoints.partner_marriage_timeline import build_partner_marriage_timeline
+from app.endpoints.partner_personality_traits import build_partner_personality_traits
+from app.endpoints.prayer_frequency import build_prayer_frequency
+from app.endpoints.religious_level import build_religious_level
+from app.endpoints.sects import build_sects
+from app.endpoints.smoking_status import build_smoking_status
+from app.matching.feed import record_profile_change
+from app.schemas.age_range import AgeRange
+from app.schemas.gender import Gender
+from app.schemas.partner_age_range import PartnerAgeRange
+from app.schemas.partner_children_expectations import PartnerChildrenExpectations
+from app.schemas.partner_ethnics import PartnerEthnics
+from app.schemas.partner_height import PartnerHeight
+from app.schemas.partner_marriage_timeline import PartnerMarriageTimeline
+from app.schemas.partner_personality_traits import PartnerPersonalityTraitsScore
+from app.schemas.prayer_frequency import PrayerFrequency
+from app.schemas.religious_level import ReligiousLevel
+from app.schemas.sects import Sects
+from app.schemas.smoking_status import SmokingStatus
+
+router = APIRouter(
+    prefix="/profile",
+    tags=["profile"],
+    responses={404: {"description": "Not found"}},
+)
+
+logger = logging.getLogger(__name__)
+
+# Profile section -> table it is read from, in response order.
+PROFILE_MODELS = {
+    "gender": Gender,
+    "age_range": AgeRange,
+    "partner_age_range": PartnerAgeRange,
+    "partner_children_expectations": PartnerChildrenExpectations,
+    "partner_ethnics": PartnerEthnics,
+    "partner_height": PartnerHeight,
+    "partner_marriage_timeline": PartnerMarriageTimeline,
+    "partner_personality_traits": PartnerPersonalityTraitsScore,
+    "prayer_frequency": PrayerFrequency,
+    "religious_level": ReligiousLevel,
+    "sects": Sects,
+    "smoking_status": SmokingStatus,
+}
+
+# Profile section -> the resource endpoint's row builder for its create DTO.
+PROFILE_BUILDERS = {
+    "gender": build_gender,
+    "age_range": build_age_range,
+    "partner_age_range": build_partner_age_range,
+    "partner_children_expectations": build_partner_children_expectations,
+    "partner_ethnics": build_partner_ethnics,
+    "partner_height": build_partner_height,
+    "partner_marriage_timeline": build_partner_marriage_timeline,
+    "partner_personality_traits": build_partner_personality_traits,
+    "prayer_frequency": build_prayer_frequency,
+    "religious_level": build_religious_level,
+    "sects": build_sects,
+    "smoking_status": build_smoking_status,
+}
+
+# Sections returned as the list of selected columns rather than every flag.
+LIST_SECTIONS = {
+    "partner_ethnics": "partner_ethnic_origins",
+    "partner_personality_traits": "partner_personality_traits",
+}
+
+
+def _selected_columns(row) -> List[str]:
+    return [column.name for column in row.__table__.columns if column.name != 'user_id' and getattr(row, column.name) is True]
+
+
+def _load_profiles(db: Session, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Every profile section of ``user_ids`` in one statement: the ids LEFT JOIN each table."""
+    ids = union_all(*(select(literal(user_id, Text).label("user_id")) for user_id in user_ids)).subquery("ids")
+    statement = select(ids.c.user_id, *PROFILE_MODELS.values()).select_from(ids)
+    for model in PROFILE_MODELS.values():
+        statement = statement.outerjoin(model, model.user_id == ids.c.user_id)
+
+    profiles = {}
+    for user_id, *rows in db.execute(statement):
+        if all(row is None for row in rows):
+            continue
+        profile: Dict[str, Any] = {"user_id": user_id}
+        for section, row in zip(PROFILE_MODELS, rows):
+            if row is not None and section in LIST_SECTIONS:
+                row = {"user_id": user_id, LIST_SECTIONS[section]: _selected_columns(row)}
+            profile[section] = row
+        profiles[user_id] = profile
+    return profiles
+
+
+@router.post("", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
+def create_profile(profile: ProfileCreate, db: Session = Depends(get_db)):
+    try:
+        records = [
+            PROFILE_BUILDERS[section](payload)
+            for section in PROFILE_MODELS
+            if (payload := getattr(profile, section)) is not None
+        ]
+        if not records:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Profile has no sections to create")
+        
+        # No existence SELECTs: the primary keys reject a section the user already has.
+        db.add_all(records)
+        record_profile_change(db, profile.user_id)
+        db.commit()
+        
+        return {"message": f"Profile for user {profile.user_id} created successfully"}
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except HTTPException:
+        raise
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Profile data already exists for user {profile.user_id}"
+        )
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error creating profile for user {profile.user_id}: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.get("", response_model=List[ProfileResponse])
+def get_profiles(
+    user_ids: Optional[List[str]] = Depends(user_ids_query),
+    db: Session = Depends(get_read_db)
+):
+    if not user_ids:
+        raise HTTPException(status_code=422, detail="user_ids is required")
+    # Each profile joins every section table, so batches stay smaller than other multi-gets.
+    if len(user_ids) > settings.PROFILE_BATCH_MAX:
+        raise HTTPException(status_code=422, detail=f"At most {settings.PROFILE_BATCH_MAX} user_ids per request")
+    try:
+        profiles = _load_profiles(db, user_ids)
+        return [profiles[user_id] for user_id in user_ids if user_id in profiles]
+    except Exception as e:
+        logger.error(f"Error reading profiles: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+
+@router.get("/{user_id}", response_model=ProfileResponse)
+@preference_cache.read_through("profile", ProfileResponse, list(PROFILE_MODELS.values()))
+def get_profile(user_id: str, db: Session = Depends(get_read_db)):
+    try:
+        profile = _load_profiles(db, [user_id]).get(user_id)
+        if not profile:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Profile not found for user {user_id}")
+        return profile
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error reading profile for user {user_id}: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
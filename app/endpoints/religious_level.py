@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Any, Dict, Optional, Union
 
-from app.db.session import get_db
+from app.core.config import settings
+from app.db.bulk import bulk_upsert
+from app.db.cache import preference_cache
+from app.db.listing import fetch_by_user_ids, keyset_page, stream_ndjson, user_ids_query
+from app.db.session import get_db, get_lookup_read_db, get_read_db
+from app.db.writes import delete_row, insert_row, update_row
+from app.matching.feed import record_profile_change
+from app.dto.bulk import BulkUpsertResponse
+from app.dto.lookup import UserIdsLookup
 from app.schemas.religious_level import ReligiousLevel
 from app.dto.religious_level import (
     ReligiousLevelBase, 
@@ -18,28 +26,31 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+def build_religious_level(religious_level: ReligiousLevelCreate) -> ReligiousLevel:
+    new_religious_level = ReligiousLevel(user_id=religious_level.user_id)
+    
+    new_religious_level.very_practising = False
+    new_religious_level.practising = False
+    new_religious_level.moderately_practising = False
+    new_religious_level.not_practising = False
+    
+    setattr(new_religious_level, religious_level.religious_level, True)
+    
+    return new_religious_level
+
 @router.post("", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
 def create_religious_level(religious_level: ReligiousLevelCreate, db: Session = Depends(get_db)):
     try:
-        existing_record = db.query(ReligiousLevelScore).filter(ReligiousLevelScore.user_id == religious_level.user_id).first()
-        if existing_record:
+        new_religious_level = build_religious_level(religious_level)
+        
+        record_profile_change(db, religious_level.user_id)
+        if not insert_row(db, new_religious_level):
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"The record with id {religious_level.user_id} already exists"
             )
-        
-        new_religious_level = ReligiousLevelScore(user_id=religious_level.user_id)
-        
-        new_religious_level.very_practising = False
-        new_religious_level.practising = False
-        new_religious_level.moderately_practising = False
-        new_religious_level.not_practising = False
-        
-        setattr(new_religious_level, religious_level.religious_level, True)
-        
-        db.add(new_religious_level)
         db.commit()
-        db.refresh(new_religious_level)
         
         return {"message": f"Religious level for user {religious_level.user_id} created successfully"}
     except HTTPException:
@@ -48,11 +59,29 @@ def create_religious_level(religious_level: ReligiousLevelCreate, db: Session =
         db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-@router.get("", response_model=List[ReligiousLevelResponse])
-def get_all_religious_level_preferences(db: Session = Depends(get_db)):
+@router.post("/bulk", response_model=BulkUpsertResponse)
+def bulk_upsert_religious_level(
+    records: List[Dict[str, Any]] = Body(..., max_length=settings.BULK_MAX_ROWS),
+    db: Session = Depends(get_db)
+):
+    return bulk_upsert(db, records, ReligiousLevelCreate, build_religious_level, record_profile_change)
+
+@router.get("", response_model=Union[List[ReligiousLevelResponse], Dict[str, Optional[ReligiousLevelResponse]]])
+def get_all_religious_level_preferences(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.LIST_DEFAULT_LIMIT, ge=1, le=settings.LIST_MAX_LIMIT),
+    stream: bool = False,
+    user_ids: Optional[List[str]] = Depends(user_ids_query),
+    db: Session = Depends(get_read_db)
+):
     try:
-        religious_levels = db.query(ReligiousLevelScore).all()
-        if not religious_levels:
+        if user_ids:
+            return fetch_by_user_ids(db, ReligiousLevel, user_ids)
+        if stream:
+            return stream_ndjson(ReligiousLevel, ReligiousLevelResponse.model_validate, cursor)
+        religious_levels = keyset_page(db, ReligiousLevel, cursor, limit, response)
+        if not religious_levels and cursor is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No religious level records found")
         return religious_levels
     except HTTPException:
@@ -60,10 +89,15 @@ def get_all_religious_level_preferences(db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
+@router.post("/lookup", response_model=Dict[str, Optional[ReligiousLevelResponse]])
+def lookup_religious_level_preferences(lookup: UserIdsLookup, db: Session = Depends(get_lookup_read_db)):
+    return fetch_by_user_ids(db, ReligiousLevel, lookup.user_ids)
+
 @router.get("/{user_id}", response_model=ReligiousLevelResponse)
-def get_religious_level(user_id: str, db: Session = Depends(get_db)):
+@preference_cache.read_through("religious_level", ReligiousLevelResponse, [ReligiousLevel])
+def get_religious_level(user_id: str, db: Session = Depends(get_read_db)):
     try:
-        religious_level = db.query(ReligiousLevelScore).filter(ReligiousLevelScore.user_id == user_id).first()
+        religious_level = db.query(ReligiousLevel).filter(ReligiousLevel.user_id == user_id).first()
         if not religious_level:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Religious level not found for user {user_id}")
         return religious_level
@@ -75,19 +109,13 @@ def get_religious_level(user_id: str, db: Session = Depends(get_db)):
 @router.put("/{user_id}", response_model=MessageResponse)
 def update_religious_level(user_id: str, religious_level: ReligiousLevelUpdate, db: Session = Depends(get_db)):
     try:
-        db_religious_level = db.query(ReligiousLevelScore).filter(ReligiousLevelScore.user_id == user_id).first()
-        if not db_religious_level:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Religious level not found for user {user_id}")
-        
-        db_religious_level.very_practising = False
-        db_religious_level.practising = False
-        db_religious_level.moderately_practising = False
-        db_religious_level.not_practising = False
-        
-        setattr(db_religious_level, religious_level.religious_level, True)
+        db_religious_level = build_religious_level(ReligiousLevelCreate(user_id=user_id, **religious_level.model_dump()))
         
+        record_profile_change(db, user_id)
+        if not update_row(db, db_religious_level):
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Religious level not found for user {user_id}")
         db.commit()
-        db.refresh(db_religious_level)
         return {"message": f"Religious level for user {user_id} updated successfully"}
     except HTTPException:
         raise
@@ -98,11 +126,10 @@ def update_religious_level(user_id: str, religious_level: ReligiousLevelUpdate,
 @router.delete("/{user_id}", response_model=MessageResponse)
 def delete_religious_level(user_id: str, db: Session = Depends(get_db)):
     try:
-        db_religious_level = db.query(ReligiousLevelScore).filter(ReligiousLevelScore.user_id == user_id).first()
-        if not db_religious_level:
+        record_profile_change(db, user_id)
+        if not delete_row(db, ReligiousLevel, user_id=user_id):
+            db.rollback()
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Religious level not found for user {user_id}")
-        
-        db.delete(db_religious_level)
         db.commit()
         return {"message": f"Religious level for user {user_id} deleted successfully"}
     except HTTPException:
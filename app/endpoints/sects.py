@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Any, Dict, Optional, Union
 
-from app.db.session import get_db
+from app.core.config import settings
+from app.db.bulk import bulk_upsert
+from app.db.cache import preference_cache
+from app.db.listing import fetch_by_user_ids, keyset_page, stream_ndjson, user_ids_query
+from app.db.session import get_db, get_lookup_read_db, get_read_db
+from app.db.writes import delete_row, insert_row, update_row
+from app.matching.feed import record_profile_change
+from app.dto.bulk import BulkUpsertResponse
+from app.dto.lookup import UserIdsLookup
 from app.schemas.sects import Sects
 from app.dto.sects import (
     SectsCreate,
@@ -17,27 +25,30 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+def build_sects(sects: SectsCreate) -> Sects:
+    new_sects = Sects(user_id=sects.user_id)
+    
+    for field in new_sects.__dict__:
+        if isinstance(getattr(new_sects, field, None), bool):
+            setattr(new_sects, field, False)
+    
+    setattr(new_sects, sects.sects, True)
+    
+    return new_sects
+
 @router.post("", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
 def create_sects(sects: SectsCreate, db: Session = Depends(get_db)):
     try:
-        existing_record = db.query(SectsScore).filter(SectsScore.user_id == sects.user_id).first()
-        if existing_record:
+        new_sects = build_sects(sects)
+        
+        record_profile_change(db, sects.user_id)
+        if not insert_row(db, new_sects):
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"The record with id {sects.user_id} already exists"
             )
-        
-        new_sects = SectsScore(user_id=sects.user_id)
-        
-        for field in new_sects.__dict__:
-            if isinstance(getattr(new_sects, field, None), bool):
-                setattr(new_sects, field, False)
-        
-        setattr(new_sects, sects.sects, True)
-        
-        db.add(new_sects)
         db.commit()
-        db.refresh(new_sects)
         
         return {"message": f"Sects for user {sects.user_id} created successfully"}
     except HTTPException:
@@ -46,11 +57,29 @@ def create_sects(sects: SectsCreate, db: Session = Depends(get_db)):
         db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-@router.get("", response_model=List[SectsResponse])
-def get_all_sects_preferences(db: Session = Depends(get_db)):
+@router.post("/bulk", response_model=BulkUpsertResponse)
+def bulk_upsert_sects(
+    records: List[Dict[str, Any]] = Body(..., max_length=settings.BULK_MAX_ROWS),
+    db: Session = Depends(get_db)
+):
+    return bulk_upsert(db, records, SectsCreate, build_sects, record_profile_change)
+
+@router.get("", response_model=Union[List[SectsResponse], Dict[str, Optional[SectsResponse]]])
+def get_all_sects_preferences(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.LIST_DEFAULT_LIMIT, ge=1, le=settings.LIST_MAX_LIMIT),
+    stream: bool = False,
+    user_ids: Optional[List[str]] = Depends(user_ids_query),
+    db: Session = Depends(get_read_db)
+):
     try:
-        sects = db.query(SectsScore).all()
-        if not sects:
+        if user_ids:
+            return fetch_by_user_ids(db, Sects, user_ids)
+        if stream:
+            return stream_ndjson(Sects, SectsResponse.model_validate, cursor)
+        sects = keyset_page(db, Sects, cursor, limit, response)
+        if not sects and cursor is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No sects records found")
         return sects
     except HTTPException:
@@ -59,10 +88,15 @@ def get_all_sects_preferences(db: Session = Depends(get_db)):
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
+@router.post("/lookup", response_model=Dict[str, Optional[SectsResponse]])
+def lookup_sects_preferences(lookup: UserIdsLookup, db: Session = Depends(get_lookup_read_db)):
+    return fetch_by_user_ids(db, Sects, lookup.user_ids)
+
 @router.get("/{user_id}", response_model=SectsResponse)
-def get_user_sects(user_id: str, db: Session = Depends(get_db)):
+@preference_cache.read_through("sects", SectsResponse, [Sects])
+def get_user_sects(user_id: str, db: Session = Depends(get_read_db)):
     try:
-        sects = db.query(SectsScore).filter(SectsScore.user_id == user_id).first()
+        sects = db.query(Sects).filter(Sects.user_id == user_id).first()
         if not sects:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Sects not found for user {user_id}")
         return sects
@@ -74,18 +108,13 @@ def get_user_sects(user_id: str, db: Session = Depends(get_db)):
 @router.put("/{user_id}", response_model=MessageResponse)
 def update_sects(user_id: str, sects: SectsUpdate, db: Session = Depends(get_db)):
     try:
-        db_sects = db.query(SectsScore).filter(SectsScore.user_id == user_id).first()
-        if not db_sects:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Sects not found for user {user_id}")
-        
-        for field in db_sects.__dict__:
-            if isinstance(getattr(db_sects, field, None), bool):
-                setattr(db_sects, field, False)
-        
-        setattr(db_sects, sects.sects, True)
+        db_sects = build_sects(SectsCreate(user_id=user_id, **sects.model_dump()))
         
+        record_profile_change(db, user_id)
+        if not update_row(db, db_sects):
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Sects not found for user {user_id}")
         db.commit()
-        db.refresh(db_sects)
         return {"message": f"Sects for user {user_id} updated successfully"}
     except HTTPException:
         raise
@@ -96,11 +125,10 @@ def update_sects(user_id: str, sects: SectsUpdate, db: Session = Depends(get_db)
 @router.delete("/{user_id}", response_model=MessageResponse)
 def delete_sects(user_id: str, db: Session = Depends(get_db)):
     try:
-        db_sects = db.query(SectsScore).filter(SectsScore.user_id == user_id).first()
-        if not db_sects:
+        record_profile_change(db, user_id)
+        if not delete_row(db, Sects, user_id=user_id):
+            db.rollback()
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Sects not found for user {user_id}")
-        
-        db.delete(db_sects)
         db.commit()
         return {"message": f"Sects for user {user_id} deleted successfully"}
     except HTTPException:
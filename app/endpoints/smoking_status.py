@@ -1,8 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Any, Dict, Optional, Union
 
-from app.db.session import get_db
+from app.core.config import settings
+from app.db.bulk import bulk_upsert
+from app.db.cache import preference_cache
+from app.db.listing import fetch_by_user_ids, keyset_page, stream_ndjson, user_ids_query
+from app.db.session import get_db, get_lookup_read_db, get_read_db
+from app.db.writes import delete_row, insert_row, update_row
+from app.matching.feed import record_profile_change
+from app.dto.bulk import BulkUpsertResponse
+from app.dto.lookup import UserIdsLookup
 from app.schemas.smoking_status import SmokingStatus
 from app.dto.smoking_status import (
     SmokingStatusBase,
@@ -18,24 +26,27 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+def build_smoking_status(smoking_status: SmokingStatusCreate) -> SmokingStatus:
+    new_smoking_status = SmokingStatus(
+        user_id=smoking_status.user_id,
+        does_smoke=smoking_status.does_smoke
+    )
+    
+    return new_smoking_status
+
 @router.post("", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
 def create_smoking_status(smoking_status: SmokingStatusCreate, db: Session = Depends(get_db)):
     try:
-        existing_record = db.query(SmokingStatusScore).filter(SmokingStatusScore.user_id == smoking_status.user_id).first()
-        if existing_record:
+        new_smoking_status = build_smoking_status(smoking_status)
+        
+        record_profile_change(db, smoking_status.user_id)
+        if not insert_row(db, new_smoking_status):
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"The record with id {smoking_status.user_id} already exists"
             )
-        
-        new_smoking_status = SmokingStatusScore(
-            user_id=smoking_status.user_id,
-            does_smoke=smoking_status.does_smoke
-        )
-        
-        db.add(new_smoking_status)
         db.commit()
-        db.refresh(new_smoking_status)
         
         return {"message": f"Smoking status for user {smoking_status.user_id} created successfully"}
     except HTTPException:
@@ -44,11 +55,29 @@ def create_smoking_status(smoking_status: SmokingStatusCreate, db: Session = Dep
         db.rollback()
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
-@router.get("", response_model=List[SmokingStatusResponse])
-def get_all_smoking_statuses(db: Session = Depends(get_db)):
+@router.post("/bulk", response_model=BulkUpsertResponse)
+def bulk_upsert_smoking_status(
+    records: List[Dict[str, Any]] = Body(..., max_length=settings.BULK_MAX_ROWS),
+    db: Session = Depends(get_db)
+):
+    return bulk_upsert(db, records, SmokingStatusCreate, build_smoking_status, record_profile_change)
+
+@router.get("", response_model=Union[List[SmokingStatusResponse], Dict[str, Optional[SmokingStatusResponse]]])
+def get_all_smoking_statuses(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.LIST_DEFAULT_LIMIT, ge=1, le=settings.LIST_MAX_LIMIT),
+    stream: bool = False,
+    user_ids: Optional[List[str]] = Depends(user_ids_query),
+    db: Session = Depends(get_read_db)
+):
     try:
-        smoking_statuses = db.query(SmokingStatusScore).all()
-        if not smoking_statuses:
+        if user_ids:
+            return fetch_by_user_ids(db, SmokingStatus, user_ids)
+        if stream:
+            return stream_ndjson(SmokingStatus, SmokingStatusResponse.model_validate, cursor)
+        smoking_statuses = keyset_page(db, SmokingStatus, cursor, limit, response)
+        if not smoking_statuses and cursor is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No smoking status records found")
         return smoking_statuses
     except HTTPException:
@@ -56,10 +85,15 @@ def get_all_smoking_statuses(db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
+@router.post("/lookup", response_model=Dict[str, Optional[SmokingStatusResponse]])
+def lookup_smoking_statuses(lookup: UserIdsLookup, db: Session = Depends(get_lookup_read_db)):
+    return fetch_by_user_ids(db, SmokingStatus, lookup.user_ids)
+
 @router.get("/{user_id}", response_model=SmokingStatusResponse)
-def get_smoking_status(user_id: str, db: Session = Depends(get_db)):
+@preference_cache.read_through("smoking_status", SmokingStatusResponse, [SmokingStatus])
+def get_smoking_status(user_id: str, db: Session = Depends(get_read_db)):
     try:
-        smoking_status = db.query(SmokingStatusScore).filter(SmokingStatusScore.user_id == user_id).first()
+        smoking_status = db.query(SmokingStatus).filter(SmokingStatus.user_id == user_id).first()
         if not smoking_status:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Smoking status not found for user {user_id}")
         return smoking_status
@@ -71,14 +105,13 @@ def get_smoking_status(user_id: str, db: Session = Depends(get_db)):
 @router.put("/{user_id}", response_model=MessageResponse)
 def update_smoking_status(user_id: str, smoking_status: SmokingStatusUpdate, db: Session = Depends(get_db)):
     try:
-        db_smoking_status = db.query(SmokingStatusScore).filter(SmokingStatusScore.user_id == user_id).first()
-        if not db_smoking_status:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Smoking status not found for user {user_id}")
-        
-        db_smoking_status.does_smoke = smoking_status.does_smoke
+        db_smoking_status = build_smoking_status(SmokingStatusCreate(user_id=user_id, **smoking_status.model_dump()))
         
+        record_profile_change(db, user_id)
+        if not update_row(db, db_smoking_status):
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Smoking status not found for user {user_id}")
         db.commit()
-        db.refresh(db_smoking_status)
         return {"message": f"Smoking status for user {user_id} updated successfully"}
     except HTTPException:
         raise
@@ -89,11 +122,10 @@ def update_smoking_status(user_id: str, smoking_status: SmokingStatusUpdate, db:
 @router.delete("/{user_id}", response_model=MessageResponse)
 def delete_smoking_status(user_id: str, db: Session = Depends(get_db)):
     try:
-        db_smoking_status = db.query(SmokingStatusScore).filter(SmokingStatusScore.user_id == user_id).first()
-        if not db_smoking_status:
+        record_profile_change(db, user_id)
+        if not delete_row(db, SmokingStatus, user_id=user_id):
+            db.rollback()
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Smoking status not found for user {user_id}")
-        
-        db.delete(db_smoking_status)
         db.commit()
         return {"message": f"Smoking status for user {user_id} deleted successfully"}
     except HTTPException:
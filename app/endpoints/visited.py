@@ -4,8 +4,10 @@ from typing import List, Any, Dict
 import logging
 
 from app.db.session import get_db
+from app.matching.engine import candidate_engine
+from app.matching.feed import record_visit
 from app.schemas.visited import Visited
-from app.dto.visited import VisitedCreate, VisitedUpdate , MessageResponse
+from app.dto.visited import VisitedCreate, VisitedUpdate , MessageResponse, VisitedFilterStatsResponse
 
 router = APIRouter(prefix="/visited", tags=["visited"])
 logger = logging.getLogger(__name__)
@@ -18,9 +20,9 @@ def create_visited(
     visited_in: VisitedCreate
 ) -> Any:
     try:
-        existing_record = db.query(VisitedScore).filter(
-            VisitedScore.user_id == visited_in.user_id,
-            VisitedScore.visited_user_id == visited_in.visited_user_id
+        existing_record = db.query(Visited).filter(
+            Visited.user_id == visited_in.user_id,
+            Visited.visited_user_id == visited_in.visited_user_id
         ).first()
         
         if existing_record:
@@ -29,11 +31,12 @@ def create_visited(
                 detail=f"Visit record already exists for user {visited_in.user_id} and visited user {visited_in.visited_user_id}"
             )
         
-        db_obj = VisitedScore(
+        db_obj = Visited(
             user_id=visited_in.user_id,
             visited_user_id=visited_in.visited_user_id
         )
         db.add(db_obj)
+        record_visit(db, visited_in.user_id, visited_in.visited_user_id)
         db.commit()
         db.refresh(db_obj)
         return {"message": "Visit record created successfully"}
@@ -56,9 +59,9 @@ def update_visited(
 ) -> Any:
 
     try:
-        record = db.query(VisitedScore).filter(
-            VisitedScore.user_id == visited_in.user_id,
-            VisitedScore.visited_user_id == visited_in.visited_user_id
+        record = db.query(Visited).filter(
+            Visited.user_id == visited_in.user_id,
+            Visited.visited_user_id == visited_in.visited_user_id
         ).first()
         
         if not record:
@@ -76,4 +79,17 @@ def update_visited(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to update visited record: {str(e)}"
-        ) 
\ No newline at end of file
+        ) 
+
+
+@router.get("/stats", response_model=VisitedFilterStatsResponse)
+def get_visited_filter_stats(db: Session = Depends(get_db)) -> Any:
+    try:
+        candidate_engine.ensure_loaded(db)
+        return VisitedFilterStatsResponse(**candidate_engine.visited.stats())
+    except Exception as e:
+        logger.error(f"Error reading visited filter stats: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to read visited filter stats: {str(e)}"
+        )
@@ -0,0 +1,225 @@
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, insert, or_
+
+from app.core.config import settings
+from app.db.database import Base, SessionLocal, engine
+from app.db.writes import upsert_rows
+from app.matching.engine import CandidateEngine
+from app.matching.matrix import CandidateMatrix
+from app.matching.pairs import pair_index
+from app.matching.user_ids import user_id_registry
+from app.matching.scoring import ORDINAL_FIELDS, OVERLAP_FIELDS, SCORE_WEIGHTS, ordinal_levels
+from app.schemas.candidate_feed import CandidateFeed
+from app.schemas.candidate_feed_state import CandidateFeedState
+from app.schemas.user_id import UserId
+from app.schemas.visited import Visited
+
+logger = logging.getLogger(__name__)
+
+NARROW_FIELDS = ("gender", "age", "partner_age", "sect", "smoking")
+
+
+def unpack_bits(words: np.ndarray, width: int) -> np.ndarray:
+    """Turn a ``(words, n)`` bitmask column into an ``(n, width)`` 0/1 uint8 matrix."""
+    raw = np.ascontiguousarray(words.T, dtype=words.dtype.newbyteorder("<")).view(np.uint8)
+    return np.unpackbits(raw, axis=1, bitorder="little")[:, :width]
+
+
+class Population:
+    """Every user's attributes in the layout the block scorer multiplies."""
+
+    def __init__(self, matrix: CandidateMatrix):
+        self.size = matrix.size
+        self.present = matrix.present[:self.size].copy()
+        self.narrow = {field: matrix.view(field)[0].copy() for field in NARROW_FIELDS}
+        self.levels = {field: ordinal_levels(matrix.view(field)[0]).astype(np.int16) for field in ORDINAL_FIELDS}
+        self.bits = {field: unpack_bits(matrix.view(field), matrix.codecs[field].width) for field in OVERLAP_FIELDS}
+        self.counts = {field: matrix.counts[field][:self.size].astype(np.float32) for field in OVERLAP_FIELDS}
+
+
+def score_block(population: Population, rows: slice, columns: slice) -> np.ndarray:
+    """Scores of users ``rows`` against candidates ``columns``; incompatible pairs and a user against itself get -inf."""
+    def pair(values: np.ndarray):
+        return values[rows, None], values[None, columns]
+
+    gender_r, gender_c = pair(population.narrow["gender"])
+    age_r, age_c = pair(population.narrow["age"])
+    partner_age_r, partner_age_c = pair(population.narrow["partner_age"])
+    present_r, present_c = pair(population.present)
+    ok = present_r & present_c
+    ok &= np.arange(rows.start, rows.stop)[:, None] != np.arange(columns.start, columns.stop)[None, :]
+    ok &= (gender_r == 0) | ((gender_c != 0) & ((gender_r & gender_c) == 0))
+    ok &= (partner_age_r == 0) | ((age_c & partner_age_r) != 0)
+    ok &= (age_r == 0) | (partner_age_c == 0) | ((partner_age_c & age_r) != 0)
+
+    sect_r, sect_c = pair(population.narrow["sect"])
+    scores = np.float32(SCORE_WEIGHTS["sect"]) * ((sect_r == sect_c) & (sect_r != 0))
+    smoking_r, smoking_c = pair(population.narrow["smoking"])
+    scores += np.float32(SCORE_WEIGHTS["smoking"]) * (smoking_r == smoking_c)
+
+    for field, levels in ORDINAL_FIELDS.items():
+        level_r, level_c = pair(population.levels[field])
+        proximity = 1.0 - np.abs(level_r - level_c).astype(np.float32) / (levels - 1)
+        scores += np.float32(SCORE_WEIGHTS[field]) * np.where((level_r >= 0) & (level_c >= 0), proximity, np.float32(0))
+
+    for field in OVERLAP_FIELDS:
+        # |A & B| for every pair is a product of the unpacked bit matrices.
+        bits = population.bits[field]
+        shared = bits[rows].astype(np.float32) @ bits[columns].astype(np.float32).T
+        counts_r, counts_c = pair(population.counts[field])
+        union = counts_r + counts_c - shared
+        overlap = np.divide(shared, union, out=np.zeros_like(shared), where=union > 0)
+        scores += np.float32(SCORE_WEIGHTS[field]) * overlap
+
+    scores[~ok] = -np.inf
+    return scores
+
+
+# Set in the parent before the pool forks, so workers inherit it without pickling.
+_population: Optional[Population] = None
+_exclusions: Dict[int, np.ndarray] = {}
+
+
+def top_k_rows(start: int, stop: int, top_k: int, column_block: int) -> Tuple[int, np.ndarray, np.ndarray]:
+    """Best ``top_k`` candidate positions and scores for users ``start:stop``."""
+    population = _population
+    rows = stop - start
+    best_positions = np.full((rows, top_k), -1, dtype=np.int64)
+    best_scores = np.full((rows, top_k), -np.inf, dtype=np.float32)
+    for column_start in range(0, population.size, column_block):
+        column_stop = min(column_start + column_block, population.size)
+        scores = score_block(population, slice(start, stop), slice(column_start, column_stop))
+        for row in range(rows):
+            excluded = _exclusions.get(start + row)
+            if excluded is not None:
+                excluded = excluded[(excluded >= column_start) & (excluded < column_stop)]
+                scores[row, excluded - column_start] = -np.inf
+
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        merged_positions = np.concatenate(
+            [best_positions, np.broadcast_to(np.arange(column_start, column_stop), scores.shape)], axis=1
+        )
+        keep = np.argpartition(-merged_scores, top_k - 1, axis=1)[:, :top_k]
+        best_scores = np.take_along_axis(merged_scores, keep, axis=1)
+        best_positions = np.take_along_axis(merged_positions, keep, axis=1)
+
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    return start, np.take_along_axis(best_positions, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+def _build_exclusions(db) -> Dict[int, np.ndarray]:
+    # The engine only keeps visited pairs as Bloom filters; the batch needs them
+    # exactly for every row, so they are streamed from the table instead.
+    excluded: Dict[int, List[int]] = {dense_id: list(others) for dense_id, others in pair_index.partners.items()}
+    for user_id, visited_user_id in db.query(Visited.user_id, Visited.visited_user_id).yield_per(10000):
+        dense_id, visited_dense_id = user_id_registry.lookup(user_id), user_id_registry.lookup(visited_user_id)
+        if dense_id is not None and visited_dense_id is not None:
+            excluded.setdefault(dense_id, []).append(visited_dense_id)
+    return {dense_id: np.array(others, dtype=np.int64) for dense_id, others in excluded.items()}
+
+
+def _write_feeds(
+    db,
+    user_ids: List[Optional[str]],
+    present: np.ndarray,
+    start: int,
+    positions: np.ndarray,
+    scores: np.ndarray,
+    computed_at: datetime
+) -> int:
+    block = [
+        (user_ids[row], user_positions, user_scores)
+        for row, user_positions, user_scores in zip(
+            range(start, start + len(positions)), positions.tolist(), scores.tolist()
+        )
+        if present[row]
+    ]
+    block_users = [user_id for user_id, _, _ in block]
+    # Users without preferences any more lose the feed they had, and their
+    # state unless they changed again after the engine was loaded.
+    absent_users = [
+        user_ids[row] for row in range(start, start + len(positions))
+        if not present[row] and user_ids[row] is not None
+    ]
+    rows = []
+    for user_id, user_positions, user_scores in block:
+        for rank, (candidate, score) in enumerate(zip(user_positions, user_scores), start=1):
+            if candidate < 0 or score == -np.inf:
+                break
+            rows.append({
+                "user_id": user_id,
+                "rank": rank,
+                "candidate_id": user_ids[candidate],
+                "score": score,
+                "computed_at": computed_at
+            })
+    db.execute(delete(CandidateFeed).where(CandidateFeed.user_id.in_(block_users + absent_users)))
+    if absent_users:
+        db.execute(delete(CandidateFeedState).where(
+            CandidateFeedState.user_id.in_(absent_users),
+            or_(CandidateFeedState.changed_at.is_(None), CandidateFeedState.changed_at <= computed_at)
+        ))
+    if rows:
+        db.execute(insert(CandidateFeed), rows)
+    for chunk in range(0, len(block_users), settings.BULK_CHUNK_SIZE):
+        upsert_rows(
+            db,
+            CandidateFeedState,
+            [{"user_id": user_id, "computed_at": computed_at} for user_id in block_users[chunk:chunk + settings.BULK_CHUNK_SIZE]],
+            ["computed_at"]
+        )
+    db.commit()
+    return len(rows)
+
+
+def recompute_candidate_feeds(
+    top_k: Optional[int] = None,
+    workers: Optional[int] = None,
+    row_block: Optional[int] = None,
+    column_block: Optional[int] = None
+) -> int:
+    """Recompute the top-K candidate feed of every user and store it in candidate_feed."""
+    global _population, _exclusions
+    top_k = top_k or settings.CANDIDATE_FEED_SIZE
+    workers = workers or settings.CANDIDATE_BATCH_WORKERS or os.cpu_count() or 1
+    row_block = row_block or settings.CANDIDATE_BATCH_ROW_BLOCK
+    column_block = column_block or settings.CANDIDATE_BATCH_COLUMN_BLOCK
+
+    Base.metadata.create_all(bind=engine, tables=[CandidateFeed.__table__, CandidateFeedState.__table__, UserId.__table__])
+    start_time = time.perf_counter()
+    computed_at = datetime.utcnow()
+    candidate_engine = CandidateEngine()
+    db = SessionLocal()
+    try:
+        candidate_engine.load(db)
+        pair_index.load(db)
+        _population = Population(candidate_engine.matrix)
+        _exclusions = _build_exclusions(db)
+        user_ids, present, size = candidate_engine.user_ids, _population.present, _population.size
+        blocks = [(start, min(start + row_block, size)) for start in range(0, size, row_block)]
+        logger.info(f"Scoring {int(present.sum())} users in {len(blocks)} blocks with {workers} workers")
+
+        written = 0
+        if workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                futures = [pool.submit(top_k_rows, start, stop, top_k, column_block) for start, stop in blocks]
+                for future in futures:
+                    written += _write_feeds(db, user_ids, present, *future.result(), computed_at)
+        else:
+            for start, stop in blocks:
+                written += _write_feeds(db, user_ids, present, *top_k_rows(start, stop, top_k, column_block), computed_at)
+    finally:
+        _population, _exclusions = None, {}
+        db.close()
+
+    logger.info(f"Wrote {written} candidate feed rows in {time.perf_counter() - start_time:.2f}s")
+    return written
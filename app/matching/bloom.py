@@ -0,0 +1,195 @@
+import hashlib
+import logging
+import math
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Each sub-filter added to a full ScalableBloomFilter holds GROWTH times more
+# keys at TIGHTENING times the previous false-positive rate, so the compound
+# rate stays below the rate the first filter was sized for.
+GROWTH = 2
+TIGHTENING = 0.5
+
+LN2_SQUARED = math.log(2) ** 2
+
+# Share of the memory budget a plan may fill. The rest is room for visits
+# added after it, so filters rebuilt at the budget do not pass it again on
+# the next visit.
+PLAN_FILL = 0.9
+
+# A dense user id past the small-int cache is its own int object.
+_INT_BYTES = sys.getsizeof(1 << 30)
+
+
+def _hashes(key: int) -> Tuple[int, int]:
+    digest = hashlib.blake2b(key.to_bytes(8, "little"), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+def bits_for(capacity: int, fp_rate: float) -> int:
+    """Bits a Bloom filter needs to hold ``capacity`` keys at ``fp_rate``."""
+    return max(8, math.ceil(-capacity * math.log(fp_rate) / LN2_SQUARED))
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over dense user ids, using double hashing."""
+
+    __slots__ = ("bits", "size", "hash_count", "capacity", "count")
+
+    def __init__(self, capacity: int, fp_rate: float):
+        self.capacity = max(1, capacity)
+        self.size = bits_for(self.capacity, fp_rate)
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: int) -> Iterable[int]:
+        # Enhanced double hashing: the cubic term keeps the probes distinct
+        # even when h2 shares a factor with a small filter size.
+        h1, h2 = _hashes(key)
+        return ((h1 + i * h2 + (i ** 3 - i) // 6) % self.size for i in range(self.hash_count))
+
+    def add(self, key: int) -> None:
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: int) -> bool:
+        return all(self.bits[position >> 3] >> (position & 7) & 1 for position in self._positions(key))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+    @property
+    def memory_bytes(self) -> int:
+        """Bytes held by the filter, object headers included."""
+        return sys.getsizeof(self) + sys.getsizeof(self.bits)
+
+    @property
+    def fp_rate(self) -> float:
+        """Expected false-positive rate at the current fill."""
+        return (1.0 - math.exp(-self.hash_count * self.count / self.size)) ** self.hash_count
+
+
+class ScalableBloomFilter:
+    """Bloom filter that adds tighter sub-filters instead of overfilling."""
+
+    __slots__ = ("filters",)
+
+    def __init__(self, capacity: int, fp_rate: float):
+        self.filters: List[BloomFilter] = [BloomFilter(capacity, fp_rate * (1 - TIGHTENING))]
+
+    def add(self, key: int) -> None:
+        if key in self:
+            return
+        last = self.filters[-1]
+        if last.count >= last.capacity:
+            fp_rate = (1.0 - math.exp(-last.hash_count * last.capacity / last.size)) ** last.hash_count
+            last = BloomFilter(last.capacity * GROWTH, fp_rate * TIGHTENING)
+            self.filters.append(last)
+        last.add(key)
+
+    def __contains__(self, key: int) -> bool:
+        return any(key in bloom for bloom in self.filters)
+
+    def __len__(self) -> int:
+        return sum(bloom.count for bloom in self.filters)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(bloom.nbytes for bloom in self.filters)
+
+    @property
+    def memory_bytes(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self.filters) + sum(bloom.memory_bytes for bloom in self.filters)
+
+    @property
+    def fp_rate(self) -> float:
+        miss = 1.0
+        for bloom in self.filters:
+            miss *= 1.0 - bloom.fp_rate
+        return 1.0 - miss
+
+
+class VisitedFilters:
+    """One ScalableBloomFilter of visited dense user ids per visiting user.
+
+    Filters are sized at build time for ``fp_rate``; when the whole set would
+    not fit in ``memory_budget`` bytes, Python object overhead included, the
+    rate is raised until it does. Visits added later grow the filters past
+    the plan: ``add`` reports the one that takes them over the budget, so the
+    owner can rebuild them with a new plan.
+    """
+
+    def __init__(self, fp_rate: float, memory_budget: int, min_capacity: int):
+        self.target_fp_rate = fp_rate
+        self.fp_rate = fp_rate
+        self.memory_budget = memory_budget
+        self.min_capacity = min_capacity
+        self.filters: Dict[int, ScalableBloomFilter] = {}
+        # Bytes of the filters themselves; the dict holding them is added on read.
+        self._filter_bytes = 0
+
+    def capacity_for(self, count: int) -> int:
+        return max(self.min_capacity, count)
+
+    def plan(self, counts: Dict[int, int]) -> None:
+        """Pick the false-positive rate for filters holding ``counts`` keys."""
+        capacity = sum(self.capacity_for(count) for count in counts.values())
+        # What the objects cost besides their bit arrays; the dict of filters
+        # is as large as ``counts``, which has the same keys.
+        empty = ScalableBloomFilter(1, 0.5)
+        overhead = len(counts) * (empty.memory_bytes - empty.nbytes + _INT_BYTES) + sys.getsizeof(counts)
+        budget_bits = max(0, int(self.memory_budget * PLAN_FILL) - overhead) * 8
+        self.fp_rate = self.target_fp_rate
+        if capacity and bits_for(capacity, self.fp_rate * (1 - TIGHTENING)) > budget_bits:
+            first_rate = math.exp(-budget_bits * LN2_SQUARED / capacity)
+            self.fp_rate = min(0.5, first_rate / (1 - TIGHTENING))
+            logger.warning(
+                f"Visited filters for {capacity} keys exceed {self.memory_budget} bytes "
+                f"at fp rate {self.target_fp_rate}; using {self.fp_rate:.4f}"
+            )
+        self.filters = {
+            user_id: ScalableBloomFilter(self.capacity_for(count), self.fp_rate)
+            for user_id, count in counts.items()
+        }
+        self._filter_bytes = sum(bloom.memory_bytes for bloom in self.filters.values())
+
+    def add(self, user_id: int, visited_user_id: int) -> bool:
+        """Add a visit; True when it takes the filters over the memory budget."""
+        within_budget = self.memory_bytes <= self.memory_budget
+        bloom = self.filters.get(user_id)
+        if bloom is None:
+            bloom = self.filters[user_id] = ScalableBloomFilter(self.min_capacity, self.fp_rate)
+            self._filter_bytes += bloom.memory_bytes
+        depth, list_bytes = len(bloom.filters), sys.getsizeof(bloom.filters)
+        bloom.add(visited_user_id)
+        if len(bloom.filters) != depth:
+            self._filter_bytes += bloom.filters[-1].memory_bytes + sys.getsizeof(bloom.filters) - list_bytes
+        return within_budget and self.memory_bytes > self.memory_budget
+
+    @property
+    def memory_bytes(self) -> int:
+        """Bytes held by the filters, their Python objects and the dict of them."""
+        return self._filter_bytes + sys.getsizeof(self.filters) + len(self.filters) * _INT_BYTES
+
+    def get(self, user_id: int) -> Optional[ScalableBloomFilter]:
+        return self.filters.get(user_id)
+
+    def stats(self) -> dict:
+        entries = sum(len(bloom) for bloom in self.filters.values())
+        weighted = sum(bloom.fp_rate * len(bloom) for bloom in self.filters.values())
+        return {
+            "users": len(self.filters),
+            "entries": entries,
+            "memory_bytes": self.memory_bytes,
+            "bit_array_bytes": sum(bloom.nbytes for bloom in self.filters.values()),
+            "memory_budget_bytes": self.memory_budget,
+            "target_fp_rate": self.target_fp_rate,
+            "configured_fp_rate": self.fp_rate,
+            "estimated_fp_rate": weighted / entries if entries else 0.0,
+            "max_fp_rate": max((bloom.fp_rate for bloom in self.filters.values()), default=0.0),
+        }
@@ -0,0 +1,91 @@
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from sqlalchemy import Boolean
+
+from app.db.versions import VERSION_COLUMNS
+
+WORD_BITS = 64
+# Columns of a preference row that are not flags.
+NON_FLAG_COLUMNS = ("user_id", *VERSION_COLUMNS)
+
+
+class BitCodec:
+    """Packs the Boolean columns of one preference model into a fixed-width bitmask.
+
+    Bit ``i`` is the i-th Boolean column in ``__table__.columns`` order, so a
+    mask is stable for as long as the model definition is. The row's version
+    columns are not flags.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.columns: Tuple[str, ...] = tuple(
+            column.name for column in model.__table__.columns if column.name not in NON_FLAG_COLUMNS
+        )
+        for column in model.__table__.columns:
+            if column.name not in NON_FLAG_COLUMNS and not isinstance(column.type, Boolean):
+                raise ValueError(f"{model.__name__}.{column.name} is not a Boolean column")
+        self.bits: Dict[str, int] = {name: bit for bit, name in enumerate(self.columns)}
+        self.width = len(self.columns)
+        self.words = max(1, (self.width + WORD_BITS - 1) // WORD_BITS)
+        self.full_mask = (1 << self.width) - 1
+
+    def encode(self, row) -> int:
+        mask = 0
+        for bit, name in enumerate(self.columns):
+            if getattr(row, name):
+                mask |= 1 << bit
+        return mask
+
+    def encode_names(self, names: Iterable[str]) -> int:
+        mask = 0
+        for name in names:
+            if name not in self.bits:
+                raise ValueError(f"Unknown {self.model.__tablename__} column: {name}")
+            mask |= 1 << self.bits[name]
+        return mask
+
+    def decode(self, mask: int) -> Dict[str, bool]:
+        return {name: bool(mask >> bit & 1) for bit, name in enumerate(self.columns)}
+
+    def names(self, mask: int) -> List[str]:
+        return [name for bit, name in enumerate(self.columns) if mask >> bit & 1]
+
+    def to_model(self, user_id: str, mask: int):
+        return self.model(user_id=user_id, **self.decode(mask))
+
+    def to_words(self, mask: int) -> np.ndarray:
+        return np.array(
+            [(mask >> (WORD_BITS * word)) & 0xFFFFFFFFFFFFFFFF for word in range(self.words)],
+            dtype=np.uint64
+        )
+
+    def from_words(self, words: np.ndarray) -> int:
+        mask = 0
+        for word, value in enumerate(words.tolist()):
+            mask |= int(value) << (WORD_BITS * word)
+        return mask
+
+    def pack(self, masks: Iterable[int]) -> np.ndarray:
+        """Stack masks into an ``(n, words)`` uint64 matrix."""
+        masks = list(masks)
+        packed = np.zeros((len(masks), self.words), dtype=np.uint64)
+        for word in range(self.words):
+            shift = WORD_BITS * word
+            packed[:, word] = [(mask >> shift) & 0xFFFFFFFFFFFFFFFF for mask in masks]
+        return packed
+
+
+def popcount(mask: int) -> int:
+    return mask.bit_count()
+
+
+_codecs: Dict[type, BitCodec] = {}
+
+
+def get_codec(model) -> BitCodec:
+    codec = _codecs.get(model)
+    if codec is None:
+        codec = _codecs[model] = BitCodec(model)
+    return codec
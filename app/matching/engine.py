@@ -0,0 +1,335 @@
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.singleflight import SingleFlight
+from app.matching.bloom import VisitedFilters
+from app.matching.index import INDEXED_MODELS, PostingIndex
+from app.matching.matrix import CandidateMatrix
+from app.matching.pairs import pair_index
+from app.matching.user_ids import user_id_registry
+from app.matching.scoring import score_candidates, top_k
+from app.schemas.age_range import AgeRange
+from app.schemas.gender import Gender
+from app.schemas.partner_age_range import PartnerAgeRange
+from app.schemas.partner_children_expectations import PartnerChildrenExpectations
+from app.schemas.partner_ethnics import PartnerEthnics
+from app.schemas.partner_height import PartnerHeight
+from app.schemas.partner_marriage_timeline import PartnerMarriageTimeline
+from app.schemas.partner_personality_traits import PartnerPersonalityTraitsScore
+from app.schemas.prayer_frequency import PrayerFrequency
+from app.schemas.religious_level import ReligiousLevel
+from app.schemas.sects import Sects
+from app.schemas.smoking_status import SmokingStatus
+from app.schemas.visited import Visited
+
+logger = logging.getLogger(__name__)
+
+# Users re-read per IN (...) query when refreshing changed users.
+REFRESH_CHUNK = 1000
+
+# Record field -> model it is loaded from. Every model is a user_id plus
+# a set of Boolean columns, so each one is stored as a bitmask column.
+RECORD_MODELS = {
+    "gender": Gender,
+    "age": AgeRange,
+    "partner_age": PartnerAgeRange,
+    "sect": Sects,
+    "religious": ReligiousLevel,
+    "prayer": PrayerFrequency,
+    "smoking": SmokingStatus,
+    "ethnics": PartnerEthnics,
+    "traits": PartnerPersonalityTraitsScore,
+    "height": PartnerHeight,
+    "children": PartnerChildrenExpectations,
+    "timeline": PartnerMarriageTimeline,
+}
+
+
+class CandidateEngine:
+    """In-memory view of every preference table used to rank candidates.
+
+    Rows, posting lists, pairs and visited filters are all addressed by the
+    user's dense id from the user_ids table.
+
+    Users whose rows changed are re-read in the background once started,
+    so requests never wait on them; without the background thread they are
+    re-read on the next ensure_loaded. Visited filters that grow past their
+    memory budget are rebuilt the same way.
+    """
+
+    def __init__(self):
+        self.matrix = CandidateMatrix(RECORD_MODELS)
+        self.index = PostingIndex()
+        self.visited = self._visited_filters()
+        self.loaded_at: Optional[float] = None
+        self._dirty: Set[str] = set()
+        self._replan_visited = False
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _visited_filters() -> VisitedFilters:
+        return VisitedFilters(
+            settings.VISITED_BLOOM_FP_RATE,
+            settings.VISITED_BLOOM_MEMORY_BYTES,
+            settings.VISITED_BLOOM_MIN_CAPACITY
+        )
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    @property
+    def user_ids(self) -> List[Optional[str]]:
+        return user_id_registry.names
+
+    @property
+    def positions(self) -> Dict[str, int]:
+        return user_id_registry.ids
+
+    def load(self, db: Session) -> None:
+        start = time.perf_counter()
+        # Everything is read from here on; users changed later stay queued.
+        with self._lock:
+            self._dirty.clear()
+            self._replan_visited = False
+        user_id_registry.ensure_loaded(db)
+        matrix = CandidateMatrix(RECORD_MODELS)
+        for field, model in RECORD_MODELS.items():
+            codec = matrix.codecs[field]
+            user_ids, masks = [], []
+            for row in db.query(model).yield_per(10000):
+                user_ids.append(row.user_id)
+                masks.append(codec.encode(row))
+            positions = user_id_registry.intern(db, user_ids, commit=True)
+            matrix.reserve(user_id_registry.size)
+            matrix.assign(field, positions, masks)
+        matrix.size = user_id_registry.size
+
+        index = PostingIndex()
+        present = np.flatnonzero(matrix.present[:matrix.size]).astype(np.int32)
+        for field in INDEXED_MODELS:
+            index.build(field, present, matrix.view(field)[0][present].astype(np.int64))
+
+        visited = self._load_visited(db)
+
+        with self._lock:
+            self.matrix = matrix
+            self.index = index
+            self.visited = visited
+            self.loaded_at = time.time()
+        logger.info(f"Candidate engine loaded {len(present)} users in {time.perf_counter() - start:.2f}s")
+
+    def _load_visited(self, db: Session) -> VisitedFilters:
+        # Sized from per-user counts first, so the pairs never sit in memory as strings.
+        visited = self._visited_filters()
+        counts = db.query(Visited.user_id, func.count()).group_by(Visited.user_id).all()
+        dense_ids = user_id_registry.intern(db, [user_id for user_id, _ in counts], commit=True)
+        visited.plan({dense_id: count for dense_id, (_, count) in zip(dense_ids, counts)})
+        pairs = db.execute(select(Visited.user_id, Visited.visited_user_id).execution_options(yield_per=10000))
+        for chunk in pairs.partitions():
+            users = user_id_registry.intern(db, [user_id for user_id, _ in chunk])
+            visited_users = user_id_registry.intern(db, [visited_user_id for _, visited_user_id in chunk])
+            for dense_id, visited_dense_id in zip(users, visited_users):
+                visited.add(dense_id, visited_dense_id)
+        # Commits the ids interned above, once the stream is done with.
+        db.commit()
+        return visited
+
+    def reload_visited(self, db: Session) -> None:
+        """Rebuild the visited filters, planned for the visits stored now."""
+        visited = self._load_visited(db)
+        with self._lock:
+            self.visited = visited
+        stats = visited.stats()
+        logger.info(
+            f"Visited filters rebuilt: {stats['memory_bytes']} of {stats['memory_budget_bytes']} bytes "
+            f"at fp rate {stats['configured_fp_rate']:.4f}"
+        )
+
+    def ensure_loaded(self, db: Session) -> None:
+        pair_index.ensure_loaded(db)
+        if not self.is_loaded:
+            with self._lock:
+                if not self.is_loaded:
+                    self.load(db)
+        if self._thread is None:
+            self.apply_pending(db)
+
+    def mark_dirty(self, user_ids: Iterable[str]) -> None:
+        """Queue users whose rows changed for the background refresh, or the next ensure_loaded."""
+        if self.is_loaded:
+            with self._lock:
+                self._dirty.update(user_ids)
+            self._wake.set()
+
+    def apply_pending(self, db: Session) -> None:
+        """Re-read the queued users, or reload everything past CANDIDATE_RELOAD_THRESHOLD of them.
+
+        Also rebuilds the visited filters once they have outgrown their budget.
+        """
+        with self._lock:
+            pending, self._dirty = self._dirty, set()
+            replan, self._replan_visited = self._replan_visited, False
+        try:
+            if len(pending) > settings.CANDIDATE_RELOAD_THRESHOLD:
+                self.load(db)
+                return
+            if pending:
+                self.refresh_users(db, pending)
+            if replan:
+                self.reload_visited(db)
+        except Exception:
+            with self._lock:
+                self._dirty.update(pending)
+                self._replan_visited = self._replan_visited or replan
+            raise
+
+    def refresh_users(self, db: Session, user_ids: Iterable[str]) -> None:
+        """Re-read the rows of ``user_ids``, with one IN (...) query per model and REFRESH_CHUNK users."""
+        user_ids = list(user_ids)
+        for start in range(0, len(user_ids), REFRESH_CHUNK):
+            self._refresh_chunk(db, user_ids[start:start + REFRESH_CHUNK])
+
+    def _refresh_chunk(self, db: Session, user_ids: List[str]) -> None:
+        masks: Dict[str, Dict[str, int]] = {user_id: {} for user_id in user_ids}
+        for field, model in RECORD_MODELS.items():
+            codec = self.matrix.codecs[field]
+            for row in db.query(model).filter(model.user_id.in_(user_ids)):
+                masks[row.user_id][field] = codec.encode(row)
+        new = [user_id for user_id in user_ids if masks[user_id] and user_id_registry.lookup(user_id) is None]
+        if new:
+            user_id_registry.intern(db, new, commit=True)
+        with self._lock:
+            for user_id in user_ids:
+                position = user_id_registry.lookup(user_id)
+                if position is None:
+                    continue
+                found = masks[user_id]
+                self.matrix.include(position)
+                for field in INDEXED_MODELS:
+                    self.index.update(field, position, self.matrix.mask(field, position), found.get(field, 0))
+                if found:
+                    for field in RECORD_MODELS:
+                        self.matrix.set_mask(field, position, found.get(field, 0))
+                    self.matrix.present[position] = True
+                else:
+                    self.matrix.clear(position)
+
+    def start(self) -> None:
+        """Re-read changed users on a background thread from now on."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="candidate-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                with SessionLocal() as db:
+                    self.apply_pending(db)
+            except Exception as e:
+                logger.warning(f"Candidate refresh failed, retrying in 1s: {str(e)}")
+                self._stop.wait(1.0)
+                self._wake.set()
+
+    def add_visit(self, user_id: str, visited_user_id: str) -> None:
+        dense_id, visited_dense_id = user_id_registry.lookup(user_id), user_id_registry.lookup(visited_user_id)
+        if self.is_loaded and dense_id is not None and visited_dense_id is not None:
+            with self._lock:
+                over_budget = self.visited.add(dense_id, visited_dense_id)
+            if over_budget:
+                self._visited_over_budget()
+
+    def refresh_visits(self, db: Session, user_ids: Iterable[str]) -> None:
+        """Add the visits of ``user_ids`` written by another process to the filters."""
+        if not self.is_loaded:
+            return
+        rows = db.query(Visited.user_id, Visited.visited_user_id).filter(Visited.user_id.in_(list(user_ids))).all()
+        users = user_id_registry.intern(db, [user_id for user_id, _ in rows], commit=True)
+        visited_users = user_id_registry.intern(db, [visited_user_id for _, visited_user_id in rows], commit=True)
+        with self._lock:
+            over_budget = False
+            for dense_id, visited_dense_id in zip(users, visited_users):
+                over_budget |= self.visited.add(dense_id, visited_dense_id)
+        if over_budget:
+            self._visited_over_budget()
+
+    def _visited_over_budget(self) -> None:
+        logger.warning(
+            f"Visited filters passed their {self.visited.memory_budget} byte budget; "
+            f"rebuilding them"
+        )
+        with self._lock:
+            self._replan_visited = True
+        self._wake.set()
+
+    def _filter_clauses(self, user: Dict[str, np.ndarray]) -> List[Tuple[str, int]]:
+        clauses = []
+        gender, partner_age = int(user["gender"][0]), int(user["partner_age"][0])
+        if gender:
+            clauses.append(("gender", gender ^ self.matrix.codecs["gender"].full_mask))
+        if partner_age:
+            clauses.append(("age", partner_age))
+        return clauses
+
+    def top_candidates(self, user_id: str, limit: int) -> Optional[List[Tuple[str, float]]]:
+        with self._lock:
+            position = user_id_registry.lookup(user_id)
+            if position is None or position >= self.matrix.size or not self.matrix.present[position]:
+                return None
+            user = self.matrix.row(position)
+            candidates = self.index.query(self._filter_clauses(user))
+            scores = score_candidates(user, self.matrix, candidates)
+
+            excluded = pair_index.partners_of(position)
+            excluded_positions = np.fromiter(excluded, dtype=np.int64, count=len(excluded))
+            excluded_positions = np.append(excluded_positions[excluded_positions < self.matrix.size], position)
+            if candidates is None:
+                scores[excluded_positions] = -np.inf
+            else:
+                scores[np.isin(candidates, excluded_positions)] = -np.inf
+
+            # Visited profiles are only known through a Bloom filter, so they are
+            # dropped from the head of the ranking rather than from every row.
+            visited = self.visited.get(position)
+            fetch = limit if visited is None else limit * 2
+            while True:
+                best = top_k(scores, fetch)
+                best_positions = best if candidates is None else candidates[best]
+                result = [
+                    (self.user_ids[candidate], float(scores[rank]))
+                    for candidate, rank in zip(best_positions.tolist(), best.tolist())
+                    if visited is None or candidate not in visited
+                ]
+                if len(result) >= limit or len(best) < fetch:
+                    return result[:limit]
+                fetch *= 2
+
+
+candidate_engine = CandidateEngine()
+# Concurrent requests for the same candidate list or feed refresh share one computation.
+candidate_flights = SingleFlight("candidates", settings.SINGLE_FLIGHT_CANDIDATE_TIMEOUT_SECONDS)
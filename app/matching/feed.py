@@ -0,0 +1,239 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, event, insert, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.cache import preference_cache
+from app.db.changes import change_feed, record_changes
+from app.db.database import read_router
+from app.db.writes import upsert_rows
+from app.matching.engine import RECORD_MODELS, candidate_engine, candidate_flights
+from app.matching.pairs import pair_index
+from app.matching.user_ids import user_id_registry
+from app.schemas.candidate_feed import CandidateFeed
+from app.schemas.candidate_feed_state import CandidateFeedState
+from app.schemas.match import Match
+from app.schemas.visited import Visited
+
+logger = logging.getLogger(__name__)
+
+CHANGED_USERS_KEY = "changed_user_ids"
+VISITS_KEY = "recorded_visits"
+MATCHES_KEY = "recorded_matches"
+
+
+class FeedRebuilt(Exception):
+    """The feed generation a page was pinned to has been replaced by a newer one."""
+
+
+def record_profile_change(db: Session, *user_ids: str) -> None:
+    """Stamp ``user_ids`` as changed in the current transaction.
+
+    Call it before ``db.commit()`` in every handler that writes a row the
+    candidate feed depends on. It assigns dense ids to users seen for the
+    first time, the stamp commits with the write itself, and the in-memory
+    engine picks the users up once the commit succeeds, in this worker and,
+    through the change feed, in every other one.
+    """
+    user_ids = tuple(dict.fromkeys(user_ids))
+    user_id_registry.intern(db, user_ids)
+    now = datetime.utcnow()
+    upsert_rows(db, CandidateFeedState, [{"user_id": user_id, "changed_at": now} for user_id in user_ids], ["changed_at"])
+    db.info.setdefault(CHANGED_USERS_KEY, set()).update(user_ids)
+    record_changes(db, *user_ids)
+
+
+def record_visit(db: Session, user_id: str, visited_user_id: str) -> None:
+    """Stamp a new visit in the current transaction.
+
+    Once the commit succeeds, the visitor's Bloom filter takes the visit,
+    in this worker and, through the change feed, in every other one.
+    Preferences did not change, so the preference caches, the replica
+    routing and the stored feed are left as they are; feed pages drop
+    visited candidates when read.
+    """
+    user_id_registry.intern(db, (user_id, visited_user_id))
+    db.info.setdefault(VISITS_KEY, []).append((user_id, visited_user_id))
+    record_changes(db, user_id)
+
+
+def record_match(db: Session, partner_id_1: str, partner_id_2: str, match_status: int) -> None:
+    """Stamp a new or changed match in the current transaction.
+
+    Once the commit succeeds the pair index takes it, in this worker and,
+    through the change feed, in every other one. As with record_visit,
+    nothing else is invalidated.
+    """
+    user_id_registry.intern(db, (partner_id_1, partner_id_2))
+    db.info.setdefault(MATCHES_KEY, []).append((partner_id_1, partner_id_2, match_status))
+    record_changes(db, partner_id_1, partner_id_2)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_interactions(session: Session) -> None:
+    for user_id, visited_user_id in session.info.pop(VISITS_KEY, ()):
+        candidate_engine.add_visit(user_id, visited_user_id)
+    for partner_id_1, partner_id_2, match_status in session.info.pop(MATCHES_KEY, ()):
+        pair_index.set(partner_id_1, partner_id_2, match_status)
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_changed_users(session: Session) -> None:
+    changed = session.info.pop(CHANGED_USERS_KEY, None)
+    if changed:
+        candidate_engine.mark_dirty(changed)
+        read_router.note_writes(changed)
+        preference_cache.invalidate_users(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session: Session) -> None:
+    session.info.pop(CHANGED_USERS_KEY, None)
+    session.info.pop(VISITS_KEY, None)
+    session.info.pop(MATCHES_KEY, None)
+
+
+def _apply_other_workers_changes(db: Session, changes: Dict[str, Set[str]]) -> None:
+    """What _mark_changed_users and the match and visited handlers do locally, for another worker's commit."""
+    if Match.__tablename__ in changes:
+        pair_index.refresh_users(db, changes[Match.__tablename__])
+    if Visited.__tablename__ in changes:
+        candidate_engine.refresh_visits(db, changes[Visited.__tablename__])
+    changed = set().union(*(
+        user_ids for table, user_ids in changes.items() if table not in (Match.__tablename__, Visited.__tablename__)
+    ))
+    if changed:
+        candidate_engine.mark_dirty(changed)
+        read_router.note_writes(changed)
+        preference_cache.invalidate_users(changed)
+
+
+change_feed.watch(*RECORD_MODELS.values(), Match, Visited)
+change_feed.subscribe(_apply_other_workers_changes)
+
+
+def is_stale(state: Optional[CandidateFeedState], now: datetime) -> bool:
+    if state is None or state.computed_at is None:
+        return True
+    if state.changed_at is not None and state.changed_at > state.computed_at:
+        return True
+    return state.computed_at < now - timedelta(seconds=settings.CANDIDATE_FEED_TTL_SECONDS)
+
+
+def refresh_feed(db: Session, user_id: str) -> Optional[datetime]:
+    """Recompute one user's stored feed from the in-memory engine.
+
+    Returns the new computed_at, or None when the user has no preferences.
+    """
+    candidates = candidate_engine.top_candidates(user_id, settings.CANDIDATE_FEED_SIZE)
+    if candidates is None:
+        return None
+    computed_at = datetime.utcnow()
+    db.execute(delete(CandidateFeed).where(CandidateFeed.user_id == user_id))
+    if candidates:
+        db.execute(insert(CandidateFeed), [
+            {
+                "user_id": user_id,
+                "rank": rank,
+                "candidate_id": candidate_id,
+                "score": score,
+                "computed_at": computed_at
+            }
+            for rank, (candidate_id, score) in enumerate(candidates, start=1)
+        ])
+    db.merge(CandidateFeedState(user_id=user_id, computed_at=computed_at))
+    db.commit()
+    return computed_at
+
+
+def _refresh_loaded(db: Session, user_id: str) -> Optional[datetime]:
+    candidate_engine.ensure_loaded(db)
+    # The feed is stamped fresh as of now, so the user's own rows must be too:
+    # the background refresh, or the change feed for another worker's write,
+    # may not have reached the engine yet.
+    candidate_engine.refresh_users(db, [user_id])
+    return refresh_feed(db, user_id)
+
+
+def get_feed_page(
+    db: Session,
+    user_id: str,
+    after_rank: int,
+    limit: int,
+    generation: Optional[datetime] = None
+) -> Optional[Tuple[datetime, List[CandidateFeed]]]:
+    """One page of a user's stored feed, without the candidates visited or matched since it was computed.
+
+    Only the first page refreshes a stale feed. Later pages pass back the
+    computed_at of the first as ``generation``, which pins the feed they
+    page through: its ranks stay as they were until a refresh or rebuild
+    replaces it, and then FeedRebuilt is raised. Concurrent requests
+    finding the same feed stale share one refresh, which the first of them
+    runs and commits.
+
+    A page is read with range reads on the (user_id, rank) primary key and
+    a lookup of its candidates in visited, so its cost does not depend on
+    the user count.
+    """
+    state = db.get(CandidateFeedState, user_id)
+    computed_at = state.computed_at if state is not None else None
+    if generation is not None:
+        if computed_at != generation:
+            raise FeedRebuilt(f"The feed of user {user_id} was rebuilt; start again from the first page")
+    elif (after_rank == 0 or computed_at is None) and is_stale(state, datetime.utcnow()):
+        computed_at = candidate_flights.do(("feed", user_id), lambda: _refresh_loaded(db, user_id))
+    if computed_at is None:
+        return None
+
+    rows: List[CandidateFeed] = []
+    while len(rows) < limit:
+        wanted = limit - len(rows)
+        batch = (
+            db.query(CandidateFeed)
+            .filter(CandidateFeed.user_id == user_id, CandidateFeed.rank > after_rank)
+            .order_by(CandidateFeed.rank)
+            .limit(wanted)
+            .all()
+        )
+        if not batch:
+            break
+        after_rank = batch[-1].rank
+        visited = set(db.scalars(
+            select(Visited.visited_user_id).where(
+                Visited.user_id == user_id,
+                Visited.visited_user_id.in_([row.candidate_id for row in batch])
+            )
+        ))
+        rows.extend(
+            row for row in batch
+            if row.candidate_id not in visited and pair_index.get(user_id, row.candidate_id) is None
+        )
+        if len(batch) < wanted:
+            break
+    return computed_at, rows
+
+
+def refresh_stale_feeds(db: Session) -> int:
+    """Recompute the feeds of users changed since their feed was computed."""
+    stale_user_ids = [
+        user_id for user_id, in db.query(CandidateFeedState.user_id).filter(
+            or_(
+                CandidateFeedState.computed_at.is_(None),
+                CandidateFeedState.changed_at > CandidateFeedState.computed_at
+            )
+        )
+    ]
+    candidate_engine.ensure_loaded(db)
+    refreshed = 0
+    for user_id in stale_user_ids:
+        if refresh_feed(db, user_id) is not None:
+            refreshed += 1
+        else:
+            db.execute(delete(CandidateFeed).where(CandidateFeed.user_id == user_id))
+            db.merge(CandidateFeedState(user_id=user_id, computed_at=datetime.utcnow()))
+            db.commit()
+    logger.info(f"Refreshed {refreshed} of {len(stale_user_ids)} stale candidate feeds")
+    return refreshed
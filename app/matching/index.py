@@ -0,0 +1,139 @@
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.matching.codec import get_codec
+from app.schemas.age_range import AgeRange
+from app.schemas.gender import Gender
+from app.schemas.partner_age_range import PartnerAgeRange
+from app.schemas.prayer_frequency import PrayerFrequency
+from app.schemas.religious_level import ReligiousLevel
+from app.schemas.sects import Sects
+from app.schemas.smoking_status import SmokingStatus
+
+# Record fields that get one posting list per Boolean column.
+INDEXED_MODELS = {
+    "gender": Gender,
+    "age": AgeRange,
+    "partner_age": PartnerAgeRange,
+    "sect": Sects,
+    "religious": ReligiousLevel,
+    "prayer": PrayerFrequency,
+    "smoking": SmokingStatus,
+}
+
+EMPTY = np.empty(0, dtype=np.int32)
+
+# A list is dense when it holds more than 1/DENSE_RATIO of all positions.
+DENSE_RATIO = 32
+
+
+def intersect_sorted(small: np.ndarray, large: np.ndarray, universe: int = 0) -> np.ndarray:
+    """Intersect two sorted unique arrays of positions below ``universe``.
+
+    Dense lists are intersected through a membership bitmap, sparse ones by
+    binary-searching ``small`` in ``large``.
+    """
+    if not len(small) or not len(large):
+        return EMPTY
+    if universe and len(large) * DENSE_RATIO > universe:
+        member = np.zeros(universe, dtype=bool)
+        member[large] = True
+        return small[member[small]]
+    idx = np.searchsorted(large, small)
+    idx[idx == len(large)] = 0
+    return small[large[idx] == small]
+
+
+class PostingList:
+    """Sorted int32 positions plus pending adds/removes merged on the next read."""
+
+    __slots__ = ("ids", "added", "removed")
+
+    def __init__(self, ids: np.ndarray = EMPTY):
+        self.ids = ids
+        self.added: Set[int] = set()
+        self.removed: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self.added) - len(self.removed)
+
+    def add(self, position: int) -> None:
+        self.removed.discard(position)
+        self.added.add(position)
+
+    def remove(self, position: int) -> None:
+        self.added.discard(position)
+        self.removed.add(position)
+
+    def array(self) -> np.ndarray:
+        if self.added or self.removed:
+            ids = self.ids
+            if self.added:
+                ids = np.union1d(ids, np.fromiter(self.added, dtype=np.int32, count=len(self.added)))
+            if self.removed:
+                ids = np.setdiff1d(ids, np.fromiter(self.removed, dtype=np.int32, count=len(self.removed)), assume_unique=True)
+            self.ids = ids.astype(np.int32, copy=False)
+            self.added.clear()
+            self.removed.clear()
+        return self.ids
+
+
+class PostingIndex:
+    """Inverted index from (field, column bit) to the positions of users having it.
+
+    A query is a list of ``(field, mask)`` clauses: bits within a clause are
+    OR'ed, clauses are AND'ed, smallest estimated cardinality first.
+    """
+
+    def __init__(self):
+        self.lists: Dict[str, List[PostingList]] = {
+            field: [PostingList() for _ in get_codec(model).columns]
+            for field, model in INDEXED_MODELS.items()
+        }
+        self.universe = 0
+
+    def build(self, field: str, positions: np.ndarray, masks: np.ndarray) -> None:
+        positions = np.asarray(positions, dtype=np.int32)
+        masks = np.asarray(masks, dtype=np.int64)
+        order = np.argsort(positions, kind="stable")
+        positions, masks = positions[order], masks[order]
+        if len(positions):
+            self.universe = max(self.universe, int(positions[-1]) + 1)
+        for bit, posting in enumerate(self.lists[field]):
+            posting.ids = positions[(masks >> bit) & 1 == 1]
+            posting.added.clear()
+            posting.removed.clear()
+
+    def update(self, field: str, position: int, old_mask: int, new_mask: int) -> None:
+        changed = old_mask ^ new_mask
+        self.universe = max(self.universe, position + 1)
+        for bit, posting in enumerate(self.lists[field]):
+            if changed >> bit & 1:
+                if new_mask >> bit & 1:
+                    posting.add(position)
+                else:
+                    posting.remove(position)
+
+    def cardinality(self, field: str, mask: int) -> int:
+        return sum(len(posting) for bit, posting in enumerate(self.lists[field]) if mask >> bit & 1)
+
+    def lookup(self, field: str, mask: int) -> np.ndarray:
+        arrays = [posting.array() for bit, posting in enumerate(self.lists[field]) if mask >> bit & 1]
+        if not arrays:
+            return EMPTY
+        if len(arrays) == 1:
+            return arrays[0]
+        return np.unique(np.concatenate(arrays))
+
+    def query(self, clauses: Iterable[Tuple[str, int]]) -> Optional[np.ndarray]:
+        """Positions matching every clause, or None when there are no clauses."""
+        planned = sorted(clauses, key=lambda clause: self.cardinality(*clause))
+        if not planned:
+            return None
+        result = self.lookup(*planned[0])
+        for field, mask in planned[1:]:
+            if not len(result):
+                break
+            result = intersect_sorted(result, self.lookup(field, mask), self.universe)
+        return result
@@ -0,0 +1,84 @@
+from typing import Dict, Iterable
+
+import numpy as np
+
+from app.matching.codec import BitCodec, get_codec
+
+
+def column_dtype(codec: BitCodec) -> np.dtype:
+    """Narrowest unsigned dtype holding one word of ``codec``."""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if codec.width <= np.iinfo(dtype).bits:
+            return np.dtype(dtype)
+    return np.dtype(np.uint64)
+
+
+class CandidateMatrix:
+    """Column store of every user's preference bitmasks, one row per dense user id.
+
+    Each field is a ``(words, capacity)`` array laid out by the field's codec,
+    so every word is contiguous across users; fields narrower than 64 bits use
+    the smallest unsigned dtype that fits. ``counts`` caches the number of set
+    bits per user and field, and ``present`` marks positions that currently
+    hold a user.
+    """
+
+    def __init__(self, models: Dict[str, type], capacity: int = 1024):
+        self.codecs = {field: get_codec(model) for field, model in models.items()}
+        self.size = 0
+        self.columns: Dict[str, np.ndarray] = {
+            field: np.zeros((codec.words, capacity), dtype=column_dtype(codec)) for field, codec in self.codecs.items()
+        }
+        self.counts: Dict[str, np.ndarray] = {
+            field: np.zeros(capacity, dtype=np.uint8) for field in self.codecs
+        }
+        self.present = np.zeros(capacity, dtype=bool)
+
+    @property
+    def capacity(self) -> int:
+        return len(self.present)
+
+    def reserve(self, size: int) -> None:
+        if size <= self.capacity:
+            return
+        capacity = max(size, self.capacity * 2)
+        for field, column in self.columns.items():
+            grown = np.zeros((column.shape[0], capacity), dtype=column.dtype)
+            grown[:, :column.shape[1]] = column
+            self.columns[field] = grown
+            counts = np.zeros(capacity, dtype=np.uint8)
+            counts[:len(self.counts[field])] = self.counts[field]
+            self.counts[field] = counts
+        present = np.zeros(capacity, dtype=bool)
+        present[:len(self.present)] = self.present
+        self.present = present
+
+    def include(self, position: int) -> None:
+        self.reserve(position + 1)
+        self.size = max(self.size, position + 1)
+
+    def assign(self, field: str, positions: Iterable[int], masks: Iterable[int]) -> None:
+        positions = np.fromiter(positions, dtype=np.int64)
+        masks = list(masks)
+        self.columns[field][:, positions] = self.codecs[field].pack(masks).T.astype(self.columns[field].dtype)
+        self.counts[field][positions] = [mask.bit_count() for mask in masks]
+        self.present[positions] = True
+
+    def set_mask(self, field: str, position: int, mask: int) -> None:
+        self.columns[field][:, position] = self.codecs[field].to_words(mask).astype(self.columns[field].dtype)
+        self.counts[field][position] = mask.bit_count()
+
+    def mask(self, field: str, position: int) -> int:
+        return self.codecs[field].from_words(self.columns[field][:, position].astype(np.uint64))
+
+    def row(self, position: int) -> Dict[str, np.ndarray]:
+        return {field: column[:, position].copy() for field, column in self.columns.items()}
+
+    def clear(self, position: int) -> None:
+        for field, column in self.columns.items():
+            column[:, position] = 0
+            self.counts[field][position] = 0
+        self.present[position] = False
+
+    def view(self, field: str) -> np.ndarray:
+        return self.columns[field][:, :self.size]
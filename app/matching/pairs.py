@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import and_, delete, exists, inspect, or_, text, update
+from sqlalchemy.orm import Session, aliased
+
+from app.matching.user_ids import user_id_registry
+from app.schemas.match import Match
+
+logger = logging.getLogger(__name__)
+
+
+def canonical_pair(user_id: str, other_user_id: str) -> Tuple[str, str]:
+    """The (partner_id_1, partner_id_2) key a pair is stored under: smaller id first."""
+    return (user_id, other_user_id) if user_id <= other_user_id else (other_user_id, user_id)
+
+
+def pair_key(dense_id: int, other_dense_id: int) -> int:
+    """One int64 per unordered pair of dense ids: smaller id in the high half."""
+    if dense_id > other_dense_id:
+        dense_id, other_dense_id = other_dense_id, dense_id
+    return dense_id << 32 | other_dense_id
+
+
+class PairIndex:
+    """In-process copy of every match pair's status, keyed by dense-id pair.
+
+    Kept in sync by the match endpoints after each commit, so pair lookups
+    and candidate exclusion never go to the database.
+    """
+
+    def __init__(self):
+        self.status: Dict[int, int] = {}
+        self.partners: Dict[int, Set[int]] = {}
+        self.loaded_at: Optional[float] = None
+        self._lock = threading.RLock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def load(self, db: Session) -> None:
+        start = time.perf_counter()
+        user_id_registry.ensure_loaded(db)
+        status: Dict[int, int] = {}
+        partners: Dict[int, Set[int]] = {}
+        rows = db.query(Match.partner_id_1, Match.partner_id_2, Match.match_status).all()
+        first = user_id_registry.intern(db, [row[0] for row in rows], commit=True)
+        second = user_id_registry.intern(db, [row[1] for row in rows], commit=True)
+        for dense_id, other_dense_id, (_, _, match_status) in zip(first, second, rows):
+            status[pair_key(dense_id, other_dense_id)] = match_status
+            partners.setdefault(dense_id, set()).add(other_dense_id)
+            partners.setdefault(other_dense_id, set()).add(dense_id)
+        with self._lock:
+            self.status = status
+            self.partners = partners
+            self.loaded_at = time.time()
+        logger.info(f"Pair index loaded {len(status)} pairs in {time.perf_counter() - start:.2f}s")
+
+    def ensure_loaded(self, db: Session) -> None:
+        if not self.is_loaded:
+            with self._lock:
+                if not self.is_loaded:
+                    self.load(db)
+
+    def get(self, user_id: str, other_user_id: str) -> Optional[int]:
+        dense_id, other_dense_id = user_id_registry.lookup(user_id), user_id_registry.lookup(other_user_id)
+        if dense_id is None or other_dense_id is None:
+            return None
+        return self.status.get(pair_key(dense_id, other_dense_id))
+
+    def set(self, user_id: str, other_user_id: str, match_status: int) -> None:
+        dense_id, other_dense_id = user_id_registry.lookup(user_id), user_id_registry.lookup(other_user_id)
+        if not self.is_loaded or dense_id is None or other_dense_id is None:
+            return
+        with self._lock:
+            self.status[pair_key(dense_id, other_dense_id)] = match_status
+            self.partners.setdefault(dense_id, set()).add(other_dense_id)
+            self.partners.setdefault(other_dense_id, set()).add(dense_id)
+
+    def refresh_users(self, db: Session, user_ids: Iterable[str]) -> None:
+        """Re-read every pair of ``user_ids``, for matches written by another process."""
+        if not self.is_loaded:
+            return
+        user_ids = list(user_ids)
+        rows = db.query(Match.partner_id_1, Match.partner_id_2, Match.match_status).filter(
+            or_(Match.partner_id_1.in_(user_ids), Match.partner_id_2.in_(user_ids))
+        ).all()
+        first = user_id_registry.intern(db, [row[0] for row in rows], commit=True)
+        second = user_id_registry.intern(db, [row[1] for row in rows], commit=True)
+        with self._lock:
+            for dense_id, other_dense_id, (_, _, match_status) in zip(first, second, rows):
+                self.status[pair_key(dense_id, other_dense_id)] = match_status
+                self.partners.setdefault(dense_id, set()).add(other_dense_id)
+                self.partners.setdefault(other_dense_id, set()).add(dense_id)
+
+    def partners_of(self, dense_id: int) -> Set[int]:
+        return self.partners.get(dense_id, set())
+
+
+def migrate_canonical_pairs(db: Session) -> int:
+    """Rewrite matches so every pair is stored in canonical order.
+
+    Adds the requested_by column when missing and fills it with the original
+    partner_id_1. A pair stored in both orientations keeps the canonical row.
+    Returns the number of rows swapped.
+    """
+    if "requested_by" not in {col["name"] for col in inspect(db.get_bind()).get_columns(Match.__tablename__)}:
+        db.execute(text(f"ALTER TABLE {Match.__tablename__} ADD COLUMN requested_by TEXT"))
+    db.execute(update(Match).where(Match.requested_by.is_(None)).values(requested_by=Match.partner_id_1))
+
+    reversed_match = aliased(Match)
+    duplicates = db.execute(
+        delete(Match)
+        .where(Match.partner_id_1 > Match.partner_id_2)
+        .where(exists().where(and_(
+            reversed_match.partner_id_1 == Match.partner_id_2,
+            reversed_match.partner_id_2 == Match.partner_id_1
+        )))
+    ).rowcount
+    # Both SET expressions read the pre-update row, so this swaps the ids.
+    swapped = db.execute(
+        update(Match)
+        .where(Match.partner_id_1 > Match.partner_id_2)
+        .values(partner_id_1=Match.partner_id_2, partner_id_2=Match.partner_id_1)
+    ).rowcount
+    db.commit()
+    logger.info(f"Swapped {swapped} match rows into canonical order, dropped {duplicates} duplicates")
+    return swapped
+
+
+pair_index = PairIndex()
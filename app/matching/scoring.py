@@ -0,0 +1,158 @@
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.matching.matrix import CandidateMatrix
+
+# Soft-score weights; hard filters (gender, age, matches, visited) are applied first.
+# A user who states a gender or partner age only sees candidates with a matching
+# row; a candidate who has not filled in partner age accepts any age.
+SCORE_WEIGHTS = {
+    "sect": 3.0,
+    "religious": 2.0,
+    "prayer": 2.0,
+    "smoking": 1.0,
+    "children": 1.5,
+    "timeline": 1.0,
+    "traits": 1.0,
+    "ethnics": 0.5,
+    "height": 0.5,
+}
+
+# One-hot scales compared by distance between the selected levels.
+ORDINAL_FIELDS = {"religious": 4, "prayer": 4}
+
+# Preference tables compared by overlap of the two users' selections.
+OVERLAP_FIELDS = ("children", "timeline", "traits", "ethnics", "height")
+
+_POPCOUNT_LUT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+_ORDINAL_LUT = np.array([(value & -value).bit_length() - 1 for value in range(16)], dtype=np.int8)
+
+
+def popcount(words: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Number of set bits in each element of an unsigned array, as uint8."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words, out=out)
+    words = np.ascontiguousarray(words)
+    counts = _POPCOUNT_LUT[words.view(np.uint8)].reshape(words.shape + (words.itemsize,))
+    return counts.sum(axis=-1, dtype=np.uint8, out=out)
+
+
+def ordinal_levels(column: np.ndarray) -> np.ndarray:
+    """Selected level of each one-hot mask in ``column``, or -1 when none is set."""
+    return np.take(_ORDINAL_LUT, column, mode="clip")
+
+
+def _proximity_table(user_mask: int, levels: int) -> np.ndarray:
+    """Proximity of every possible candidate mask to ``user_mask`` on a one-hot scale."""
+    user_level = int(_ORDINAL_LUT[user_mask])
+    table = np.zeros(len(_ORDINAL_LUT), dtype=np.float32)
+    if user_level >= 0:
+        known = _ORDINAL_LUT >= 0
+        table[known] = 1.0 - np.abs(_ORDINAL_LUT[known] - user_level) / (levels - 1)
+    return table
+
+
+class CandidateColumns:
+    """Rows of a CandidateMatrix (all of them, or ``positions``), gathered per word on first use."""
+
+    def __init__(self, matrix: CandidateMatrix, positions: Optional[np.ndarray] = None):
+        self.matrix = matrix
+        self.positions = None if positions is None else positions.astype(np.intp, copy=False)
+        self.size = matrix.size if positions is None else len(positions)
+        self._words: Dict[Tuple[str, int], np.ndarray] = {}
+
+    def _select(self, array: np.ndarray) -> np.ndarray:
+        return array[:self.size] if self.positions is None else array[self.positions]
+
+    def word(self, field: str, word: int = 0) -> np.ndarray:
+        key = (field, word)
+        if key not in self._words:
+            self._words[key] = self._select(self.matrix.columns[field][word])
+        return self._words[key]
+
+    def counts(self, field: str) -> np.ndarray:
+        return self._select(self.matrix.counts[field])
+
+    def present(self) -> np.ndarray:
+        return self._select(self.matrix.present)
+
+
+def compatible(user: Dict[str, np.ndarray], columns: CandidateColumns) -> np.ndarray:
+    """Two-sided hard filters of one user against every candidate row."""
+    ok = columns.present().copy()
+    user_gender, user_age, user_partner_age = (user[field][0] for field in ("gender", "age", "partner_age"))
+    if user_gender:
+        gender = columns.word("gender")
+        ok &= (gender != 0) & ((gender & user_gender) == 0)
+    if user_partner_age:
+        ok &= (columns.word("age") & user_partner_age) != 0
+    if user_age:
+        partner_age = columns.word("partner_age")
+        ok &= (partner_age == 0) | ((partner_age & user_age) != 0)
+    return ok
+
+
+def score_columns(user: Dict[str, np.ndarray], columns: CandidateColumns) -> np.ndarray:
+    # Every step writes into preallocated buffers: at a million rows, fresh
+    # temporaries cost more in page faults than the arithmetic itself.
+    scores = np.zeros(columns.size, dtype=np.float32)
+    matches = np.empty(columns.size, dtype=bool)
+    scratch = np.empty(columns.size, dtype=np.float32)
+    union = np.empty(columns.size, dtype=np.float32)
+    shared = np.empty(columns.size, dtype=np.uint8)
+    bits = np.empty(columns.size, dtype=np.uint8)
+
+    for field in ("sect", "smoking"):
+        user_mask = user[field][0]
+        if user_mask or field == "smoking":
+            np.equal(columns.word(field), user_mask, out=matches)
+            np.multiply(matches, np.float32(SCORE_WEIGHTS[field]), out=scratch)
+            scores += scratch
+
+    for field, levels in ORDINAL_FIELDS.items():
+        user_mask = int(user[field][0])
+        if user_mask:
+            table = _proximity_table(user_mask, levels) * np.float32(SCORE_WEIGHTS[field])
+            np.take(table, columns.word(field), out=scratch, mode="clip")
+            scores += scratch
+
+    for field in OVERLAP_FIELDS:
+        user_words = user[field]
+        user_count = int(popcount(user_words).sum())
+        if not user_count:
+            continue
+        # |A & B| / |A | B|, with |A | B| = |A| + |B| - |A & B| from cached row counts.
+        shared.fill(0)
+        masked = np.empty(columns.size, dtype=user_words.dtype)
+        for word in np.flatnonzero(user_words):
+            np.bitwise_and(columns.word(field, word), user_words[word], out=masked)
+            popcount(masked, out=bits)
+            shared += bits
+        np.copyto(scratch, shared)
+        np.add(columns.counts(field), np.float32(user_count), out=union)
+        union -= scratch
+        scratch /= union
+        scratch *= np.float32(SCORE_WEIGHTS[field])
+        scores += scratch
+    return scores
+
+
+def score_candidates(
+    user: Dict[str, np.ndarray],
+    matrix: CandidateMatrix,
+    positions: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Score one user against all rows (or ``positions``); incompatible rows get -inf."""
+    columns = CandidateColumns(matrix, positions)
+    scores = score_columns(user, columns)
+    scores[~compatible(user, columns)] = -np.inf
+    return scores
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` highest finite scores, best first."""
+    best = np.flatnonzero(scores > -np.inf)
+    if k < len(best):
+        best = best[np.argpartition(scores[best], len(best) - k)[len(best) - k:]]
+    return best[np.argsort(-scores[best], kind="stable")]
@@ -0,0 +1,143 @@
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.schemas.user_id import UserId
+
+logger = logging.getLogger(__name__)
+
+# Ids are stored as int32 in the in-memory structures.
+MAX_DENSE_ID = 2 ** 31 - 1
+
+INTERN_CHUNK = 500
+
+# Ids this session's transaction assigned, published when it commits.
+INTERNED_KEY = "interned_user_ids"
+
+
+class UserIdRegistry:
+    """Process-wide cache of the user_ids table: external string id <-> dense int id.
+
+    ``names`` is indexed by dense id, so it doubles as the position -> user id
+    lookup of every array-backed structure; unused ids hold None.
+    """
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.names: List[Optional[str]] = []
+        self.loaded_at: Optional[float] = None
+        # Guards the maps; interning does its database work outside it.
+        self._lock = threading.RLock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    @property
+    def size(self) -> int:
+        return len(self.names)
+
+    def _remember(self, rows: Iterable) -> None:
+        for dense_id, user_id in rows:
+            if dense_id > MAX_DENSE_ID:
+                raise ValueError(f"Dense id {dense_id} for user {user_id} does not fit in int32")
+            if dense_id >= len(self.names):
+                self.names.extend([None] * (dense_id + 1 - len(self.names)))
+            self.names[dense_id] = user_id
+            self.ids[user_id] = dense_id
+
+    def load(self, db: Session) -> None:
+        start = time.perf_counter()
+        with self._lock:
+            self._remember(db.query(UserId.id, UserId.user_id).yield_per(10000))
+            self.loaded_at = time.time()
+        logger.info(f"Loaded {len(self.ids)} user ids in {time.perf_counter() - start:.2f}s")
+
+    def ensure_loaded(self, db: Session) -> None:
+        if not self.is_loaded:
+            with self._lock:
+                if not self.is_loaded:
+                    self.load(db)
+
+    def lookup(self, user_id: str) -> Optional[int]:
+        return self.ids.get(user_id)
+
+    def intern(self, db: Session, user_ids: Sequence[str], commit: bool = False) -> List[int]:
+        """Dense ids of ``user_ids``, assigning new ones for ids not seen before.
+
+        New ids are inserted in a savepoint of the caller's transaction, so
+        no second connection is checked out, and commit with it: lookup only
+        sees them once it has, and a rollback forgets them. Callers that only
+        read pass ``commit`` to commit them straight away.
+        """
+        missing = sorted({user_id for user_id in user_ids if user_id not in self.ids})
+        created: Dict[str, int] = db.info.get(INTERNED_KEY, {})
+        missing = [user_id for user_id in missing if user_id not in created]
+        if missing:
+            created = db.info.setdefault(INTERNED_KEY, {})
+            for start in range(0, len(missing), INTERN_CHUNK):
+                self._fetch_or_create(db, missing[start:start + INTERN_CHUNK], created)
+        if commit and db.info.get(INTERNED_KEY):
+            db.commit()
+        return [self.ids[user_id] if user_id in self.ids else created[user_id] for user_id in user_ids]
+
+    def _fetch_or_create(self, db: Session, chunk: List[str], created: Dict[str, int]) -> None:
+        # Sorted chunks lock new rows in the same order in every transaction.
+        # The savepoint is the connection's, so it fires no Session commit hooks.
+        connection = db.connection()
+        while True:
+            try:
+                with connection.begin_nested():
+                    new = self._insert(connection, chunk)
+                break
+            except IntegrityError:
+                # Another transaction interned some of them first; re-read and retry the rest.
+                continue
+        created.update((user_id, dense_id) for dense_id, user_id in new)
+        rest = [user_id for user_id in chunk if user_id not in created]
+        if rest:
+            # Committed by other transactions, so usable at once.
+            self.remember(db.execute(select(UserId.id, UserId.user_id).where(UserId.user_id.in_(rest))))
+
+    @staticmethod
+    def _insert(connection: Connection, chunk: List[str]) -> List[Tuple[int, str]]:
+        """``(id, user_id)`` of the rows inserted for ``chunk``, skipping ids that exist already."""
+        table = UserId.__table__
+        dialect = connection.dialect.name
+        if dialect in ("postgresql", "sqlite"):
+            statement = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(table)
+            statement = statement.on_conflict_do_nothing(index_elements=["user_id"])
+        else:
+            found = set(connection.scalars(select(table.c.user_id).where(table.c.user_id.in_(chunk))))
+            chunk = [user_id for user_id in chunk if user_id not in found]
+            statement = insert(table)
+        if not chunk:
+            return []
+        return connection.execute(statement.returning(table.c.id, table.c.user_id), [{"user_id": user_id} for user_id in chunk]).all()
+
+    def remember(self, rows: Iterable) -> None:
+        with self._lock:
+            self._remember(rows)
+
+
+user_id_registry = UserIdRegistry()
+
+
+@event.listens_for(Session, "after_commit", insert=True)
+def _publish_interned(session: Session) -> None:
+    # Ahead of the other after_commit hooks, which look the new ids up.
+    created = session.info.pop(INTERNED_KEY, None)
+    if created:
+        user_id_registry.remember((dense_id, user_id) for user_id, dense_id in created.items())
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_interned(session: Session) -> None:
+    session.info.pop(INTERNED_KEY, None)
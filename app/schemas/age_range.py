@@ -1,4 +1,5 @@
-from sqlalchemy import Column,Text, Boolean
+from datetime import datetime
+from sqlalchemy import Column, Text, Boolean, Integer, DateTime, Index
 from app.db.database import Base
 
 class AgeRange(Base):      
@@ -8,4 +9,8 @@ class AgeRange(Base):
     range_18_to_24 = Column(Boolean, default=False)
     range_25_to_34 = Column(Boolean, default=False)
     range_35_to_44 = Column(Boolean, default=False)
-    range_above_44 = Column(Boolean, default=False) 
\ No newline at end of file
+    range_above_44 = Column(Boolean, default=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_age_range_version", "user_id", "version", "updated_at"),)
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Text, Integer, Float, DateTime
+from datetime import datetime
+from app.db.database import Base
+
+class CandidateFeed(Base):
+    __tablename__ = "candidate_feed"
+
+    user_id = Column(Text, primary_key=True, nullable=False)
+    rank = Column(Integer, primary_key=True, nullable=False)
+    candidate_id = Column(Text, nullable=False)
+    score = Column(Float, nullable=False)
+    computed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
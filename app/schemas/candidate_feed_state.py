@@ -0,0 +1,9 @@
+from sqlalchemy import Column, Text, DateTime
+from app.db.database import Base
+
+class CandidateFeedState(Base):
+    __tablename__ = "candidate_feed_state"
+
+    user_id = Column(Text, primary_key=True, nullable=False)
+    changed_at = Column(DateTime, nullable=True)
+    computed_at = Column(DateTime, nullable=True)
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Text, Integer, DateTime
+from app.db.database import Base
+
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    origin = Column(Text, nullable=False)
+    table_name = Column(Text, nullable=False)
+    user_id = Column(Text, nullable=False)
+    changed_at = Column(DateTime, nullable=False, index=True)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Boolean, Text
+from datetime import datetime
+from sqlalchemy import Column, Boolean, Text, Integer, DateTime, Index
 from app.db.database import Base
 
 class Gender(Base): 
@@ -6,4 +7,8 @@ class Gender(Base):
     
     user_id = Column(Text, primary_key=True, nullable=False)
     male = Column(Boolean, nullable=False, default=False)
-    female = Column(Boolean, nullable=False, default=False) 
\ No newline at end of file
+    female = Column(Boolean, nullable=False, default=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_gender_version", "user_id", "version", "updated_at"),)
@@ -8,4 +8,5 @@ class Match(Base):
     partner_id_1 = Column(Text, primary_key=True, nullable=False)
     partner_id_2 = Column(Text, primary_key=True, nullable=False)
     match_status = Column(Integer, nullable=False)
+    requested_by = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
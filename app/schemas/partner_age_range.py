@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Text, Boolean
+from datetime import datetime
+from sqlalchemy import Column, Text, Boolean, Integer, DateTime, Index
 from app.db.database import Base
 
 class PartnerAgeRange(Base):
@@ -8,5 +9,8 @@ class PartnerAgeRange(Base):
     partner_range_18_to_24 = Column(Boolean, default=False)
     partner_range_25_to_34 = Column(Boolean, default=False)
     partner_range_35_to_44 = Column(Boolean, default=False)
-    partner_range_above_44 = Column(Boolean, default=False) 
-    
\ No newline at end of file
+    partner_range_above_44 = Column(Boolean, default=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_partner_age_ranges_version", "user_id", "version", "updated_at"),)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Boolean, Text
+from datetime import datetime
+from sqlalchemy import Column, Boolean, Text, Integer, DateTime, Index
 from app.db.database import Base
 
 
@@ -8,4 +9,8 @@ class PartnerChildrenExpectations(Base):
     user_id = Column(Text, primary_key=True, nullable=False)
     partner_wants_children = Column(Boolean, default=False)
     partner_open_to_have_children = Column(Boolean, default=False)
-    partner_does_not_want_children = Column(Boolean, default=False) 
\ No newline at end of file
+    partner_does_not_want_children = Column(Boolean, default=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_partner_children_expectations_version", "user_id", "version", "updated_at"),)
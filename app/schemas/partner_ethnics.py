@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, Table, ForeignKey, Text, Boolean
+from datetime import datetime
+from sqlalchemy import Column, String, Table, ForeignKey, Text, Boolean, Integer, DateTime, Index
 from sqlalchemy.ext.declarative import declarative_base
 
 from app.db.database import Base
@@ -203,4 +204,7 @@ class PartnerEthnics(Base):
     yemen = Column(Boolean, default=False)
     zambia = Column(Boolean, default=False)
     zimbabwe = Column(Boolean, default=False)
-    
\ No newline at end of file
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_partner_ethnics_version", "user_id", "version", "updated_at"),)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Boolean, Text
+from datetime import datetime
+from sqlalchemy import Column, Boolean, Text, Integer, DateTime, Index
 from app.db.database import Base
 
 
@@ -22,4 +23,8 @@ class PartnerHeight(Base):
     partner_range_201_to_205 = Column(Boolean, default=False) 
     partner_range_206_to_210 = Column(Boolean, default=False) 
     partner_range_211_to_215 = Column(Boolean, default=False) 
-    partner_range_216_to_220 = Column(Boolean, default=False) 
\ No newline at end of file
+    partner_range_216_to_220 = Column(Boolean, default=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_partner_height_version", "user_id", "version", "updated_at"),)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Boolean, Text
+from datetime import datetime
+from sqlalchemy import Column, Boolean, Text, Integer, DateTime, Index
 from app.db.database import Base
 
 
@@ -10,4 +11,8 @@ class PartnerMarriageTimeline(Base):
     partner_within_1_year = Column(Boolean, default=False)
     partner_within_2_year = Column(Boolean, default=False)
     partner_within_3_year = Column(Boolean, default=False)
-    partner_within_5_year = Column(Boolean, default=False) 
\ No newline at end of file
+    partner_within_5_year = Column(Boolean, default=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_partner_marriage_timeline_version", "user_id", "version", "updated_at"),)
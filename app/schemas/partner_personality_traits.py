@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Boolean, Text
+from datetime import datetime
+from sqlalchemy import Column, Boolean, Text, Integer, DateTime, Index
 
 from app.db.database import Base
 class PartnerPersonalityTraitsScore(Base):
@@ -74,4 +75,7 @@ class PartnerPersonalityTraitsScore(Base):
     partner_resilient = Column(Boolean, default=False)
     partner_sincere = Column(Boolean, default=False)
     partner_tactful = Column(Boolean, default=False)
-    
\ No newline at end of file
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_partner_personality_traits_score_version", "user_id", "version", "updated_at"),)
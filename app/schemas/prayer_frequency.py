@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Text, Boolean
+from datetime import datetime
+from sqlalchemy import Column, Text, Boolean, Integer, DateTime, Index
 from sqlalchemy.ext.declarative import declarative_base
 
 from app.db.database import Base
@@ -10,4 +11,8 @@ class PrayerFrequency(Base):
     always_pray = Column(Boolean, default=False)
     usually_pray = Column(Boolean, default=False)
     sometimes_pray = Column(Boolean, default=False)
-    never_pray = Column(Boolean, default=False)
\ No newline at end of file
+    never_pray = Column(Boolean, default=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_prayer_frequency_version", "user_id", "version", "updated_at"),)
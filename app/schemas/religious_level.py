@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Boolean, Text
+from datetime import datetime
+from sqlalchemy import Column, Boolean, Text, Integer, DateTime, Index
 from app.db.database import Base
 
 class ReligiousLevel(Base):
@@ -8,4 +9,8 @@ class ReligiousLevel(Base):
     very_practising = Column(Boolean, default=False)
     practising = Column(Boolean, default=False)
     moderately_practising = Column(Boolean, default=False)
-    not_practising = Column(Boolean, default=False) 
\ No newline at end of file
+    not_practising = Column(Boolean, default=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_religious_level_version", "user_id", "version", "updated_at"),)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Boolean, Text
+from datetime import datetime
+from sqlalchemy import Column, Boolean, Text, Integer, DateTime, Index
 
 from app.db.database import Base
 
@@ -11,4 +12,8 @@ class Sects(Base):
     ahmadi = Column(Boolean, default=False)
     ismaili = Column(Boolean, default=False)
     ibadi = Column(Boolean, default=False)
-    other = Column(Boolean, default=False) 
\ No newline at end of file
+    other = Column(Boolean, default=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_sects_version", "user_id", "version", "updated_at"),)
@@ -1,8 +1,13 @@
-from sqlalchemy import Column, Text, Boolean
+from datetime import datetime
+from sqlalchemy import Column, Text, Boolean, Integer, DateTime, Index
 from app.db.database import Base
 
 class SmokingStatus(Base):
     __tablename__ = "smoking_status"
 
     user_id = Column(Text, primary_key=True, nullable=False)
-    does_smoke = Column(Boolean, nullable=False, default=False) 
\ No newline at end of file
+    does_smoke = Column(Boolean, nullable=False, default=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_smoking_status_version", "user_id", "version", "updated_at"),)
@@ -0,0 +1,8 @@
+from sqlalchemy import Column, Integer, Text
+from app.db.database import Base
+
+class UserId(Base):
+    __tablename__ = "user_ids"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Text, unique=True, nullable=False)
@@ -0,0 +1,132 @@
+import os
+import subprocess
+import sys
+
+import requests
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestCandidates:
+    def __init__(self, base_url="http://localhost:5008", api_prefix="/api/v1"):
+        self.base_url = f"{base_url}{api_prefix}"
+        self.seeker = "candidates-seeker"
+        # Best first: a sect match outweighs a smoking match, so the four
+        # candidates score 4, 3, 1 and 0 against the seeker.
+        self.candidates = {
+            "candidates-best": ("sunni", False),
+            "candidates-second": ("sunni", True),
+            "candidates-third": ("shia", False),
+            "candidates-fourth": ("shia", True),
+        }
+
+    def add_user(self, user_id, sect, does_smoke):
+        print(f"Adding user {user_id} ({sect}, smokes: {does_smoke})...")
+        response = requests.post(f"{self.base_url}/sects", json={"user_id": user_id, "sects": sect})
+        assert response.status_code == 201, f"Failed to add sect for {user_id}: {response.text}"
+        response = requests.post(f"{self.base_url}/smoking-status", json={"user_id": user_id, "does_smoke": does_smoke})
+        assert response.status_code == 201, f"Failed to add smoking status for {user_id}: {response.text}"
+
+    def get_candidates(self, user_id, limit=20):
+        print(f"Getting candidates of user {user_id}")
+        response = requests.get(f"{self.base_url}/match/candidates/{user_id}", params={"limit": limit})
+        response.raise_for_status()
+        print(f"Candidates of user {user_id}: {response.json()}")
+        return response.json()["candidates"]
+
+    def get_feed_page(self, user_id, after_rank=0, limit=20, computed_at=None):
+        print(f"Getting the feed of user {user_id} after rank {after_rank}")
+        params = {"after_rank": after_rank, "limit": limit}
+        if computed_at is not None:
+            params["computed_at"] = computed_at
+        response = requests.get(f"{self.base_url}/match/feed/{user_id}", params=params)
+        response.raise_for_status()
+        print(f"Feed page of user {user_id}: {response.json()}")
+        return response.json()
+
+    def add_visit(self, user_id, visited_user_id):
+        print(f"User {user_id} visits {visited_user_id}")
+        response = requests.post(f"{self.base_url}/visited", json={"user_id": user_id, "visited_user_id": visited_user_id})
+        assert response.status_code == 201, f"Failed to record the visit: {response.text}"
+
+    def run_nightly_batch(self):
+        print("Running the nightly candidate batch...")
+        process = subprocess.run(
+            [sys.executable, "recompute_candidates.py", "--workers", "1"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True
+        )
+        print("STDOUT:", process.stdout)
+        print("STDERR:", process.stderr)
+        assert process.returncode == 0, "The nightly candidate batch failed"
+
+    def check_ranking(self):
+        ranked = [candidate["user_id"] for candidate in self.get_candidates(self.seeker) if candidate["user_id"] in self.candidates]
+        assert ranked == list(self.candidates), f"Candidates should be ranked {list(self.candidates)}, got {ranked}"
+        assert self.seeker not in [candidate["user_id"] for candidate in self.get_candidates(self.seeker)], "A user should not be their own candidate"
+
+    def check_batch_parity(self):
+        self.run_nightly_batch()
+        online = [(candidate["user_id"], candidate["score"]) for candidate in self.get_candidates(self.seeker)]
+        feed = self.get_feed_page(self.seeker)
+        batch = [(candidate["user_id"], candidate["score"]) for candidate in feed["candidates"]]
+        assert batch == online, f"The nightly feed {batch} should match the per-request ranking {online}"
+
+    def check_feed_paging_across_visits(self):
+        first_page = self.get_feed_page(self.seeker, limit=2)
+        assert [candidate["user_id"] for candidate in first_page["candidates"]] == ["candidates-best", "candidates-second"], "The first page should hold the two best candidates"
+        assert first_page["next_after_rank"] is not None, "A full page should point at the next one"
+
+        self.add_visit(self.seeker, "candidates-best")
+        self.add_visit(self.seeker, "candidates-third")
+        second_page = self.get_feed_page(
+            self.seeker,
+            after_rank=first_page["next_after_rank"],
+            limit=2,
+            computed_at=first_page["computed_at"]
+        )
+        assert second_page["computed_at"] == first_page["computed_at"], "Visits should not rebuild the feed"
+        assert [candidate["user_id"] for candidate in second_page["candidates"]] == ["candidates-fourth"], "The second page should skip the visited candidate"
+
+        first_page = self.get_feed_page(self.seeker, limit=2)
+        assert [candidate["user_id"] for candidate in first_page["candidates"]] == ["candidates-second", "candidates-fourth"], "Visited candidates should drop out of the first page"
+
+    def check_feed_after_write(self):
+        print(f"Modifying the sect of user {self.seeker}")
+        response = requests.put(f"{self.base_url}/sects/{self.seeker}", json={"sects": "shia"})
+        response.raise_for_status()
+        # Read straight after the write, while the service's background refresh may not have run yet.
+        feed = [(candidate["user_id"], candidate["score"]) for candidate in self.get_feed_page(self.seeker)["candidates"]]
+        online = [(candidate["user_id"], candidate["score"]) for candidate in self.get_candidates(self.seeker)]
+        assert feed == online, f"The feed {feed} should be rebuilt from the new preferences, like {online}"
+        assert [user_id for user_id, _ in feed] == ["candidates-fourth", "candidates-second"], "A shia seeker should rank the unvisited shia candidate first"
+
+    def check_etag_after_write(self):
+        url = f"{self.base_url}/sects/{self.seeker}"
+        response = requests.get(url)
+        response.raise_for_status()
+        etag = response.headers.get("ETag")
+        assert etag is not None, "A preference read should carry an ETag"
+        response = requests.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304, f"An unchanged read should answer 304, got {response.status_code}"
+
+        print(f"Modifying the sect of user {self.seeker}")
+        response = requests.put(url, json={"sects": "sunni"})
+        response.raise_for_status()
+        response = requests.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200, f"A read after a write should answer 200, got {response.status_code}"
+        assert response.json()["sunni"] is True, "The read after a write should return the new sect"
+        assert response.headers.get("ETag") not in (None, etag), "A write should change the ETag"
+        response = requests.get(url, headers={"If-None-Match": response.headers["ETag"]})
+        assert response.status_code == 304, "The new ETag should answer 304"
+
+    def run_candidates_operations(self):
+        self.add_user(self.seeker, "sunni", False)
+        for user_id, (sect, does_smoke) in self.candidates.items():
+            self.add_user(user_id, sect, does_smoke)
+
+        self.check_ranking()
+        self.check_batch_parity()
+        self.check_feed_paging_across_visits()
+        self.check_feed_after_write()
+        self.check_etag_after_write()
@@ -8,7 +8,8 @@ import requests
 from sqlalchemy import create_engine, text
 import psycopg2
 from typing import List, Tuple
-from TestSmokingStatus import TestSmokingStatus
+from test_candidates import TestCandidates
+from test_smoking_status import TestSmokingStatus
 from dotenv import load_dotenv
 from urllib.parse import urlparse
 
@@ -17,6 +18,8 @@ load_dotenv()
 class TestMatchingService:
     def __init__(self, base_url="http://localhost:5008", api_prefix="/api/v1"):
         self.base_url = f"{base_url}{api_prefix}"
+        self.service_url = base_url
+        self.api_prefix = api_prefix
         
         self.container_name = "matching-microservice"
         self.image_name = "matching-microservice:latest"
@@ -461,10 +464,12 @@ class TestMatchingService:
 
     def runAllTests(self):
         # Individual test modules
-        smoking_status_test = TestSmokingStatus(self.base_url, self.api_prefix)
+        smoking_status_test = TestSmokingStatus(self.service_url, self.api_prefix)
+        candidates_test = TestCandidates(self.service_url, self.api_prefix)
         
         # Run each test module
-        smoking_status_test.run_tests()
+        smoking_status_test.run_smoking_status_operations()
+        candidates_test.run_candidates_operations()
 
 if __name__ == "__main__":
     test_suite = TestMatchingService()
@@ -0,0 +1,32 @@
+import argparse
+import sys
+
+from app.db.database import open_read_session
+from app.db.export import TableExport
+from app.dto.export import ExportFormat
+from app.endpoints.export import PROFILES, export_models
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a full snapshot of preference tables")
+    parser.add_argument("dataset", help=f"A preference section such as partner_ethnics, or {PROFILES} for every table joined per user")
+    parser.add_argument("--format", choices=[f.value for f in ExportFormat], default=ExportFormat.NDJSON.value)
+    parser.add_argument("--packed", action="store_true", help="One hex bitmask column per table instead of one column per flag")
+    parser.add_argument("--batch-size", type=int, help="Rows fetched per round trip from the server-side cursor")
+    parser.add_argument("-o", "--output", help="File to write (defaults to stdout)")
+    args = parser.parse_args()
+
+    models = export_models(args.dataset)
+    if models is None:
+        parser.error(f"unknown dataset {args.dataset}")
+    export = TableExport(args.dataset, models, ExportFormat(args.format), args.packed, args.batch_size)
+
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    db = open_read_session()
+    try:
+        for chunk in export.chunks(db):
+            output.write(chunk)
+    finally:
+        db.close()
+        if args.output:
+            output.close()
+    print(f"{export.rows} rows in {export.seconds:.2f}s ({export.rows_per_second:.0f} rows/s)", file=sys.stderr)
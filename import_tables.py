@@ -0,0 +1,45 @@
+import argparse
+import json
+import sys
+
+from app.db.bulk_import import TableImport
+from app.db.database import SessionLocal
+from app.dto.export import ImportFormat
+from app.endpoints.profile import PROFILE_MODELS
+from app.matching.feed import record_profile_change
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill a preference table from CSV or NDJSON")
+    parser.add_argument("dataset", choices=list(PROFILE_MODELS), help="Preference section to load into")
+    parser.add_argument("input", help="File to read, - for stdin")
+    parser.add_argument("--format", choices=[f.value for f in ImportFormat], help="Defaults to the input file's extension")
+    parser.add_argument("--chunk-size", type=int, help="Rows per COPY or executemany and per commit")
+    args = parser.parse_args()
+
+    import_format = args.format or args.input.rsplit(".", 1)[-1]
+    if import_format not in [f.value for f in ImportFormat]:
+        parser.error("--format is required when the input has no .csv or .ndjson extension")
+
+    table_import = TableImport(
+        args.dataset,
+        PROFILE_MODELS[args.dataset],
+        ImportFormat(import_format),
+        on_written=record_profile_change,
+        chunk_size=args.chunk_size
+    )
+    source = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+    db = SessionLocal()
+    try:
+        result = table_import.run(db, source)
+    finally:
+        db.close()
+        if source is not sys.stdin:
+            source.close()
+
+    for error in result["errors"]:
+        print(json.dumps(error), file=sys.stderr)
+    print(
+        f"{table_import.written} of {table_import.received} rows written, {table_import.failed} failed, "
+        f"in {table_import.seconds:.2f}s ({table_import.rows_per_second:.0f} rows/s)",
+        file=sys.stderr
+    )
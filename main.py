@@ -3,10 +3,16 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import time
+from contextlib import asynccontextmanager
 
 from app.api import api_router
 from app.core.config import settings
-from app.db.database import engine, Base
+from app.db.changes import change_feed
+from app.db.database import engine, Base, SessionLocal
+from app.db.listing import NEXT_CURSOR_HEADER
+from app.db.versions import migrate_version_columns
+from app.matching.engine import RECORD_MODELS, candidate_engine
+from app.matching.pairs import pair_index
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -14,14 +20,29 @@ logger = logging.getLogger(__name__)
 try:
     Base.metadata.create_all(bind=engine)
     logger.info("Database tables created successfully")
+    migrate_version_columns(engine, list(RECORD_MODELS.values()))
 except Exception as e:
     logger.error(f"Error creating database tables: {str(e)}")
     raise
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db = SessionLocal()
+    try:
+        pair_index.load(db)
+    finally:
+        db.close()
+    change_feed.start()
+    candidate_engine.start()
+    yield
+    candidate_engine.stop()
+    change_feed.stop()
+
 app = FastAPI(
     title=settings.API_TITLE,
     description=settings.API_DESCRIPTION,
-    version=settings.API_VERSION
+    version=settings.API_VERSION,
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -30,6 +51,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Browsers only let scripts read these response headers when listed.
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
 @app.middleware("http")
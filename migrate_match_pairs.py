@@ -0,0 +1,9 @@
+from app.db.database import SessionLocal
+from app.matching.pairs import migrate_canonical_pairs
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        migrate_canonical_pairs(db)
+    finally:
+        db.close()
@@ -0,0 +1,28 @@
+import argparse
+
+from app.db.database import SessionLocal
+from app.matching.batch import recompute_candidate_feeds
+from app.matching.feed import refresh_stale_feeds
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute the candidate feed of every user")
+    parser.add_argument("--incremental", action="store_true", help="Only refresh feeds of users changed since their last run")
+    parser.add_argument("--top-k", type=int, help="Candidates stored per user (defaults to CANDIDATE_FEED_SIZE)")
+    parser.add_argument("--workers", type=int, help="Worker processes (defaults to one per core)")
+    parser.add_argument("--row-block", type=int, help="Users scored per task")
+    parser.add_argument("--column-block", type=int, help="Candidates scored per block product")
+    args = parser.parse_args()
+
+    if args.incremental:
+        db = SessionLocal()
+        try:
+            refresh_stale_feeds(db)
+        finally:
+            db.close()
+    else:
+        recompute_candidate_feeds(
+            top_k=args.top_k,
+            workers=args.workers,
+            row_block=args.row_block,
+            column_block=args.column_block
+        )